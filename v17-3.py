@@ -23,7 +23,11 @@ Due to the nature of how WINDOWS handles passing objects to proceses, using more
 fact be slower than using less due to limitations in the WINDOWS process architecture. A reasonable
 number of cores to use on WINDOWS could be (maximum number of cores)/2.
 
+The program runs on Python 2.7 and on Python 3, where large arrays are handed to processes and pickles without being copied into
+the pickled bytes.
+
 """
+from __future__ import print_function, division
 
 """Main function/starting script of the program.
 
@@ -49,6 +53,10 @@ Args:
 		in the damage region section of the file.
 	elementDamageEndInp (optional)(str): Start of the line in input inp file that indicates the end of the elements 
 		in the damage region section of the file.
+	engine (optional)(str): Engine used to insert the cohesive elements. 'pool' holds every list in memory while 'outofcore'
+		streams the damage zone through sorted runs on disk for models that do not fit in memory.
+	maxMemory (optional)(str): Memory budget of the out-of-core engine such as '8G'. Can also be given on the command line
+		with --max-memory, which selects the out-of-core engine.
 		
 """
 
@@ -62,6 +70,113 @@ inputName = "Rat_721_partial_w_dam_smal"
 #core = 1
 core = 'max' # Default for all cores
 
+# Engine used to insert the cohesive elements:
+#	'pool' keeps every list in memory and processes items with a pool of processes
+#	'outofcore' streams the damage zone through sorted runs on disk and holds at most maxMemory at once
+#	'domain' splits the damage zone into subdomains of neighbouring elements processed independently by each process
+engine = 'pool'
+maxMemory = None # Memory budget of the out-of-core engine, e.g. '8G'. Also set with --max-memory on the command line
+
+# Plan the run from the memory it can use and the size of the model found by the header scan before anything is parsed: fewer
+# processes, fewer tasks waiting for their result, or the out-of-core engine when the model would not fit in memory otherwise.
+# Also turned off with --no-memory-plan on the command line
+memoryPlanning = True
+memoryLimit = None # Memory the run can use, e.g. '16G'. None reads the available memory and the cgroup limit. Also set with --memory-limit
+
+# Only scan the sections of the inp file and predict the time and peak memory of each step at several numbers of processes instead of
+# running them. Also set with --dry-run on the command line
+dryRun = False
+
+# Order in which the damage elements are processed by the pool engine: None keeps the order of the damage set while 'morton' or 'hilbert'
+# sorts them along a space-filling curve through their centroids so that neighbouring elements are processed together.
+# The output is the same whatever the order. Also set with --reorder on the command line
+spatialOrdering = None
+
+subdomainCount = None # Number of subdomains the domain engine splits the damage zone into. None uses one subdomain per core
+
+# Create the new nodes (step 7-3) and the cohesive elements (step 9) while the output inp file is written instead of holding all of
+# them in memory beforehand, so the memory used by the output does not grow with the number of cohesive elements. Also turned off with --no-stream
+streamOutput = True
+
+# Compression of the output inp file: None, 'gzip' or 'zstd'. Compressed input inp files (.inp.gz or .inp.zst) are read directly.
+# Also set with --compress on the command line
+compression = None
+
+# Directory of a store shared between runs holding the unchanged blocks of the input inp file under the sha1 digest of their content.
+# When set, the output inp file is split into a main file made of *INCLUDE lines, files written fresh for the nodes, the elements and the
+# cohesive elements, and hardlinks to the stored unchanged blocks. Also set with --include-store on the command line
+includeStore = None
+
+# Check the output inp file once it is written: unique node and element numbers, existing nodes, coincident faces and orientation of the
+# cohesive elements. The program exits with status 1 if a problem is found. Also turned on with --validate on the command line
+validateOutput = False
+
+# Distinct nodes of the damage elements closer than this distance along each axis are merged into the one with the smallest number
+# before the cohesive faces are found, for meshes whose adjacent elements do not share their nodes. None only matches faces by node
+# number. Must be greater than 0. Not available with the out-of-core engine. Also set with --merge-tolerance on the command line
+coincidentNodeTolerance = None
+
+# Regions selecting the damage elements by the position of their centroid in place of the damage set, which can then be left out of
+# the inp file. Elements inside any of the regions are selected:
+#	['box', [x0, y0, z0, x1, y1, z1]] between two opposite corners
+#	['sphere', [x, y, z, r]] around a center
+#	['cylinder', [x0, y0, z0, x1, y1, z1, r]] around the axis between the centers of its two ends
+#	['voxels', 'mask.txt'] in the voxels of a mask file, see parseDamageRegion
+# Not available with the out-of-core engine. Also set with --damage-box, --damage-sphere, --damage-cylinder and --damage-voxels
+damageRegions = []
+
+# File the grid of the element centroids used to select the damage regions is saved to and loaded from by later runs on the same
+# inp file, so that they only query the grid. None builds the grid on every run. Also set with --region-index
+centroidGridFile = None
+
+# Names of element sets of the inp file each used as the damage zone of its own variant. The model is parsed once, then steps 4 to 10
+# are run for each variant in a process forked from the parsed model, writing to a folder named after the variant inside the report
+# folder. The damage set can be left out of the inp file. Not available with the out-of-core engine or the distributed backend.
+# Also set with --variants on the command line
+damageVariants = []
+variantProcesses = None # Number of variants run at once. None runs as many as fit in the available memory, up to core
+
+# Address the parsed model is served on, "<host>:<port>" on a loopback address such as localhost or the path of a Unix socket. The
+# model is parsed once and insertion requests sent with --request are run against it one at a time. Clients authenticate with a
+# random key the service writes to a file only its user can read, see serviceKeyFile. Not available with the out-of-core engine or
+# variants. Also set with --serve on the command line
+serviceAddress = None
+
+# Diagnostic dumps written to the report folder next to the output inp file:
+#	0 writes none of them
+#	1 writes the face pairs (pairNodes), the renumbered damage elements (elementList) and the cohesive elements (cohesiveElement)
+#	2 also dumps every intermediate stage pickled between the steps (nodeList, elementListNormal, elementNumbers, elementList, topology, cohesive)
+# Also set with --diagnostics on the command line
+diagnosticLevel = 0
+diagnosticStages = [] # Names of dumps written whatever diagnosticLevel, e.g. ['pairNodes', 'topology']. Also set with --dump
+# Format of the diagnostic dumps: 'txt' one list per line as in earlier versions, 'csv' gzip compressed CSV or 'npy' binary arrays
+# read with numpy.load. Also set with --diagnostics-format on the command line
+diagnosticFormat = 'npy'
+
+# Print how many items the pool of each step has done, its throughput and the time left every progressInterval seconds, and rewrite
+# them with the time taken by the finished steps to the JSON status file of the report folder, status-<inputName>.json. None turns
+# both off. Also set with --progress on the command line
+progressInterval = 10
+
+topologyIndexFile = None # File the topology index of the damage elements is saved to and reused from by later runs on the same damage zone. Also set with --topology-index
+
+# Backend running the checkN functions of each step:
+#	'auto' times the first items of a step in this process and then picks 'serial' or 'processes' from the estimated work left
+#	'serial' runs every item in this process
+#	'threads' runs the items in a pool of threads, which only pays off for work releasing the GIL
+#	'processes' runs the items in a pool of processes of this computer
+#	'distributed' hands the items over TCP to worker processes, which can also be started on other computers with:
+#		python v17-3.py --worker <host>:<port> --key-file <file>
+# The number of threads or processes defaults to core and can be given as 'threads:4' or 'processes:8'. Also set with --backend
+backend = 'auto'
+stepBackends = {} # Backends of single steps overriding backend, e.g. {'Step5and6': 'processes:8', 'Step7-3': 'serial'}. Also set with --step-backend
+distributedAddress = ('localhost', 0) # Address the coordinator listens on. Port 0 picks a free port, which only suits local workers
+distributedLocalWorkers = None # Number of worker processes started on this computer by the coordinator. None starts one per core
+distributedRemoteWorkers = 0 # Number of workers started on other computers that the coordinator waits for
+# Shared key workers must present to connect. None generates a random key for each run, which is only handed to the local workers.
+# A key is required when listening beyond localhost or waiting for remote workers. Also set with --key-file, a file holding the key
+distributedAuthKey = None
+
 nodeStartInp="*Node"
 nodeEndInp	= "*"
 
@@ -84,16 +199,96 @@ sectionCohesive = "** Section: Section-0-COH\n\
 import time
 import datetime
 import os
+import sys
+import socket
+import subprocess
+import threading
+import traceback
 import multiprocessing as mp
+from multiprocessing.connection import Listener, Client, deliver_challenge, answer_challenge
+from multiprocessing.pool import ThreadPool
 
 #Other modules
+import array
+import struct
 import bisect
 import math
-import cPickle
+import numbers
+import heapq
+import collections
+import itertools
+import operator
+import shutil
+import tempfile
+import argparse
+import hashlib
+import io
+import gzip
+import binascii
+import zlib
+import json
+
+#Optional modules
+#Modules renamed or changed in Python 3
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
+try:
+	import Queue as queue
+except ImportError:
+	import queue
+try:
+	import copy_reg as copyreg
+except ImportError:
+	import copyreg
+try:
+	# map, zip and filter return iterators as in Python 3
+	from future_builtins import map, zip, filter
+except ImportError:
+	pass
+
+if sys.version_info[0] >= 3:
+	# Text files are read and written as latin-1 without translating newlines, so every byte of an inp file is kept as in Python 2
+	def openText(fileName, mode='r'):
+		"""Opens a text file as the built-in open of Python 2 does."""
+		return open(fileName, mode, encoding='latin-1', newline='')
+
+	def textReader(f):
+		"""Reads the lines of a binary file object as text."""
+		return io.TextIOWrapper(f, encoding='latin-1', newline='')
+
+	def textFromBytes(data):
+		"""Turns the bytes read from a file into text."""
+		return data.decode('latin-1')
+
+	def bytesFromText(text):
+		"""Turns text into the bytes written to a file."""
+		return text.encode('latin-1')
+else:
+	openText = open
+	textReader = textFromBytes = bytesFromText = lambda value: value
+
+try:
+	from multiprocessing import shared_memory
+except ImportError:
+	shared_memory = None
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
 
 #_____________________________________
 #Directory and file names
+#Suffixes of the compressed inp files
+compressionSuffixes = {'gzip': '.gz', 'zstd': '.zst'}
+
 inputFile= "inp/%s.inp"%inputName
+#Read the compressed inp file when there is no uncompressed one
+for suffix in sorted(compressionSuffixes.values()):
+	if not os.path.exists(inputFile) and os.path.exists(inputFile + suffix):
+		inputFile = inputFile + suffix
 outputFile = "%s-output.inp"%inputFile
 
 stamp = time.strftime("%Y-%m-%d %H-%M-%S", time.gmtime())
@@ -101,9 +296,9 @@ outputDirectory = "reports/%s-%s" %(inputName,stamp)
 
 #_____________________________________
 #Redefining core numbers if left at default
-if core is "max":
+if core == "max":
 	core = mp.cpu_count()	 # Default for max number of cores
-	print "Using maximum number of cores:", core
+	print("Using maximum number of cores:", core)
 
 #_____________________________________
 #Temporary pickle file names
@@ -112,20 +307,181 @@ pklFileName['elementList'] = "%s/elementList.pkl"%outputDirectory
 pklFileName['elementListNormal'] = "%s/elementListNormal.pkl"%outputDirectory
 pklFileName['nodeList'] = "%s/nodeList.pkl"%outputDirectory
 pklFileName['elementNumbers'] = "%s/elementNumbers.pkl"%outputDirectory
-pklFileName['cohesiveFaces'] = "%s/cohesiveFaces.pkl"%outputDirectory
-pklFileName['elementNumberCohesive'] = "%s/elementNumberCohesive.pkl"%outputDirectory
+pklFileName['cohesiveFaces'] = "%s/cohesiveFaces.bin"%outputDirectory
 pklFileName['cohesive'] = "%s/cohesive.pkl"%outputDirectory
+pklFileName['topology'] = "%s/topology.pkl"%outputDirectory
+
+#_____________________________________
+#Face orientations (accounting for element number in col[0]) used for generating cohesive elements in the damage zone.
+#Each forward face (f) of an element is shared with the backward face (b) of its neighbour in the same combination.
+faceOrientationDefinition = {	'Af': [5,6,7,8], 'Ab': [1,2,3,4],\
+								'Bf': [3,4,8,7], 'Bb': [2,1,5,6],\
+								'Cf': [2,3,7,6], 'Cb': [1,4,8,5] }
+faceCombinations = [['Af','Ab'], ['Bf','Bb'], ['Cf','Cb']]
+
+#Faces are stored in the face pair table as small integer codes
+faceNames = ['Af', 'Ab', 'Bf', 'Bb', 'Cf', 'Cb']
+faceCodes = dict((faceNames[code], code) for code in range(len(faceNames)))
+
+#Number of values of each cohesive element: its element number followed by the 8 nodes of the COH3D8 element
+cohesiveElementWidth = 9
+
+#Columns of the face pair table and their array type codes. Element and node numbers are 32 bit integers and face codes single bytes,
+#the wider columns coming first so that every column of a saved table stays aligned when memory mapped.
+facePairColumns = [	['forwardElement', 'i'], ['backwardElement', 'i'],\
+					['node1', 'i'], ['node2', 'i'], ['node3', 'i'], ['node4', 'i'],\
+					['forwardFace', 'b'], ['backwardFace', 'b'] ]
+
+#_____________________________________
+#Out-of-core engine settings
+outOfCoreDefaultMemory = '1G' # Memory budget used when the out-of-core engine is selected without maxMemory
+outOfCoreRecordSize = 1024 # Estimated size in bytes of one record held in memory while sorting
+outOfCoreLiveRuns = 4 # Number of sorted runs that can be held in memory at the same time
+outOfCoreMergeFanIn = 64 # Maximum number of sorted runs merged (and opened) at once
+outOfCoreBlockSize = 4096 # Number of records pickled together when spilling a sorted run to disk
+
+#_____________________________________
+#Automatic backend selection settings
+autoProbeItems = 32 # Number of items of a step timed in this process before a backend is picked for the rest
+autoProbeBytes = 8*1024*1024 # Bytes of the inp file parsed in this process by the Step3 probe, which limits its number of shards
+autoSerialSeconds = 1.0 # Steps whose remaining items are estimated to take less than this many seconds serially stay in this process
+autoSecondsPerProcess = 0.5 # Minimum estimated work in seconds given to each process, which has to pay for starting it
+
+#_____________________________________
+#Background input and output settings
+backgroundIO = True # Read the next inp section and write the output inp file in background threads while the program keeps working. Also turned off with --no-background-io
+ioChunkLines = 4096 # Number of lines handed to the background writer at once
+ioQueueChunks = 8 # Maximum number of chunks waiting to be written, which bounds the memory used by the background writer
+
+#_____________________________________
+#Compression settings
+compressionLevels = {'gzip': 6, 'zstd': 3} # Compression level of each compression of the output inp file
+compressionBlockBytes = 4*1024*1024 # Size in bytes of the blocks of the output inp file compressed independently of each other
+temporaryCompressionLevel = 1 # Compression level of the gzip temporary files written when an inp file is compressed
+
+#_____________________________________
+#Split output settings
+includeStoreIndexName = "index.pkl" # File of the include store remembering the digest of the blocks already stored, found from the inp file and line numbers
+includeLine = "*INCLUDE, INPUT=%s\n" # Line of the main output inp file including one of its blocks
+
+#_____________________________________
+#Validation settings
+validationTolerance = 1e-6 # Largest distance along each axis between the coincident nodes of the two faces of a cohesive element
+validationReportLimit = 10 # Number of node or element numbers printed for each kind of problem found
+validationBlockLines = 65536 # Data lines of the output inp file converted at once by validateOutputInp
+
+#_____________________________________
+#Diagnostic settings
+diagnosticSuffixes = {'txt': '.txt', 'csv': '.csv.gz', 'npy': '.npy'} # Suffix of the diagnostic dumps in each format
+diagnosticChunkRows = 65536 # Number of rows of a diagnostic dump formatted before they are written at once
+diagnosticStringBytes = 16 # Size in bytes of the text columns of npy diagnostic dumps, such as the face names of pairNodes
+diagnosticStageDumps = {} # Number of times each intermediate stage was dumped, numbering the dumps of a stage pickled more than once
+
+#_____________________________________
+#Multi-variant settings
+variantMemoryFactor = 4 # Memory used by the process of a variant, as a multiple of the size of the pickled nodes and elements
+variantThreadTimeout = 60 # Seconds waited for the background threads to end before the variants are forked
+
+#_____________________________________
+#Service settings
+serviceKeyBytes = 32 # Size in bytes of the random key generated by each service
+serviceKeySuffix = '.key' # Suffix of the file next to the Unix socket of the service holding its key
+serviceRequestTimeout = 60 # Seconds a client is given to authenticate and send its request before it is disconnected
+
+#_____________________________________
+#Parallel parsing settings
+inpShardBytes = 4*1024*1024 # Size in bytes of the shards the node and element sections are split into to be parsed by the Step3 pool
+inpScanBlockBytes = 1024*1024 # Size in bytes of the blocks read while looking for the first byte of a section
+inpShardColumns = {'node': 'iddd', 'element': 'iiiiiiiii'} # Array typecodes of the columns each shard of a section is returned in
+
+#_____________________________________
+#Distributed backend settings
+distributedChunkSize = 256 # Number of tasks sent to a worker at once
+distributedConnectTimeout = 60 # Seconds a worker keeps trying to reach the coordinator
+distributedKeyVariable = 'COHESIVE_DISTRIBUTED_KEY' # Environment variable handing the random key of a run to its local workers
+
+#_____________________________________
+#Memory planner settings
+plannerMemoryFraction = 0.8 # Fraction of the available memory used by the plan, the rest being left to the system and to estimation errors
+plannerNodeBytes = 400 # Estimated memory of a parsed node with its entries in the search lists
+plannerElementBytes = 700 # Estimated memory of a parsed element with its entries in the search lists
+plannerDamageElementBytes = 1500 # Estimated memory of a damage element in steps 4 to 10: its renumbered row, topology index, face pairs and new nodes
+plannerTaskBytes = 2048 # Estimated memory of a task handed to a pool while it waits for its result
+plannerDamageValuesPerLine = 16 # Element numbers on each line of the damage set, as written by Abaqus
+plannerMinimumPendingTasks = 1024 # Smallest number of tasks handed to a pool at once
+#Files holding the memory limit of the cgroup of this program, its memory use and the reclaimable page cache counted in it (cgroup v2 and v1)
+cgroupMemoryFiles = [	['/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory.current', '/sys/fs/cgroup/memory.stat', 'inactive_file'],\
+						['/sys/fs/cgroup/memory/memory.limit_in_bytes', '/sys/fs/cgroup/memory/memory.usage_in_bytes', '/sys/fs/cgroup/memory/memory.stat', 'total_inactive_file'] ]
+pendingTaskLimit = None # Number of tasks handed to a pool before the result of the first one is waited for, set by planMemory. None hands every task at once
+
+#_____________________________________
+#Dry run settings
+dryRunWorkers = [1, 2, 4, 8, 16, 32] # Numbers of processes the time and memory of each step are predicted for, core being added to them
+dryRunSampleBlocks = 16 # Number of evenly spaced blocks of lines read from the damage set to estimate its number of elements
+dryRunSampleLines = 4096 # Consecutive lines read in each of these blocks
+dryRunCalibrationLines = 20000 # Number of lines of the node and of the element sections parsed and timed to scale the step costs to this computer
+dryRunCalibrationRepeats = 3 # Number of times these lines are parsed, the fastest time being kept
+dryRunReferenceLineSeconds = 1.8e-6 # Seconds taken to parse one of these lines on the computer the step costs were measured on
+dryRunBaseBytes = 32*1024**2 # Memory used by the program before the model is read
+dryRunNewNodesPerFace = 2.4 # New nodes written for each shared face, as measured on hexahedral meshes
+#Costs of the steps of each engine measured on a model of 216000 hexahedral elements: the items each step goes through (the 'lines' of the
+#node and element sections, the 'damage' elements, the shared 'faces' or the 'output' lines), the seconds each item takes in this process
+#and to be handed to a process of a pool (None if the step does not use a pool), and whether the step only runs with (True) or without
+#(False) streamOutput
+dryRunStepCosts = {	'pool': [	['Step3', 'lines', 7.7e-6, 3.2e-6, None], ['Step4', 'damage', 24e-6, None, None],\
+								['Step5and6', 'damage', 17e-6, 65e-6, None], ['Step7-1', 'damage', 5.5e-6, None, None],\
+								['Step7-2', 'damage', 43e-6, 89e-6, None], ['Step7-3', 'faces', 30e-6, 148e-6, False],\
+								['Step8', 'damage', 12e-6, None, None], ['Step9and10', 'output', 5.4e-6, None, True],\
+								['Step9', 'output', 2.9e-6, None, False], ['Step10', 'output', 4.9e-6, None, False] ],\
+					'domain': [	['Step3', 'lines', 7.7e-6, 3.2e-6, None], ['Step4', 'damage', 24e-6, None, None],\
+								['Step5to7-2', 'damage', 128e-6, 36e-6, None], ['Step7-3', 'faces', 30e-6, 148e-6, False],\
+								['Step8', 'damage', 12e-6, None, None], ['Step9and10', 'output', 5.4e-6, None, True],\
+								['Step9', 'output', 2.9e-6, None, False], ['Step10', 'output', 4.9e-6, None, False] ],\
+					'outofcore': [	['Step3and4', 'lines', 8.1e-6, None, None], ['Step5and6', 'damage', 41e-6, None, None],\
+									['Step7', 'damage', 142e-6, None, None], ['Step8and9', 'damage', 33e-6, None, None],\
+									['10', 'output', 4.0e-6, None, None] ] }
+
+#_____________________________________
+#Progress settings
+progressFileName = "status-%s.json" # File of the report folder the progress is written to, with the input name
+progressBatchItems = 1000 # Items counted at once by iterProgress, for steps streaming their items instead of running them in a pool
+
+#_____________________________________
+#Python 3 settings
+outOfBandPickles = sys.version_info >= (3, 8) # Write the items of the arrays of a pickle after the pickled bytes instead of inside them, see pklObj
+outOfBandMagic = b'OOB1' # First bytes of the pickles written with their arrays out of band
+
+#_____________________________________
+#Spatial ordering settings
+spaceFillingCurveBits = 21 # Number of bits per coordinate of the grid points are snapped to before computing their curve position
+
+#_____________________________________
+#Damage region settings
+regionGridElements = 16 # Average number of elements per cell of the grid the element centroids are bucketed into, see buildCentroidGrid
 
 #_____________________________________
 # Global variables that are used to pass large data structures during multiprocesssing
 
+# Connections to the workers of the distributed backend as [listener, connections, local worker processes]
+coordinator = None
+# Held by the DistributedPool using the workers, as step 3 can run a pool in a background thread next to another one
+coordinatorLock = threading.Lock()
+
+# Finished steps with their seconds and StepProgress of each pool of the run, written to the status file by writeProgressStatus
+progressSteps = []
+progressTasks = []
+# Held while the status file is written, as the progress of each pool is reported by its own thread
+progressLock = threading.Lock()
+
+# New node numbers left at 0,0,0 by newNodeRow or iterNewNodes in the last run, reported by validateOutputInp
+fallbackNodeNumbers = []
+
 # Large data structures
 elementList = None
 elementListNormal = None
 nodeList = None
 elementNumbers = None
 cohesiveFaces = None
-elementNumberCohesive = None
 cohesive = None
 
 # Face orientation arrary
@@ -138,20 +494,21 @@ nodeListNodeIndex = None
 elementListNormalNumber = None
 elementListNormalIndex = None
 
-elementListNumber = None
-elementListIndex = None
-
-elementListFaceANumber = None
-elementListFaceAIndex = None
-elementListFaceBNumber = None
-elementListFaceBIndex = None
-elementListFaceCNumber = None
-elementListFaceCIndex = None
+# Topology index of the damage elements
+topology = None
 
 # Node and element starting numbers
 cohesiveNodeStartNumber = None
 cohesiveElementStartNumber = None
 
+# Blocks of shared memory attached by the processes of a SharedMemoryPool
+attachedBlocks = []
+
+# Global variables set by the initN functions, released when a step run in this process is over
+workerGlobals = ['elementList', 'elementListNormal', 'nodeList', 'faceOrientation',\
+				'nodeListNodeNumber', 'nodeListNodeIndex', 'elementListNormalNumber', 'elementListNormalIndex',\
+				'topology', 'cohesiveNodeStartNumber']
+
 #_____________________________________
 # General support functions used throughout the program
 def savingTime(step,timeStart,timeEnd):
@@ -171,11 +528,147 @@ def savingTime(step,timeStart,timeEnd):
 	global outputDirectory
 	global inputName
 	
-	FMT = '%d-%H-%M-%S'
-	difference = datetime.datetime.strptime(timeEnd,FMT)-datetime.datetime.strptime(timeStart,FMT)
-	with open("%s/time-%s.txt" %(outputDirectory,inputName), 'a') as f:
+	# Times only hold the day of the month, placed in January 1900 as strptime does without a year or month (Python 3.13 warns otherwise)
+	FMT = '%Y-%m-%d-%H-%M-%S'
+	difference = datetime.datetime.strptime('1900-01-'+timeEnd,FMT)-datetime.datetime.strptime('1900-01-'+timeStart,FMT)
+	with openText("%s/time-%s.txt" %(outputDirectory,inputName), 'a') as f:
 		f.writelines ("%s: %s\n" %(step, difference))
 
+	progressSteps.append([step.strip(), difference.total_seconds()])
+	writeProgressStatus()
+
+def writeProgressStatus():
+	"""Rewrites the status file of the report folder with the time taken by the finished steps and the progress of each pool.
+
+	The file is written next to the status file and renamed over it, so that programs reading it never find it half written.
+
+	"""
+	if progressInterval is None:
+		return
+
+	with progressLock:
+		status = {	'input': inputName, 'pid': os.getpid(), 'updated': time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),\
+					'steps': [{'step': step, 'seconds': seconds} for [step, seconds] in progressSteps],\
+					'progress': [task.status() for task in progressTasks]}
+		fileName = os.path.join(outputDirectory, progressFileName % inputName)
+		with openText(fileName + ".tmp", 'w') as fp:
+			fp.write(json.dumps(status, indent=1, separators=(',', ': '), sort_keys=True))
+		os.rename(fileName + ".tmp", fileName)
+
+class StepProgress(object):
+	"""Counts the items of a step whose results came back from its pool, reporting them every progressInterval seconds.
+
+	Args:
+		step (str): Name of the step
+		total (int): Number of items of the step
+		unit (str): Name of the items, such as 'elements'
+
+	A thread prints the items done, the throughput since the last report and the time left at that throughput, and rewrites the
+	status file with writeProgressStatus. A step without results since the last report is reported with the time since its last result.
+
+	"""
+	def __init__(self, step, total, unit):
+		self.step = step
+		self.total = total
+		self.unit = unit
+		self.done = 0
+		self.start = time.time()
+		self.end = None
+		self.last = [self.start, 0]
+		self.moved = self.start
+		self.rate = None
+		self.printed = False
+		self.stopped = threading.Event()
+		self.thread = None
+
+		with progressLock:
+			progressTasks.append(self)
+		writeProgressStatus()
+
+		if progressInterval is not None:
+			self.thread = threading.Thread(target=self.run)
+			self.thread.daemon = True
+			self.thread.start()
+
+	def update(self, items=1):
+		"""Counts items whose results came back."""
+		self.done = self.done + items
+
+	def run(self):
+		"""Reports the progress every progressInterval seconds until the step is finished."""
+		while not self.stopped.wait(progressInterval):
+			now = time.time()
+			[lastTime, lastDone] = self.last
+			self.rate = (self.done - lastDone) / (now - lastTime)
+			self.last = [now, self.done]
+			if self.rate > 0:
+				self.moved = now
+			print(self.describe())
+			self.printed = True
+			writeProgressStatus()
+
+	def finish(self):
+		"""Stops the reports once every result came back, printing the last one if earlier ones were printed."""
+		self.stopped.set()
+		if self.thread is not None:
+			self.thread.join()
+		self.end = time.time()
+		self.rate = self.done / max(self.end - self.start, 1e-6)
+		if self.printed:
+			print(self.describe())
+		writeProgressStatus()
+
+	def timeLeft(self):
+		"""Returns the seconds left at the throughput of the last report, or None if it is not known or zero."""
+		if self.end is not None:
+			return 0.0
+		if not self.rate:
+			return None
+		return (self.total - self.done) / self.rate
+
+	def describe(self):
+		"""Returns the progress line printed, such as "Step5and6: 12000/100000 elements (12.0%), 850.0 elements/s, 1m43s left"."""
+		done = "%s: %d/%d %s" % (self.step, self.done, self.total, self.unit)
+		if self.end is not None:
+			return "%s in %s" % (done, formatDuration(self.end - self.start))
+		done = "%s (%.1f%%)" % (done, 100.0 * self.done / max(1, self.total))
+		if not self.rate:
+			return "%s, no result for %s" % (done, formatDuration(time.time() - self.moved))
+		return "%s, %.1f %s/s, %s left" % (done, self.rate, self.unit, formatDuration(self.timeLeft()))
+
+	def status(self):
+		"""Returns the progress written to the status file."""
+		timeLeft = self.timeLeft()
+		return {	'step': self.step, 'unit': self.unit, 'state': 'running' if self.end is None else 'done',\
+					'completed': self.done, 'total': self.total,\
+					'itemsPerSecond': round(self.rate, 1) if self.rate is not None else None,\
+					'etaSeconds': round(timeLeft, 1) if timeLeft is not None else None,\
+					'elapsedSeconds': round((self.end if self.end is not None else time.time()) - self.start, 1)}
+
+def iterProgress(items, progress):
+	"""Yields items unchanged while counting them in the progress of a step.
+
+	Args:
+		items (iterable): Items gone through by the step
+		progress (StepProgress): Progress of the step
+
+	Returns:
+		items (iterator): The same items.
+
+	Items are counted progressBatchItems at a time under progressLock, so that threads can count items of the same step.
+
+	"""
+	count = 0
+	for item in items:
+		yield item
+		count = count + 1
+		if count == progressBatchItems:
+			with progressLock:
+				progress.update(count)
+			count = 0
+	with progressLock:
+		progress.update(count)
+
 def sortIntColumnForBisectSearch(unsortedList,column):
 	"""Takes a column from an unsorted list, converts it to int, and returns the sorted column and a map of each sorted element to its original index.
 			
@@ -230,760 +723,4659 @@ def bisectSearchSortedList(searchElement, sortedListElements, sortedListIndex):
 	
 	return sortedListIndex[index]
 	
-def sortElementListForFaceBisectSearch(unsortedList,face):
-	"""Sort a list in increasing order according to the 4 column given. Returns the sorted columns as well as its original index value.
+def findElementRows(elementNumbers, sortedListNumber, sortedListIndex):
+	"""Finds the rows of many element numbers at once in a list sorted for binary searching.
 			
 	Args:
-		unsortedList (list): Unsrted list to be sorted
-		face (list): A 4 length long list of ints dictating which columns to sort the unsortedList by.
-	
+		elementNumbers (list): Element numbers to look for
+		sortedListNumber (list): Element numbers sorted in increasing order, from sortIntColumnForBisectSearch
+		sortedListIndex (list): Paired list corresponding with sortedListNumber which points to the row of each element number
+
 	Returns:
-		sortedListNumber (list): Sorted columns in increasing order.
-		sortedListIndex (list): List of len(sortedListNumber) that maps each element in the sorted list back to its original index value.
+		rows (list): Row of each element number, or -1 for element numbers that could not be found.
 		
 	"""
-	sortedList= []
+	rows = []
+	for elementNumber in elementNumbers:
+		index = bisect.bisect_left(sortedListNumber, elementNumber)
+		if index < len(sortedListNumber) and sortedListNumber[index] == elementNumber:
+			rows.append(sortedListIndex[index])
+		else:
+			rows.append(-1)
+	return rows
 
-	# Grab node column, make it an integer, and its corresponding index value
-	for x in range(0,len(unsortedList)):
-		sortedList.append([unsortedList[x][face[0]],unsortedList[x][face[1]],unsortedList[x][face[2]],unsortedList[x][face[3]], x])
+# Support functions for the topology index of the damage elements built after step 4
+def elementRowIndex(elementList):
+	"""Builds the part of the topology index mapping element numbers to their row in elementList.
 
-	# Sort the node column with its index value attached
-	sortedList.sort(key = lambda r:(r[0], r[1], r[2], r[3]))
+	Args:
+		elementList (list): List of elements and defining node numbers
 
-	# Split the sorted node column and its old index value to prepare for bisect binary searching
-	sortedListNumber = []
-	sortedListIndex = []
-	for x in range(0,len(sortedList)):
-		sortedListNumber.append([sortedList[x][0],sortedList[x][1],sortedList[x][2],sortedList[x][3]])
-		sortedListIndex.append(sortedList[x][4])
-	
-	return [sortedListNumber,sortedListIndex]
+	Returns:
+		topology (dict): elementNumber holding the element numbers in increasing order and elementRow the row of each in elementList.
 
-# Support functions for copying data from old inp file to new inp file
-def copyFromFileLineNumber(inputFileName,outputFilePointer, start, stop):
-	"""Copys file lines from one file to a new file.
-			
-	Args:
-		inputFileName (str): File name of file containing lines to be copied
-		outputFilePointer (str): Opened file pointer to write lines to be copied
-		start (int): Starting line number to start copy from
-		stop (int): Ending line number to stop copying
-		
 	"""
-	# Account for the 1 off index between line number inf file and line number from read in
-	start = start - 1
-	stop = stop - 1
+	[elementNumber, elementRow] = sortIntColumnForBisectSearch(elementList, 0)
+	return {'elementNumber': array.array('i', elementNumber), 'elementRow': array.array('i', elementRow)}
 
-	with open(inputFileName) as file:
-		for i, line in enumerate(file):
-			if i >= start and i < stop:
-				outputFilePointer.writelines(line)
-			if i >= stop:
-				break
+def buildTopologyIndex(elementList):
+	"""Builds the topology index of the damage elements once so that the following steps query it instead of searching elementList.
 
-def endOfFileLineNumber(inputFileName):
-	"""Gets the total number of lines in a file. Function made for clarity.
-			
 	Args:
-		inputFileName (str): File name of the file to get total number of lines.
-		
+		elementList (list): List of elements and defining node numbers to have cohesive elements inserted into
+
 	Returns:
-		lines (int): Total number of lines in a file.
+		topology (dict): Arrays making up the index:
+			elementNumber, elementRow: element numbers in increasing order and their row in elementList (see elementRowIndex)
+			node, nodeOffset, nodeElementRow: node numbers in increasing order and the rows of the elements using them in CSR form,
+				rows nodeElementRow[nodeOffset[i]:nodeOffset[i+1]] using node[i] in increasing order
+			faceNeighbour: row of the element sharing face faceNames[c] of row r at 6*r + c, or -1 if the face is not shared
+
+	Node incidence and face adjacency describe the elements before their cohesive nodes are renumbered in step 7-2, while the
+	element rows stay valid afterwards. The index only holds arrays so it can be pickled and reused by later runs.
+
 	"""
-	lines = 0
-	with open(inputFileName) as file:
-		lines = sum(1 for line in file)
-	return lines
+	topology = elementRowIndex(elementList)
+
+	# Node incidence: rows using each node, once for each column holding it
+	incidences = sorted((elementList[r][k], r) for r in range(len(elementList)) for k in range(1, len(elementList[r])))
+
+	topology['node'] = array.array('i')
+	topology['nodeOffset'] = array.array('l')
+	topology['nodeElementRow'] = array.array('i', [r for (node, r) in incidences])
+	for i in range(len(incidences)):
+		if i == 0 or incidences[i][0] != incidences[i-1][0]:
+			topology['node'].append(incidences[i][0])
+			topology['nodeOffset'].append(i)
+	topology['nodeOffset'].append(len(incidences))
+
+	# Face adjacency: the backward face of an element is shared with the first element having the same nodes, in the same order, on its forward face
+	faceNeighbour = array.array('i', [-1])*(6*len(elementList))
+	for [forward, backward] in faceCombinations:
+		forwardFaces = {}
+		for r in range(len(elementList)):
+			forwardFaces.setdefault(tuple([elementList[r][i] for i in faceOrientationDefinition[forward]]), r)
+
+		for r in range(len(elementList)):
+			s = forwardFaces.get(tuple([elementList[r][i] for i in faceOrientationDefinition[backward]]))
+			if s is not None:
+				faceNeighbour[6*r + faceCodes[backward]] = s
+				if faceNeighbour[6*s + faceCodes[forward]] < 0:
+					faceNeighbour[6*s + faceCodes[forward]] = r
+	topology['faceNeighbour'] = faceNeighbour
+
+	return topology
+
+def topologyElementRow(topology, elementNumber):
+	"""Returns the row in elementList of an element number, with the same behaviour as bisectSearchSortedList."""
+	return bisectSearchSortedList(elementNumber, topology['elementNumber'], topology['elementRow'])
+
+def topologyNodeElementRows(topology, node):
+	"""Returns the rows in elementList of the elements using a node, in increasing order."""
+	i = bisect.bisect_left(topology['node'], node)
+	if i >= len(topology['node']) or topology['node'][i] != node:
+		return []
+	return topology['nodeElementRow'][topology['nodeOffset'][i]:topology['nodeOffset'][i+1]]
+
+def loadTopologyIndex(fileName, elementList):
+	"""Loads a topology index saved by an earlier run if it was built from the same damage elements.
 
-#Support functions for pickling and unpickling	
-def pklObj(obj, fileName):
-	"""Pickles a data stucture to disk for storage.
-			
 	Args:
-		obj (obj): Object to store to disk
-		fileName (str): File name to store object in pickled format
+		fileName (str): File name the topology index was pickled to
+		elementList (list): List of elements and defining node numbers the index should describe
 
 	Returns:
-		[] (list): Empty list.
-		
+		topology (dict): Topology index, or None if the file does not exist or describes other elements.
+
 	"""
-	pklFP = open(fileName, 'wb')
-	cPickle.dump(obj, pklFP, -1)
-	pklFP.close()
-	return []
-	
-def unpklObj(fileName):
-	"""Unpickles a data stucture from disk for use.
-			
+	if not os.path.isfile(fileName):
+		return None
+
+	topology = unpklObj(fileName)
+	if topology.get('elementKey') != topologyKey(elementList):
+		print("Topology index in %s was built from other damage elements and is rebuilt" % fileName)
+		return None
+	return topology
+
+def topologyKey(elementList):
+	"""Returns a key identifying the elements and nodes of elementList, in order, stored with saved topology indexes."""
+	return [len(elementList), hash(tuple(tuple(elem) for elem in elementList))]
+
+# Support functions for ordering elements along a space-filling curve
+def spreadBits(value):
+	"""Spreads the lower 21 bits of an integer so that two zero bits separate each of them (used to interleave 3 coordinates).
+
 	Args:
-		fileName (str): File name where the pickled object is stored
+		value (int): Integer coordinate of a grid cell
 
 	Returns:
-		obj (obj): The unpickled object for use.
-		
-	WARNING: (As copied from the manual for the pickle module)
-	The pickle module is not secure against erroneous or maliciously constructed data. 
-	Never unpickle data received from an untrusted or unauthenticated source.
-	
+		spread (int): Integer with bit i of value moved to bit 3i.
+
 	"""
-	pklFP = open(fileName, 'rb')
-	obj = cPickle.load(pklFP)
-	pklFP.close()
-	return obj
-	
-def delFile(fileName):
-	"""Deletes a file. Function made for clarity.
-			
+	value = value & 0x1fffff
+	value = (value | value << 32) & 0x1f00000000ffff
+	value = (value | value << 16) & 0x1f0000ff0000ff
+	value = (value | value << 8) & 0x100f00f00f00f00f
+	value = (value | value << 4) & 0x10c30c30c30c30c3
+	value = (value | value << 2) & 0x1249249249249249
+	return value
+
+def mortonKey(cell):
+	"""Computes the position of a grid cell along the Morton (Z-order) curve.
+
 	Args:
-		fileName (str): File name of file to be deleted
+		cell (list): Integer x, y, z coordinates of the grid cell
 
 	Returns:
-		[] (list): Empty list.
-		
-	"""
-	os.remove(fileName)
-	return [];	
+		key (int): Position of the cell along the curve.
 
-def findInpSectionStartEnd(startLineHeader, endLineHeader, fileName):
-		headerLength = len(startLineHeader)
-		enderLength = len(endLineHeader)
-		
-		headerLineNum = -1
-		enderLineNum = -1
-		
-		with open(fileName) as inpFile:
-			for num, line in enumerate(inpFile, 1):
-		
-				if startLineHeader == line[:headerLength]:
-					headerLineNum = num
-					
-				if endLineHeader == line [:enderLength]:
-					enderLineNum = num
-					
-				if enderLineNum > headerLineNum and headerLineNum > 0:
-					break
-		
-		return [headerLineNum, enderLineNum]
-	
-#_____________________________________
-# Subfunctions used by processes to perform multiprocessing tasks
+	"""
+	return (spreadBits(cell[0]) << 2) | (spreadBits(cell[1]) << 1) | spreadBits(cell[2])
 
-# Called in step 4
+def hilbertKey(cell):
+	"""Computes the position of a grid cell along the Hilbert curve.
 
-def init(_elementListNormal, _elementListNormalNumber, _elementListNormalIndex):
-	"""Fuction to initialize global read only variables for each process.
-			
 	Args:
-		_elementListNormal (list): List that contains the list of all elements and their defining node numbers
-		_elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
-		_elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
-	
+		cell (list): Integer x, y, z coordinates of the grid cell, each smaller than 2**spaceFillingCurveBits
+
+	Returns:
+		key (int): Position of the cell along the curve.
+
+	Uses Skilling's transform ("Programming the Hilbert curve", 2004) to turn the coordinates into the transposed Hilbert
+	index which is then interleaved like a Morton key.
+
 	"""
-	
-	global elementListNormal
-	global elementListNormalNumber
-	global elementListNormalIndex
-	
-	elementListNormal = _elementListNormal
-	elementListNormalNumber = _elementListNormalNumber
-	elementListNormalIndex = _elementListNormalIndex
-		
-def check(element):
-	"""Fuction processed by individual processes to search for an element from the enitre list of elements
-			
+	X = list(cell)
+	M = 1 << (spaceFillingCurveBits - 1)
+
+	# Inverse undo excess work
+	Q = M
+	while Q > 1:
+		P = Q - 1
+		for i in range(3):
+			if X[i] & Q:
+				X[0] ^= P
+			else:
+				t = (X[0] ^ X[i]) & P
+				X[0] ^= t
+				X[i] ^= t
+		Q >>= 1
+
+	# Gray encode
+	for i in range(1, 3):
+		X[i] ^= X[i-1]
+	t = 0
+	Q = M
+	while Q > 1:
+		if X[2] & Q:
+			t ^= Q - 1
+		Q >>= 1
+	for i in range(3):
+		X[i] ^= t
+
+	return mortonKey(X)
+
+def spaceFillingCurveOrder(points, curve):
+	"""Sorts points along a space-filling curve.
+
 	Args:
-		element (string): String containing the number of the element we want to search for in elementListNormal
-		
+		points (list): List of [x, y, z] coordinates
+		curve (str): Either 'morton' or 'hilbert'
+
 	Returns:
-		elementListNormalNode (list): Found element and its defining nodes. Will return wrong element if element being searched does not exist
-	
+		order (list): Indices of the points in the order they are visited by the curve. Ties keep their original order.
+
+	Points are snapped to a cubic grid of 2**spaceFillingCurveBits cells per side spanning their bounding box.
+
 	"""
-	
-	# Search for the element and its defining nodes from sorted list using bisect search
-	elementNumber = int(element)
-	index = bisectSearchSortedList(elementNumber, elementListNormalNumber, elementListNormalIndex)
-	elementListNormalNode = elementListNormal[index]
+	if not points:
+		return []
 
-	# Check to make sure the element retireved is the one we want (search can fail if element does not exist in elementListNormal)
-	if elementListNormalNode[0] == elementNumber:
-		return elementListNormalNode
-		
-	return []
+	curveKey = {'morton': mortonKey, 'hilbert': hilbertKey}[curve]
+
+	lower = [min(p[i] for p in points) for i in range(3)]
+	extent = max(max(p[i] for p in points) - lower[i] for i in range(3))
+	scale = ((1 << spaceFillingCurveBits) - 1)/extent if extent > 0 else 0.0
+
+	keys = []
+	for index in range(len(points)):
+		p = points[index]
+		keys.append((curveKey([int((p[i] - lower[i])*scale) for i in range(3)]), index))
+	keys.sort()
+
+	return [key[1] for key in keys]
+
+def elementCentroids(elementList, nodeList, nodeListNodeNumber, nodeListNodeIndex):
+	"""Computes the centroid of each element from the coordinates of its nodes.
 
-def func(elementNumbers, elementListNormal, elementListNormalNumber, elementListNormalIndex):
-	"""Fuction to set up the multiprocess procedure to get elements in the damage zone from list of normal elements.
-		
 	Args:
-		elementNumbers (list): List of element numbers to have cohesive elements inserted into
-		elementListNormal (list): List that contains the list of all elements and their defining node numbers
-		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
-		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
-	
+		elementList (list): List of elements and their defining node numbers
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the node number in nodeList
+
 	Returns:
-		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into.
-	
+		centroids (list): [x, y, z] centroid of each element of elementList.
+
 	"""
-	
-	#Retrieve the elements and their defining nodes given element numbers defined in elementNumbers. Store result in elementList
-	pool = mp.Pool(processes=core, initializer=init, initargs=(elementListNormal,elementListNormalNumber,elementListNormalIndex,))
-	
-	results = []
-	
-	for k in elementNumbers:
-		results.append(pool.apply_async(check,(k,)))
-	pool.close()
-	pool.join()
-	
-	elementList = []
-	
-	for result in results:
-		elementListNode = result.get()
-		if elementListNode != None:
-			elementList.append(elementListNode)
-	
-	return elementList
+	return [elementCentroid(elem, nodeList, nodeListNodeNumber, nodeListNodeIndex) for elem in elementList]
 
-# Called in Step 5 and 6
+def elementCentroid(elem, nodeList, nodeListNodeNumber, nodeListNodeIndex):
+	"""Computes the centroid of an element from the coordinates of its nodes, with the arguments of elementCentroids."""
+	centroid = [0.0, 0.0, 0.0]
+	for node in elem[1:9]:
+		coordinates = nodeList[bisectSearchSortedList(node, nodeListNodeNumber, nodeListNodeIndex)]
+		for i in range(3):
+			centroid[i] += float(coordinates[i+1])
+	return [c/8.0 for c in centroid]
+
+def parseDamageRegion(kind, value):
+	"""Builds a region of damageRegions from its command line value.
 
-def init2(_elementList, _faceOrientation, _elementListFaceANumber, _elementListFaceAIndex, _elementListFaceBNumber, _elementListFaceBIndex, _elementListFaceCNumber, _elementListFaceCIndex):
-	"""Fuction to initialize global read only variables for each process.
-			
 	Args:
-		_elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
-		_faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
-		_elementListFaceANumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		_elementListFaceAIndex (list): Paired list corresponding with elementListFaceANumber which points to index of the element number in _elementListNormal
-		_elementListFaceBNumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		_elementListFaceBIndex (list): Paired list corresponding with elementListFaceBNumber which points to index of the element number in _elementListNormal
-		_elementListFaceCNumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		_elementListFaceCIndex (list): Paired list corresponding with elementListFaceCNumber which points to index of the element number in _elementListNormal
-	
+		kind (str): 'box', 'sphere', 'cylinder' or 'voxels'
+		value (str): Comma separated numbers of the region, or the file name of the voxel mask
+
+	Returns:
+		region (list): [kind, numbers] or ['voxels', fileName].
+
+	Raises a ValueError for a region that cannot select any element, such as a cylinder of zero length or an empty voxel mask.
+
 	"""
-	
-	global elementList 
-	global faceOrientation
-	
-	global elementListFaceANumber
-	global elementListFaceAIndex
-	
-	global elementListFaceBNumber
-	global elementListFaceBIndex
-	
-	global elementListFaceCNumber
-	global elementListFaceCIndex
-	
-	elementList = _elementList
-	faceOrientation = _faceOrientation
-	
-	elementListFaceANumber = _elementListFaceANumber
-	elementListFaceAIndex = _elementListFaceAIndex
-	
-	elementListFaceBNumber = _elementListFaceBNumber
-	elementListFaceBIndex = _elementListFaceBIndex
-	
-	elementListFaceCNumber = _elementListFaceCNumber
-	elementListFaceCIndex = _elementListFaceCIndex
-		
-	
-def check2(elem):
-	"""Fuction processed by individual processes to search for cohesive faces from list of elements in the damage zone.
-			
+	if kind == 'voxels':
+		# The mask is read here only to report a broken mask before the model is parsed
+		loadVoxelMask(value)
+		return [kind, value]
+
+	numbers = [float(v) for v in value.split(',')]
+	if len(numbers) != {'box': 6, 'sphere': 4, 'cylinder': 7}[kind]:
+		raise ValueError("Wrong number of values for a %s region: %s" % (kind, value))
+	if kind == 'cylinder' and numbers[0:3] == numbers[3:6]:
+		raise ValueError("The two ends of the axis of a cylinder region are the same point: %s" % value)
+	if kind != 'box' and numbers[-1] < 0:
+		raise ValueError("Negative radius for a %s region: %s" % (kind, value))
+	return [kind, numbers]
+
+def loadVoxelMask(fileName):
+	"""Reads a voxel mask file.
+
 	Args:
-		elem (string): String containing the element in the damage zone we want to search faces for.
-		
+		fileName (str): File name of the voxel mask
+
 	Returns:
-		cohesiveFacesList (list): Found element, its connected element, and the shared cohesive face nodes. 
-	
-	"""
-	
-	cohesiveFacesList = []
+		[origin, size, voxels] (list): Corner of voxel 0,0,0, size of a voxel along x, y and z, and set of (i, j, k) voxels in the mask.
 
-	#combination A:
-	#Search for face A backward combination from sorted elementList in conbimation A forward
-	face = [elem[i] for i in faceOrientation['Ab']]
-	index = bisectSearchSortedList(face, elementListFaceANumber, elementListFaceAIndex)
-	elementListEntry = elementList[index]
+	The first line of the file holds the origin and the voxel size as "x, y, z, dx, dy, dz", and each following line the
+	"i, j, k" indices of a voxel of the damage zone. Voxel i, j, k spans from origin + i*dx to origin + (i+1)*dx along x, and so on.
+	Raises a ValueError if the file is not a voxel mask, its voxel size is not positive or it holds no voxel.
 
-	if face == [elementListEntry[i] for i in faceOrientation['Af']]:
-		cohesiveFacesList.append([elementListEntry[0], 'Af'] + face)
-		cohesiveFacesList.append([elem[0], 'Ab']  + face)
-			
-	#combination B:
-	#Search for face B backward combination from sorted elementList in conbimation B forward
-	face = [elem[i] for i in faceOrientation['Bb']]
-	index = bisectSearchSortedList(face, elementListFaceBNumber, elementListFaceBIndex)
-	elementListEntry = elementList[index]
-
-	if face == [elementListEntry[i] for i in faceOrientation['Bf']]:
-		cohesiveFacesList.append([elementListEntry[0], 'Bf'] + face)
-		cohesiveFacesList.append([elem[0], 'Bb']  + face)
-
-	#combination C:
-	#Search for face C backward combination from sorted elementList in conbimation C forward
-	face = [elem[i] for i in faceOrientation['Cb']]
-	index = bisectSearchSortedList(face, elementListFaceCNumber, elementListFaceCIndex)
-	elementListEntry = elementList[index]
-
-	if face == [elementListEntry[i] for i in faceOrientation['Cf']]:
-		cohesiveFacesList.append([elementListEntry[0], 'Cf'] + face)
-		cohesiveFacesList.append([elem[0], 'Cb']  + face)
-	
-	return cohesiveFacesList
+	"""
+	with open(fileName) as fp:
+		numbers = [float(v) for v in fp.readline().split(',')]
+		voxels = set(tuple(int(v) for v in line.split(',')) for line in fp if line.strip())
+
+	if len(numbers) != 6 or any(len(v) != 3 for v in voxels):
+		raise ValueError("The voxel mask %s should hold x, y, z, dx, dy, dz on its first line and i, j, k on the others" % fileName)
+	if min(numbers[3:6]) <= 0:
+		raise ValueError("The voxel size of the voxel mask %s must be positive" % fileName)
+	if not voxels:
+		raise ValueError("The voxel mask %s holds no voxel" % fileName)
+	return [numbers[0:3], numbers[3:6], voxels]
+
+def insideRegion(point, region):
+	"""Tells if a point lies inside a region of damageRegions, with voxel masks already loaded by loadVoxelMask."""
+	[kind, numbers] = region
+
+	if kind == 'box':
+		return all(min(numbers[i], numbers[i+3]) <= point[i] <= max(numbers[i], numbers[i+3]) for i in range(3))
+
+	if kind == 'sphere':
+		return sum((point[i] - numbers[i])**2 for i in range(3)) <= numbers[3]**2
+
+	if kind == 'cylinder':
+		axis = [numbers[i+3] - numbers[i] for i in range(3)]
+		relative = [point[i] - numbers[i] for i in range(3)]
+		length = sum(a*a for a in axis)
+		t = sum(axis[i]*relative[i] for i in range(3)) / length
+		if t < 0 or t > 1:
+			return False
+		return sum((relative[i] - t*axis[i])**2 for i in range(3)) <= numbers[6]**2
+
+	[origin, size, voxels] = numbers
+	return tuple(int(math.floor((point[i] - origin[i])/size[i])) for i in range(3)) in voxels
+
+def insideRegionMask(xs, ys, zs, region):
+	"""Tells which points lie inside a region of damageRegions, with the same arithmetic as insideRegion one coordinate at a time.
 
-def func2(elementList, faceOrientation, elementListFaceANumber, elementListFaceAIndex, elementListFaceBNumber, elementListFaceBIndex, elementListFaceCNumber, elementListFaceCIndex):
-	"""Fuction to set up the multiprocess procedure to find cohesive faces from elements in the damange zone.
-		
 	Args:
-		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
-		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
-		elementListFaceANumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		elementListFaceAIndex (list): Paired list corresponding with elementListFaceANumber which points to index of the element number in _elementListNormal
-		elementListFaceBNumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		elementListFaceBIndex (list): Paired list corresponding with elementListFaceBNumber which points to index of the element number in _elementListNormal
-		elementListFaceCNumber (list): List that contains element numbers in elementList sorted in increasing order according to orientation A
-		elementListFaceCIndex (list): Paired list corresponding with elementListFaceCNumber which points to index of the element number in _elementListNormal
-	
+		xs, ys, zs (list): Coordinates of the points
+		region (list): Region of damageRegions, with voxel masks already loaded by loadVoxelMask
+
 	Returns:
-		cohesiveFaces (list): List of all cohesive faces defined as [element_number, orientation, node_number, node_number2, ..., node_numberN]
-	
-	Corresponding node index numbers for each face can be found through faceOrientation[orientation].
-	
+		mask (list): True for each point inside the region.
+
 	"""
-	
-	#Define all connected faces in cohesive zone region and their corresponding element, face orientation, and nodes
-	pool2 = mp.Pool(processes=core,initializer=init2, initargs=(elementList, faceOrientation, elementListFaceANumber, elementListFaceAIndex, elementListFaceBNumber, elementListFaceBIndex, elementListFaceCNumber, elementListFaceCIndex,))
-	
-	results = []
-	
-	for elem in elementList:
-		results.append(pool2.apply_async(check2,(elem,)))
-	pool2.close()
-	pool2.join()
-	
-	cohesiveFaces = []
-	
-	for result in results:
-		cohesiveFacesList = result.get()
-		cohesiveFaces.extend(cohesiveFacesList)
-		
-	return cohesiveFaces
-	
-	
-# Called in step 7-1
-def init3(_cohesiveFaceNodes):
-	"""Fuction to initialize global read only variables for each process.
-			
+	[kind, numbers] = region
+	repeat = itertools.repeat
+
+	if kind == 'box':
+		tests = []
+		for (i, axis) in enumerate([xs, ys, zs]):
+			tests.append(map(operator.le, repeat(min(numbers[i], numbers[i+3])), axis))
+			tests.append(map(operator.le, axis, repeat(max(numbers[i], numbers[i+3]))))
+		return list(map(all, zip(*tests)))
+
+	if kind == 'sphere':
+		squares = [map(operator.pow, map(operator.sub, axis, repeat(numbers[i])), repeat(2)) for (i, axis) in enumerate([xs, ys, zs])]
+		return list(map(operator.le, map(operator.add, map(operator.add, squares[0], squares[1]), squares[2]), repeat(numbers[3]**2)))
+
+	if kind == 'cylinder':
+		axisVector = [numbers[i+3] - numbers[i] for i in range(3)]
+		relative = [list(map(operator.sub, axis, repeat(numbers[i]))) for (i, axis) in enumerate([xs, ys, zs])]
+		length = sum(a*a for a in axisVector)
+		products = [map(operator.mul, repeat(axisVector[i]), relative[i]) for i in range(3)]
+		t = list(map(operator.truediv, map(operator.add, map(operator.add, products[0], products[1]), products[2]), repeat(length)))
+		squares = [map(operator.pow, map(operator.sub, relative[i], map(operator.mul, t, repeat(axisVector[i]))), repeat(2)) for i in range(3)]
+		near = map(operator.le, map(operator.add, map(operator.add, squares[0], squares[1]), squares[2]), repeat(numbers[6]**2))
+		return list(map(all, zip(map(operator.ge, t, repeat(0)), map(operator.le, t, repeat(1)), near)))
+
+	return list(map(insideRegion, zip(xs, ys, zs), repeat(region)))
+
+def buildCentroidGrid(elementListNormal, nodeList, nodeListNodeNumber, nodeListNodeIndex):
+	"""Buckets the centroids of the elements into a grid of cubic cells holding regionGridElements elements on average.
+
 	Args:
-		_cohesiveFaceNodes (list): List of cohesive faces
-	
+		elementListNormal (list): List of all elements and their defining node numbers
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the node number in nodeList
+
+	Returns:
+		grid (dict): 'lower' corner of the grid, 'size' of a cell, 'count' of cells along each axis less one, 'centroids' x, y and z
+			arrays of the centroid of each row of elementListNormal, and the rows of each cell in CSR form: 'cell' the numbers of
+			the cells holding a centroid in increasing order and cellRow[cellOffset[c]:cellOffset[c+1]] the rows in cell[c].
+
+	Cell i, j, k is numbered (i*(count[1] + 1) + j)*(count[2] + 1) + k, so that the cells of a column along z follow each other.
+	The centroids are computed one node column at a time, with the additions of elementCentroid. The grid only holds arrays so
+	it can be pickled and reused by later runs, see readCentroidGrid.
+
 	"""
+	rowCount = len(elementListNormal)
+	if rowCount == 0:
+		return {'lower': [0.0, 0.0, 0.0], 'size': 1.0, 'count': [0, 0, 0], 'centroids': [array.array('d'), array.array('d'), array.array('d')],\
+				'cell': array.array('l'), 'cellOffset': array.array('l', [0]), 'cellRow': array.array('i')}
+
+	# Row of each node number, keeping the first row of a repeated number as bisectSearchSortedList does
+	nodeRow = dict(zip(reversed(nodeListNodeNumber), reversed(nodeListNodeIndex)))
+	coordinates = [list(map(float, map(operator.itemgetter(i), nodeList))) for i in range(1, 4)]
+
+	sums = [[0.0]*rowCount for i in range(3)]
+	for k in range(1, 9):
+		rows = list(map(nodeRow.get, map(operator.itemgetter(k), elementListNormal)))
+		if None in rows:
+			rows = [bisectSearchSortedList(elem[k], nodeListNodeNumber, nodeListNodeIndex) if row is None else row for (elem, row) in zip(elementListNormal, rows)]
+		sums = [list(map(operator.add, total, map(axis.__getitem__, rows))) for (total, axis) in zip(sums, coordinates)]
+	rows = None
+	coordinates = None
+	centroids = [array.array('d', map(operator.truediv, total, itertools.repeat(8.0))) for total in sums]
+	sums = None
+
+	lower = [min(c) for c in centroids]
+	upper = [max(c) for c in centroids]
+	size = max(upper[i] - lower[i] for i in range(3)) / max(1, int(round((rowCount/float(regionGridElements))**(1/3.0))))
+	if size <= 0:
+		size = 1.0
+	count = [int((upper[i] - lower[i])/size) for i in range(3)]
+
+	index = [map(int, map(operator.truediv, map(operator.sub, centroids[i], itertools.repeat(lower[i])), itertools.repeat(size))) for i in range(3)]
+	cellNumbers = list(map(operator.add, map(operator.mul, map(operator.add, map(operator.mul, index[0], itertools.repeat(count[1] + 1)), index[1]),\
+										itertools.repeat(count[2] + 1)), index[2]))
+
+	# Rows sorted by cell, in increasing order within each cell
+	order = sorted(range(rowCount), key=cellNumbers.__getitem__)
+	sortedCells = list(map(cellNumbers.__getitem__, order))
+	cellNumbers = None
+	starts = [0] + list(itertools.compress(itertools.count(1), map(operator.ne, itertools.islice(sortedCells, 1, None), sortedCells)))
+
+	return {'lower': lower, 'size': size, 'count': count, 'centroids': centroids, 'cell': array.array('l', map(sortedCells.__getitem__, starts)),\
+			'cellOffset': array.array('l', starts + [rowCount]), 'cellRow': array.array('i', order)}
+
+def centroidGridKey(sections):
+	"""Returns a key identifying the node and element sections of the input inp file, stored with saved centroid grids.
 
-	global cohesiveFaceNodes 
-	
-	cohesiveFaceNodes = _cohesiveFaceNodes
-		
-def check3(elem):
-	"""Fuction processed by individual processes to search each node found in each element in the damage zone to see which nodes make up of cohesive faces.
-			
 	Args:
-		elem (list): Element and nodes defining the element to be searched for cohesive face node numbers.
-		
+		sections (dict): Line numbers of the sections found in steps 1 and 2
+
+	Like the index of the include store, the key holds the size and modification time of the input inp file instead of a
+	digest of its sections, so that reusing a grid reads nothing of the model.
+
+	"""
+	stat = os.stat(inputFile)
+	return [os.path.abspath(inputFile), stat.st_size, stat.st_mtime, sections['nodeStart'], sections['nodeEnd'],\
+			sections['elementNormalStart'], sections['elementNormalEnd'], regionGridElements]
+
+def readCentroidGrid(elementListNormal, nodeList, nodeListNodeNumber, nodeListNodeIndex, sections):
+	"""Returns the centroid grid of buildCentroidGrid, reusing the one saved to centroidGridFile by an earlier run on the same model.
+
+	Args:
+		elementListNormal (list): List of all elements and their defining node numbers
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the node number in nodeList
+		sections (dict): Line numbers of the sections found in steps 1 and 2
+
 	Returns:
-		support (list): 2D list of index numbers and element numbers to be added to nodeSupport
-	
+		grid (dict): Grid of the element centroids.
+
+	A grid built here is saved to centroidGridFile if it is set.
+
 	"""
-	
-	support = []
-	checkNodes = elem[1:]
-	
-	for i in checkNodes:
-		index = bisect.bisect_left(cohesiveFaceNodes, i)
-		if index < len(cohesiveFaceNodes) and cohesiveFaceNodes[index] == i:
-			support.append([index, elem[0]])
-	return support
+	key = centroidGridKey(sections)
+	if centroidGridFile is not None and os.path.isfile(centroidGridFile):
+		grid = unpklObj(centroidGridFile)
+		if grid.get('modelKey') == key:
+			return grid
+		print("Centroid grid in %s was built from another model and is rebuilt" % centroidGridFile)
+
+	grid = buildCentroidGrid(elementListNormal, nodeList, nodeListNodeNumber, nodeListNodeIndex)
+	if centroidGridFile is not None:
+		grid['modelKey'] = key
+		pklObj(grid, centroidGridFile)
+	return grid
+
+def selectDamageElements(elementListNormal, regions, grid):
+	"""Selects the elements whose centroid lies inside any of the regions.
 
-def func3(elementList, cohesiveFaces):
-	"""Fuction to set up the multiprocess procedure to find each element in the damage zone that connects with an affected node.
-		
 	Args:
-		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
-		cohesiveFaceNodes (list): List of cohesive faces
-	
+		elementListNormal (list): List of all elements and their defining node numbers
+		regions (list): Regions of damageRegions
+		grid (dict): Grid of the element centroids from buildCentroidGrid
+
+	Returns:
+		elementNumbers (list): Numbers of the selected elements in increasing order.
+
+	Only the elements in the cells of the grid met by the bounding box of a region are tested, one column of cells along z at
+	a time, so elements far from the damage zone are never looked at. The service keeps the grid to answer every request with
+	regions, and runs can reuse it through centroidGridFile.
+
 	"""
-	# Information reordering to grab only the cohesive element and their face nodes. Also removes duplicates (if any)
-	cohesiveFaces = [([col[0]] + col[2:]) for col in cohesiveFaces]
-	
-	#Make a list of all unique nodes that make up of cohesive faces and sort them
-	cohesiveFaces = map(lambda x: x[1:], cohesiveFaces)
-	cohesiveFaces = list(set(int(i) for j in cohesiveFaces for i in j))
-	cohesiveFaces.sort()
-	
-	pool2 = mp.Pool(processes=core,initializer=init3, initargs=(cohesiveFaces,))
+	[lower, size, count, centroids] = [grid['lower'], grid['size'], grid['count'], grid['centroids']]
+	[cell, cellOffset, cellRow] = [grid['cell'], grid['cellOffset'], grid['cellRow']]
+
+	regions = [[kind, loadVoxelMask(numbers)] if kind == 'voxels' else [kind, numbers] for [kind, numbers] in regions]
+
+	# Bounding box of each region
+	bounds = []
+	for [kind, numbers] in regions:
+		if kind == 'box':
+			bounds.append([[min(numbers[i], numbers[i+3]) for i in range(3)], [max(numbers[i], numbers[i+3]) for i in range(3)]])
+		elif kind == 'sphere':
+			bounds.append([[numbers[i] - numbers[3] for i in range(3)], [numbers[i] + numbers[3] for i in range(3)]])
+		elif kind == 'cylinder':
+			bounds.append([[min(numbers[i], numbers[i+3]) - numbers[6] for i in range(3)], [max(numbers[i], numbers[i+3]) + numbers[6] for i in range(3)]])
+		else:
+			[origin, voxelSize, voxels] = numbers
+			bounds.append([[origin[i] + min(v[i] for v in voxels)*voxelSize[i] for i in range(3)], [origin[i] + (max(v[i] for v in voxels) + 1)*voxelSize[i] for i in range(3)]])
+
+	rows = set()
+	for (region, [low, high]) in zip(regions, bounds):
+		# Cells met by the bounding box of the region, within the grid
+		ranges = [range(max(0, int(math.floor((low[i] - lower[i])/size))), min(count[i], int(math.floor((high[i] - lower[i])/size))) + 1) for i in range(3)]
+		if not all(ranges):
+			continue
+
+		candidates = array.array('i')
+		for (i, j) in itertools.product(ranges[0], ranges[1]):
+			first = (i*(count[1] + 1) + j)*(count[2] + 1)
+			[a, b] = [bisect.bisect_left(cell, first + ranges[2][0]), bisect.bisect_left(cell, first + ranges[2][-1] + 1)]
+			candidates.extend(cellRow[cellOffset[a]:cellOffset[b]])
+
+		mask = insideRegionMask(*([list(map(axis.__getitem__, candidates)) for axis in centroids] + [region]))
+		rows.update(itertools.compress(candidates, mask))
+
+	return sorted(elementListNormal[row][0] for row in rows)
+
+def coincidentNodeMap(elementList, nodeList, nodeListNodeNumber, nodeListNodeIndex, tolerance):
+	"""Finds the nodes of the damage elements lying at the same position as another one within a tolerance.
 
-	results = []
-	
-	#Go through elementList and check if any of the nodes lie in the unqiue list of nodes in the list of cohesive faces. For each that appear, insert to support.
-	for elem in elementList:
-		results.append(pool2.apply_async(check3,(elem,)))
-	pool2.close()
-	pool2.join()
-	
-	#Make a list of elements with a cohesive face and define which nodes are affected by inserting cohesive nodes
-	nodeSupport = [[i] for i in cohesiveFaces] #Variable to store all cohesive nodes and cohesive elements attached to those nodes
-	
-	num = 0
-	for result in results:
-		
-		support = result.get()
-		
-		if support != None:
-			for i in range(len(support)):
-				nodeSupport[support[i][0]].extend([support[i][1]])
-			
-	return nodeSupport
-	
-		
-# Called in step 7-2
-def init4(_elementList, _elementListNumber, _elementListIndex, _cohesiveNodeStartNumber):
-	"""Fuction to initialize global read only variables for each process.
-			
 	Args:
-		_elementList (list): List of element numbers to have cohesive elements inserted into
-		_elementListNumber (list): List that contains element numbers in elementList sorted in increasing order
-		_elementListIndex (list): Paired list corresponding with _elementListNumber which points to index of the element number in _elementList
-		_cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
-	
+		elementList (list): List of elements and their defining node numbers
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the node number in nodeList
+		tolerance (float): Largest distance along each axis between two coincident nodes
+
+	Returns:
+		nodeMap (dict): Smallest node number of its group of coincident nodes for each node that is not the smallest one.
+
+	Nodes are hashed into a uniform grid of cells as wide as the tolerance, so each node is only compared with the nodes of the 27
+	cells around it. Groups are joined through chains of coincident nodes with a union-find keyed by node number.
+
 	"""
-	
-	global elementList
-	global elementListNumber
-	global elementListIndex
-	global cohesiveNodeStartNumber
-	
-	elementList = _elementList
-	elementListNumber = _elementListNumber
-	elementListIndex = _elementListIndex
-	cohesiveNodeStartNumber = _cohesiveNodeStartNumber
-	
-def check4(n):
-	"""Fuction processed by individual processes to search for elements attached to each cohesive face node.
-			
+	parent = {}
+	grid = {}
+	neighbours = list(itertools.product([-1, 0, 1], repeat=3))
+
+	def find(node):
+		# Walk up to the root of the group, halving the path on the way
+		while parent[node] != node:
+			parent[node] = parent[parent[node]]
+			node = parent[node]
+		return node
+
+	for node in sorted(set(n for elem in elementList for n in elem[1:9])):
+		coordinates = nodeList[bisectSearchSortedList(node, nodeListNodeNumber, nodeListNodeIndex)]
+		position = [float(coordinates[i]) for i in range(1, 4)]
+		cell = tuple(int(math.floor(p/tolerance)) for p in position)
+		parent[node] = node
+
+		for offset in neighbours:
+			for [other, otherPosition] in grid.get((cell[0]+offset[0], cell[1]+offset[1], cell[2]+offset[2]), ()):
+				if max(abs(position[i] - otherPosition[i]) for i in range(3)) <= tolerance:
+					# Nodes are visited in increasing order, so the root kept is the smallest node of the group
+					[root, otherRoot] = [find(node), find(other)]
+					parent[max(root, otherRoot)] = min(root, otherRoot)
+
+		grid.setdefault(cell, []).append([node, position])
+
+	return dict((node, find(node)) for node in parent if find(node) != node)
+
+def mergeCoincidentNodes(elementList, nodeMap):
+	"""Replaces the nodes of the damage elements by the smallest node number of their group of coincident nodes.
+
 	Args:
-		n (list): Node number and list of elements attached to the node.
-		
+		elementList (list): List of elements and their defining node numbers, changed in place
+		nodeMap (dict): Node numbers to replace, from coincidentNodeMap
+
 	Returns:
-		[tempNode, fixNode] (list): lement number and node that needs to be fixed as well as new nodes to be added to the nodeList
-		
-	Format of n = [nodenumber, element1, element2,..., elementN]. Number of nodes in n will range from 2 to 8 nodes.
-	
+		collapsed (list): Element numbers of the elements left with the same node more than once, which the tolerance was too large for.
+
 	"""
-	tempNode = []
-	fixNode = []
-	
-	#Increment number for each element that uses the same node number
-	increase = cohesiveNodeStartNumber
-	
-	#For each element that uses the node number
-	for r in n[2:]:
+	collapsed = []
+	for elem in elementList:
+		elem[1:9] = [nodeMap.get(n, n) for n in elem[1:9]]
+		if len(set(elem[1:9])) < 8:
+			collapsed.append(elem[0])
+	return collapsed
 
-		#Find the element in elementList using binary search
-		index = bisectSearchSortedList(r, elementListNumber, elementListIndex)
-		elementListNode = elementList[index]
+def partitionDamageZone(elementList, topology, centroids, subdomainCount, curve):
+	"""Splits the damage zone into subdomains of neighbouring elements and finds the halo of each subdomain.
 
-		if r == elementListNode[0]: #r is the element number
-		
-			#Increase the node number by the increment number for each element found and record this change for later modifications
-			for k in range(1,9):
-				if	n[0] == elementListNode[k]:
-					# Store changes to be made into queue for editing elementList at main program
-					fixNodeNumber = [index,k,(n[0] + increase)]
-					fixNode.append(fixNodeNumber)
-					tempNode.append(n[0]+increase)
-			increase = increase + cohesiveNodeStartNumber
-	return [tempNode, fixNode]
-				   
-def func4(nodeSupport, elementList, elementListNumber, elementListIndex, cohesiveNodeStartNumber):
-	"""Fuction to set up the multiprocess procedure to renumber repeated nodes that make up of cohesive faces
-	
 	Args:
-		nodeSupport (list): List of nodes and affected elements that need to be modified.
-		elementList (list): List of element numbers to have cohesive elements inserted into
-		elementListNumber (list): List that contains element numbers in elementList sorted in increasing order
-		elementListIndex (list): Paired list corresponding with elementListNumber which points to index of the element number in elementList
-		cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
+		elementList (list): List of elements and defining node numbers to have cohesive elements inserted into
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+		centroids (list): [x, y, z] centroid of each element of elementList
+		subdomainCount (int): Number of subdomains to split the damage zone into
+		curve (str): Space-filling curve used to group neighbouring elements, either 'morton' or 'hilbert'
 
 	Returns:
-		tempNodeNode (list): List of newly created node numbers that need their positions to be defined
-		
+		subdomains (list): [positions, owned] for each subdomain where positions are the sorted indices in elementList of the
+			elements of the subdomain and its halo, and owned flags the elements that belong to the subdomain.
+
+	Subdomains are contiguous chunks of the elements sorted along the space-filling curve. The halo of a subdomain is made of
+	the elements of other subdomains sharing at least one node with it.
+
 	"""
-	pool2 = mp.Pool(processes=core, initializer = init4, initargs=(elementList, elementListNumber, elementListIndex, cohesiveNodeStartNumber,))
-	
-	results = []
-	
-	for a in nodeSupport:
-		results.append(pool2.apply_async(check4,args=(a,)))
-	pool2.close()
-	pool2.join()
-	
-	tempNodeNode = []
-	
-	for result in results:
-		(tempNodes, fixElementNodes) = result.get()
-		
-		tempNodeNode.append(tempNodes)
-		
-		#Write changes marked by the processes into elementList
-		for i in range(len(fixElementNodes)):
-			elementList[fixElementNodes[i][0]][fixElementNodes[i][1]] = fixElementNodes[i][2]
-			
-	return tempNodeNode
+	order = spaceFillingCurveOrder(centroids, curve)
+	size = max(1, (len(order) + subdomainCount - 1)//subdomainCount)
+
+	owner = [0]*len(elementList)
+	for i in range(len(order)):
+		owner[order[i]] = i//size
+	subdomainCount = (len(order) + size - 1)//size
+
+	# Elements using a node shared by several subdomains are in the halo of the other subdomains
+	halo = [set() for s in range(subdomainCount)]
+	nodeOffset = topology['nodeOffset']
+	for i in range(len(topology['node'])):
+		rows = topology['nodeElementRow'][nodeOffset[i]:nodeOffset[i+1]]
+		nodeOwners = set(owner[p] for p in rows)
+		if len(nodeOwners) > 1:
+			for p in rows:
+				for s in nodeOwners:
+					if s != owner[p]:
+						halo[s].add(p)
+
+	subdomains = []
+	for s in range(subdomainCount):
+		positions = sorted(set(order[s*size:(s+1)*size]) | halo[s])
+		subdomains.append([positions, [owner[p] == s for p in positions]])
+
+	return subdomains
+
+def restoreOriginalOrder(reorderedList, order):
+	"""Puts back the entries of a reordered list in their original order.
 
-# Called in step 7-3
-def init5(_nodeList, _nodeListNodeNumber, _nodeListNodeIndex, _cohesiveNodeStartNumber):
-	"""Fuction to initialize global read only variables for each process.
-			
 	Args:
-		_nodeList (list): List of node numbers and their positions
-		_nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
-		_nodeListNodeIndex (list): Paired list corresponding with _nodeListNodeNumber which points to index of the element number in _nodeList
-		_cohesiveNodeStartNumber (list): Starting node number when creating cohesive nodes
-	
+		reorderedList (list): List where entry i was originally at position order[i]
+		order (list): Original position of each entry of reorderedList
+
+	Returns:
+		originalList (list): Entries of reorderedList in their original order.
+
 	"""
-	
-	global nodeList
-	global nodeListNodeNumber
-	global nodeListNodeIndex
-	global cohesiveNodeStartNumber
+	originalList = [None]*len(reorderedList)
+	for i in range(len(order)):
+		originalList[order[i]] = reorderedList[i]
+	return originalList
+
+def originalFacePairOrder(cohesiveFaces, elementListNumber, elementListOriginalPosition):
+	"""Finds the order the cohesive face pairs would have been found in had elementList not been reordered.
 
-	nodeList = _nodeList
-	nodeListNodeNumber = _nodeListNodeNumber
-	nodeListNodeIndex = _nodeListNodeIndex
-	cohesiveNodeStartNumber = _cohesiveNodeStartNumber
-	
-def check5(r):
-	"""Fuction processed by individual processes to search for the coordinates of the original node, copy those coordinates to newly created nodes and add them to nodeList.
-			
 	Args:
-		r (string): Newly created node number.
-		
+		cohesiveFaces (dict): Face pair table of the cohesive faces
+		elementListNumber (list): List that contains element numbers in elementList sorted in increasing order
+		elementListOriginalPosition (list): Paired list corresponding with elementListNumber which points to the position of the element before reordering
+
 	Returns:
-		[r,nodeList[index][1],nodeList[index][2],nodeList[index][3]] (list): Newly created node number entry to be added to nodeList.
-	
+		pairOrder (list): Index of each cohesive face pair listed in their original order.
+
 	"""
-	
-	# Calculate quotient and remainder of modified node number
-	nodeNumCheck = int(r)
-	quotientNodeNumber = nodeNumCheck/cohesiveNodeStartNumber
-	remainderNodeNumber = nodeNumCheck%cohesiveNodeStartNumber
+	keys = []
+	for p in range(facePairCount(cohesiveFaces)):
+		keys.append([bisectSearchSortedList(cohesiveFaces['backwardElement'][p], elementListNumber, elementListOriginalPosition), cohesiveFaces['backwardFace'][p], p])
+	keys.sort()
+	return [key[2] for key in keys]
 
-	# Make sure modified node number falls within correct numbering conventions
-	if quotientNodeNumber >= 1 and quotientNodeNumber < 8:
+# Support functions for the face pair table holding the cohesive faces found in step 5 and 6
+def newFacePairTable():
+	"""Creates an empty face pair table.
 
-		# Find original node number from sorted list
-		index = bisectSearchSortedList(remainderNodeNumber, nodeListNodeNumber, nodeListNodeIndex)
-		nodeNum = nodeList[index][0]
+	Returns:
+		table (dict): Empty array for each column of facePairColumns.
 
-		# Check to make sure node number found at index matches the original node number we are looking for (could be skipped)
-		if int(nodeNum) == remainderNodeNumber:
-			return [r,nodeList[index][1],nodeList[index][2],nodeList[index][3]]
+	"""
+	table = {}
+	for [column, typeCode] in facePairColumns:
+		table[column] = array.array(typeCode)
+	return table
 
-	#Should never get here
-	return [r, 0 ,0, 0]
+def appendFacePairs(table, facePairs):
+	"""Appends face pairs to a face pair table.
 
-def func5(tempNodeNode, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber):
-	"""Fuction to set up the multiprocess procedure to get create new node entries for the newly created nodes.
-	
 	Args:
-		tempNodeNode (list): List of cohesive node numbers that need to be created
-		nodeList (list): List of node numbers and their positions
-		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
-		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the element number in nodeList
-		cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
-	
+		table (dict): Face pair table
+		facePairs (list): Face pairs given as rows with one value per column of facePairColumns
+
 	"""
-	
-	pool2 = mp.Pool(processes=core, initializer = init5, initargs=(nodeList,nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber,))
-	
-	results = []
-	
-	for a in tempNodeNode:
-		for r in a:
-			results.append(pool2.apply_async(check5,(r,)))
-	pool2.close()
-	pool2.join()
+	for c in range(len(facePairColumns)):
+		table[facePairColumns[c][0]].extend([facePair[c] for facePair in facePairs])
 
-	for result in results:
-		nodeListTemp = result.get()
-		
-		# Add the newly create node numbers and their coordinates into the nodeList
-		nodeList.append(nodeListTemp)
+def facePairCount(table):
+	"""Returns the number of face pairs in a face pair table."""
+	return len(table['forwardElement'])
+
+def iterFacePairs(table):
+	"""Iterates over the rows of a face pair table.
 
-# Called in step 8
-# Support functions for multiprocessing for this step
-def init6(_elementListNormal, _elementListNormalNumber, _elementListNormalIndex):
-	"""Fuction to initialize global read only variables for each process.
-	
 	Args:
-		elementListNormal (list): List that contains the list of all elements and their defining node numbers
-		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
-		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
-	
+		table (dict): Face pair table
+
+	Returns:
+		facePairs (iterator): Tuples with one value per column of facePairColumns.
+
 	"""
-	global elementListNormal
-	global elementListNormalNumber
-	global elementListNormalIndex
+	return zip(*[table[column] for [column, typeCode] in facePairColumns])
+
+def facePairFaces(table, p):
+	"""Returns both faces of a face pair as [element_number, orientation, node_number, node_number2, ..., node_numberN].
+
+	Args:
+		table (dict): Face pair table
+		p (int): Index of the face pair
+
+	Returns:
+		[forwardFace, backwardFace] (list): Forward and backward faces of the face pair.
+
+	"""
+	nodes = [table['node1'][p], table['node2'][p], table['node3'][p], table['node4'][p]]
+	return [[table['forwardElement'][p], faceNames[table['forwardFace'][p]]] + nodes, [table['backwardElement'][p], faceNames[table['backwardFace'][p]]] + nodes]
+
+def saveFacePairTable(table, fileName):
+	"""Writes the columns of a face pair table one after the other to a binary file, which can be read back or memory mapped.
+
+	Args:
+		table (dict): Face pair table
+		fileName (str): File name to store the table in
+
+	Returns:
+		[] (list): Empty list.
+
+	"""
+	with open(fileName, 'wb') as f:
+		for [column, typeCode] in facePairColumns:
+			table[column].tofile(f)
+	return []
+
+def savedFacePairCount(fileName):
+	"""Returns the number of face pairs in a face pair table written by saveFacePairTable, from the size of the file."""
+	rowSize = sum(array.array(typeCode).itemsize for [column, typeCode] in facePairColumns)
+	return os.path.getsize(fileName) // rowSize
+
+def loadFacePairTable(fileName):
+	"""Reads a face pair table written by saveFacePairTable.
+
+	Args:
+		fileName (str): File name where the table is stored
+
+	Returns:
+		table (dict): Face pair table. The number of face pairs follows from the size of the file.
+
+	"""
+	count = savedFacePairCount(fileName)
+
+	table = {}
+	with open(fileName, 'rb') as f:
+		for [column, typeCode] in facePairColumns:
+			table[column] = array.array(typeCode)
+			table[column].fromfile(f, count)
+	return table
+
+# Support functions for copying data from old inp file to new inp file
+def copyFromFileLineNumber(inputFileName,outputFilePointer, start, stop):
+	"""Copys file lines from one file to a new file.
+			
+	Args:
+		inputFileName (str): File name of file containing lines to be copied
+		outputFilePointer (str): Opened file pointer to write lines to be copied
+		start (int): Starting line number to start copy from
+		stop (int): Ending line number to stop copying
+		
+	"""
+	# Account for the 1 off index between line number inf file and line number from read in
+	start = start - 1
+	stop = stop - 1
+
+	with openInpFile(inputFileName) as file:
+		for i, line in enumerate(file):
+			if i >= start and i < stop:
+				outputFilePointer.writelines(line)
+			if i >= stop:
+				break
+
+def endOfFileLineNumber(inputFileName):
+	"""Gets the total number of lines in a file. Function made for clarity.
+			
+	Args:
+		inputFileName (str): File name of the file to get total number of lines.
+		
+	Returns:
+		lines (int): Total number of lines in a file.
+	"""
+	lines = 0
+	with openInpFile(inputFileName) as file:
+		lines = sum(1 for line in file)
+	return lines
+
+def fileCompression(fileName):
+	"""Returns the compression of a file from its suffix: 'gzip', 'zstd' or None."""
+	for codec in compressionSuffixes:
+		if fileName.endswith(compressionSuffixes[codec]):
+			return codec
+	return None
+
+def requireZstandard():
+	"""Returns the zstandard module, raising an error if it is not installed."""
+	if zstandard is None:
+		raise ImportError("zstd compression needs the zstandard module: pip install zstandard")
+	return zstandard
+
+def openInpFile(fileName):
+	"""Opens an inp file for reading, decompressing it on the fly if it is compressed.
+			
+	Args:
+		fileName (str): File name of the inp file
+
+	Returns:
+		file (obj): File object reading the lines of the uncompressed inp file.
+		
+	"""
+	codec = fileCompression(fileName)
+	if codec == 'gzip':
+		return textReader(io.BufferedReader(gzip.open(fileName, 'rb')))
+	if codec == 'zstd':
+		return textReader(io.BufferedReader(requireZstandard().ZstdDecompressor().stream_reader(open(fileName, 'rb'), read_across_frames=True)))
+	return openText(fileName)
+
+def temporaryFilesCompressed():
+	"""Returns True if the temporary files are compressed, which they are whenever the input or the output inp file is."""
+	return compression is not None or fileCompression(inputFile) is not None
+
+def openTemporaryFile(fileName, mode):
+	"""Opens a temporary file, compressed with gzip when temporaryFilesCompressed so no uncompressed copy of the model is left on disk.
+			
+	Args:
+		fileName (str): File name of the temporary file
+		mode (str): 'rb' or 'wb'
+
+	Returns:
+		file (obj): File object.
+		
+	Files are read back compressed or not from their first bytes, so files written by an earlier run such as a topology index can be
+	reused whatever the current settings.
+
+	"""
+	if mode == 'wb':
+		if temporaryFilesCompressed():
+			return io.BufferedWriter(gzip.open(fileName, 'wb', temporaryCompressionLevel))
+		return open(fileName, 'wb')
+
+	with open(fileName, 'rb') as fp:
+		magic = fp.read(2)
+	if magic == b'\x1f\x8b':
+		return io.BufferedReader(gzip.open(fileName, 'rb'))
+	return open(fileName, 'rb')
+
+#Support functions for pickling and unpickling	
+def pklObj(obj, fileName):
+	"""Pickles a data stucture to disk for storage.
+			
+	Args:
+		obj (obj): Object to store to disk
+		fileName (str): File name to store object in pickled format
+
+	Returns:
+		[] (list): Empty list.
+		
+	"""
+	# Write to another file renamed once complete, so that a pickle hardlinked into the folder of a variant is replaced rather than overwritten
+	pklFP = openTemporaryFile(fileName + ".tmp", 'wb')
+	if outOfBandPickles and not temporaryFilesCompressed():
+		dumpOutOfBand(obj, pklFP)
+	else:
+		pickle.dump(obj, pklFP, -1)
+	pklFP.close()
+	os.rename(fileName + ".tmp", fileName)
+	dumpStage(obj, fileName)
+	return []
+	
+def unpklObj(fileName):
+	"""Unpickles a data stucture from disk for use.
+			
+	Args:
+		fileName (str): File name where the pickled object is stored
+
+	Returns:
+		obj (obj): The unpickled object for use.
+		
+	WARNING: (As copied from the manual for the pickle module)
+	The pickle module is not secure against erroneous or maliciously constructed data. 
+	Never unpickle data received from an untrusted or unauthenticated source.
+	
+	"""
+	pklFP = openTemporaryFile(fileName, 'rb')
+	if pklFP.read(len(outOfBandMagic)) == outOfBandMagic:
+		obj = loadOutOfBand(pklFP)
+	else:
+		pklFP.seek(0)
+		obj = pickle.load(pklFP)
+	pklFP.close()
+	return obj
+
+def reduceArray(values):
+	"""Reduces an array to its type code and a PickleBuffer of its items, which the pickler of dumpOutOfBand hands out of band."""
+	return (restoreArray, (values.typecode, pickle.PickleBuffer(values)))
+
+def restoreArray(typecode, buffer):
+	"""Returns the array read by loadOutOfBand for an array reduced by reduceArray, or rebuilds it if it was pickled in band."""
+	if isinstance(buffer, array.array):
+		return buffer
+	return array.array(typecode, bytes(buffer))
+
+def dumpOutOfBand(obj, fp):
+	"""Pickles an object to a file with the items of its arrays written after the pickled bytes (pickle protocol 5).
+
+	Args:
+		obj (obj): Object to store to disk
+		fp (obj): File object opened for writing
+
+	The file holds outOfBandMagic, the pickled bytes, the items of each array, the type code and length of each array, and the
+	offset of this list as 8 bytes. Arrays are written straight from their memory, without being copied into the pickled bytes.
+
+	"""
+	buffers = []
+	fp.write(outOfBandMagic)
+	pickler = pickle.Pickler(fp, 5, buffer_callback=buffers.append)
+	pickler.dispatch_table = dict(copyreg.dispatch_table)
+	pickler.dispatch_table[array.array] = reduceArray
+	pickler.dump(obj)
+
+	layout = []
+	for buffer in buffers:
+		view = memoryview(buffer)
+		layout.append([view.format, len(view)])
+		fp.write(buffer.raw())
+	offset = fp.tell()
+	pickle.dump(layout, fp, -1)
+	fp.write(struct.pack('<q', offset))
+
+def loadOutOfBand(fp):
+	"""Reads an object pickled by dumpOutOfBand, reading the items of each array straight into a new array.
+
+	Args:
+		fp (obj): File object opened for reading, positioned after outOfBandMagic
+
+	Returns:
+		obj (obj): The unpickled object.
+
+	"""
+	fp.seek(-8, 2)
+	offset = struct.unpack('<q', fp.read(8))[0]
+	fp.seek(offset)
+	layout = pickle.load(fp)
+
+	fp.seek(offset - sum(array.array(typecode).itemsize * count for [typecode, count] in layout))
+	arrays = []
+	for [typecode, count] in layout:
+		values = array.array(typecode, [0]) * count
+		view = memoryview(values).cast('B')
+		while len(view) > 0:
+			size = fp.readinto(view)
+			if not size:
+				raise EOFError("%s ends before the items of its arrays" % fp.name)
+			view = view[size:]
+		arrays.append(values)
+
+	fp.seek(len(outOfBandMagic))
+	return pickle.load(fp, buffers=arrays)
+	
+#Support functions for diagnostic dumps
+class DiagnosticWriter(object):
+	"""Writes the rows of a diagnostic dump in diagnosticFormat, diagnosticChunkRows rows at a time.
+
+	Args:
+		fileName (str): File name of the dump, ending with the suffix of diagnosticFormat
+
+	Every row of a npy dump must have the same number of values as the first one. Columns of numbers are stored as 8 byte integers
+	or floats, text columns holding numbers (such as the parsed nodes) as floats and other text columns as diagnosticStringBytes bytes.
+	Rows of a single type make a 2D array (1D for rows of a single value), mixed rows a 1D array of records.
+
+	"""
+	def __init__(self, fileName):
+		self.fileName = fileName
+		self.buffer = []
+		self.rowCount = 0
+		self.rowStruct = None
+		if diagnosticFormat == 'csv':
+			self.f = gzip.open(fileName, 'wb', compresslevel=temporaryCompressionLevel)
+		elif diagnosticFormat == 'npy':
+			self.f = open(fileName, 'wb')
+		else:
+			self.f = openText(fileName, 'w')
+
+	def write(self, row):
+		"""Adds a row to the dump."""
+		self.buffer.append(self.formatRow(row))
+		if len(self.buffer) >= diagnosticChunkRows:
+			self.flush()
+
+	def writeRows(self, rows):
+		"""Adds every row of an iterable to the dump."""
+		rows = iter(rows)
+		while True:
+			chunk = list(itertools.islice(rows, diagnosticChunkRows))
+			if not chunk:
+				break
+			self.buffer.extend(map(self.formatRow, chunk))
+			self.flush()
+
+	def formatRow(self, row):
+		"""Returns the bytes of a row in diagnosticFormat."""
+		if diagnosticFormat == 'csv':
+			return ','.join(map(str, row)) + '\n'
+		if diagnosticFormat == 'txt':
+			return "%s\n" % (list(row),)
+		if self.rowStruct is None:
+			self.startNpy(row)
+		self.rowCount = self.rowCount + 1
+		return self.rowStruct.pack(*[convert(value) for convert, value in zip(self.converters, row)])
+
+	def startNpy(self, row):
+		"""Picks the type of each column from the first row and leaves room for the npy header in front of the rows."""
+		[codes, descrs, self.converters] = [[], [], []]
+		for value in row:
+			if isinstance(value, float):
+				[code, descr, convert] = ['d', '<f8', float]
+			elif isinstance(value, numbers.Integral):
+				[code, descr, convert] = ['q', '<i8', int]
+			else:
+				try:
+					float(value)
+					[code, descr, convert] = ['d', '<f8', float]
+				except ValueError:
+					[code, descr, convert] = ['%ds' % diagnosticStringBytes, '|S%d' % diagnosticStringBytes, bytesFromText]
+			codes.append(code)
+			descrs.append(descr)
+			self.converters.append(convert)
+		self.rowStruct = struct.Struct('<' + ''.join(codes))
+
+		if len(descrs) == 1:
+			self.descr = repr(descrs[0])
+			self.shape = lambda rowCount: "(%d,)" % rowCount
+		elif len(set(descrs)) == 1:
+			self.descr = repr(descrs[0])
+			self.shape = lambda rowCount: "(%d, %d)" % (rowCount, len(descrs))
+		else:
+			self.descr = repr([('f%d' % k, descrs[k]) for k in range(len(descrs))])
+			self.shape = lambda rowCount: "(%d,)" % rowCount
+		self.headerBytes = len(self.npyHeader(10**20))
+		self.f.write(b' ' * self.headerBytes)
+
+	def npyHeader(self, rowCount, headerBytes=0):
+		"""Returns the npy header of a dump of rowCount rows, padded to headerBytes or the next multiple of 64 bytes."""
+		header = "{'descr': %s, 'fortran_order': False, 'shape': %s, }" % (self.descr, self.shape(rowCount))
+		size = max(headerBytes, (10 + len(header) + 1 + 63) // 64 * 64)
+		header = header + ' ' * (size - 10 - len(header) - 1) + '\n'
+		return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + bytesFromText(header)
+
+	def flush(self):
+		"""Writes the rows formatted so far."""
+		if diagnosticFormat == 'npy':
+			self.f.write(b''.join(self.buffer))
+		else:
+			self.f.write(bytesFromText(''.join(self.buffer)) if diagnosticFormat == 'csv' else ''.join(self.buffer))
+		self.buffer = []
+
+	def close(self):
+		"""Writes the rows left and the npy header, then closes the dump."""
+		self.flush()
+		if diagnosticFormat == 'npy':
+			if self.rowStruct is None:
+				[self.descr, self.shape, self.headerBytes] = [repr('<i8'), lambda rowCount: "(%d,)" % rowCount, 0]
+			self.f.seek(0)
+			self.f.write(self.npyHeader(self.rowCount, self.headerBytes))
+		self.f.close()
+
+def openDiagnostic(name, level=1):
+	"""Opens the diagnostic dump of a name if it is asked for, by diagnosticLevel or diagnosticStages.
+
+	Args:
+		name (str): Name of the dump, written to "<outputDirectory>/<name>-<inputName>" with the suffix of diagnosticFormat
+		level (int): Lowest diagnosticLevel writing the dump
+
+	Returns:
+		writer (DiagnosticWriter): Writer of the dump, or None when the dump is not asked for.
+
+	"""
+	if diagnosticLevel < level and name not in diagnosticStages:
+		return None
+	return DiagnosticWriter("%s/%s-%s%s" % (outputDirectory, name, inputName, diagnosticSuffixes[diagnosticFormat]))
+
+def dumpDiagnostic(name, rows, level=1):
+	"""Writes the rows of a diagnostic dump if it is asked for. rows is only iterated over when the dump is written."""
+	writer = openDiagnostic(name, level)
+	if writer is not None:
+		writer.writeRows(rows)
+		writer.close()
+
+def dumpStage(obj, fileName):
+	"""Dumps an intermediate stage pickled to one of pklFileName if it is asked for, by diagnosticLevel 2 or diagnosticStages.
+
+	Args:
+		obj (obj): Stage pickled, a list of rows, a flat list of numbers or a dictionary of either such as the topology index
+		fileName (str): File name the stage is pickled to
+
+	Dumps are named after the key of pklFileName and numbered in the order the stage is pickled, such as "elementList-2" for the
+	damage elements once their cohesive face nodes are renumbered. Each array of a dictionary has its own dump.
+
+	"""
+	stages = [key for key in pklFileName if pklFileName[key] == fileName]
+	if not stages or (diagnosticLevel < 2 and stages[0] not in diagnosticStages):
+		return
+	stage = stages[0]
+	diagnosticStageDumps[stage] = diagnosticStageDumps.get(stage, 0) + 1
+	name = "%s-%d" % (stage, diagnosticStageDumps[stage])
+	if stage == 'cohesive':
+		dumpDiagnostic(name, iterBlockRows(obj, cohesiveElementWidth), 0)
+	elif isinstance(obj, dict):
+		for key in sorted(obj):
+			dumpDiagnostic("%s-%s" % (name, key), stageRows(obj[key]), 0)
+	else:
+		dumpDiagnostic(name, stageRows(obj), 0)
+
+def stageRows(values):
+	"""Yields the rows of an intermediate stage, each number of a flat list making a row of its own."""
+	for value in values:
+		yield value if isinstance(value, (list, tuple, array.array)) else [value]
+
+def delFile(fileName):
+	"""Deletes a file. Function made for clarity.
+			
+	Args:
+		fileName (str): File name of file to be deleted
+
+	Returns:
+		[] (list): Empty list.
+		
+	"""
+	os.remove(fileName)
+	return [];	
+
+def findInpSectionStartEnd(startLineHeader, endLineHeader, fileName):
+		headerLength = len(startLineHeader)
+		enderLength = len(endLineHeader)
+		
+		headerLineNum = -1
+		enderLineNum = -1
+		
+		with openInpFile(fileName) as inpFile:
+			for num, line in enumerate(inpFile, 1):
+		
+				if startLineHeader == line[:headerLength]:
+					headerLineNum = num
+					
+				if endLineHeader == line [:enderLength]:
+					enderLineNum = num
+					
+				if enderLineNum > headerLineNum and headerLineNum > 0:
+					break
+		
+		return [headerLineNum, enderLineNum]
+
+def iterInpSectionLines(fileName, start, end):
+	"""Reads the data lines of a section of an inp file one at a time.
+			
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the section
+		end (int): Line number of the header following the section
+
+	Returns:
+		lines (iterator): Pairs of [index, line] where index counts the data lines of the section from 0.
+		
+	"""
+	with openInpFile(fileName) as fp:
+		for num, line in enumerate(fp):
+			if num < start:
+				continue
+			if num >= end - 1:
+				break
+			yield [num - start, line]
+
+def inpSectionByteRange(fileName, start, end):
+	"""Finds the bytes of the inp file holding the data lines of a section, the ones read by iterInpSectionLines.
+			
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the section
+		end (int): Line number of the header following the section
+
+	Returns:
+		[begin, stop] (list): Offset of the first byte of the section and of the first byte after it.
+		
+	"""
+	offsets = []
+	lines = 0
+	position = 0
+	with open(fileName, 'rb') as fp:
+		# Count the newlines block by block, only looking for the exact offset inside the block reaching a wanted line
+		for wanted in [start, end - 1]:
+			while lines < wanted:
+				block = fp.read(inpScanBlockBytes)
+				if not block:
+					break
+				count = block.count(b'\n')
+				if lines + count < wanted:
+					lines = lines + count
+					position = position + len(block)
+					continue
+				index = -1
+				while lines < wanted:
+					index = block.index(b'\n', index + 1)
+					lines = lines + 1
+				position = position + index + 1
+				fp.seek(position)
+			offsets.append(position)
+
+	return offsets
+
+def inpSectionShards(fileName, begin, stop):
+	"""Splits the bytes of a section into shards of about inpShardBytes bytes ending on a newline.
+			
+	Args:
+		fileName (str): File name of the inp file
+		begin (int): Offset of the first byte of the section
+		stop (int): Offset of the first byte after the section
+
+	Returns:
+		shards (list): [begin, stop] offsets of each shard, in file order.
+		
+	"""
+	shards = []
+	with open(fileName, 'rb') as fp:
+		while begin < stop:
+			fp.seek(min(begin + inpShardBytes, stop) - 1)
+			fp.readline()
+			shardStop = min(fp.tell(), stop)
+			shards.append([begin, shardStop])
+			begin = shardStop
+
+	return shards
+
+# Called in step 3
+def parseInpShard(fileName, begin, stop, parseLine, typecodes):
+	"""Fuction to parse the lines of one shard of a section of the inp file into array columns.
+		
+	Args:
+		fileName (str): File name of the inp file
+		begin (int): Offset of the first byte of the shard
+		stop (int): Offset of the first byte after the shard
+		parseLine (function): parseNodeLine or parseElementLine
+		typecodes (str): Array typecode of each column of the section, from inpShardColumns
+
+	Returns:
+		[columns, irregular] (list): One array per column holding the values of the lines with one value per column, and
+			[position, row] for the other lines, with the row of parseLine and its position in the shard.
+
+	Arrays are sent back to the main process in far fewer bytes than lists of rows. See unpackInpShard.
+		
+	"""
+	with open(fileName, 'rb') as fp:
+		fp.seek(begin)
+		lines = textFromBytes(fp.read(stop - begin)).split('\n')
+
+	# The shard ends with a newline, leaving an empty string after the last line
+	lines.pop()
+
+	converters = [int if t == 'i' else float for t in typecodes]
+	lines = [line.split(',') for line in lines]
+
+	# Lines with one value per column are converted a column at a time
+	if all(len(d) == len(typecodes) for d in lines):
+		try:
+			return [[array.array(t, map(convert, values)) for (t, convert, values) in zip(typecodes, converters, zip(*lines))], []]
+		except ValueError:
+			pass
+
+	columns = [array.array(t) for t in typecodes]
+	irregular = []
+	for (position, d) in enumerate(lines):
+		try:
+			if len(d) != len(columns):
+				raise ValueError
+			values = [convert(v) for (convert, v) in zip(converters, d)]
+		except ValueError:
+			irregular.append([position, parseLine(','.join(d))])
+			continue
+		for (column, value) in zip(columns, values):
+			column.append(value)
+
+	return [columns, irregular]
+
+def unpackInpShard(shard):
+	"""Turns the array columns of a shard from parseInpShard back into the rows of its lines, in file order.
+
+	Args:
+		shard (list): [columns, irregular] returned by parseInpShard
+
+	Returns:
+		rows (list): Row of each line of the shard. Nodes hold their number as an int and their coordinates as floats, as
+			they are converted to in step 9.
+
+	"""
+	[columns, irregular] = shard
+	rows = list(map(list, zip(*columns)))
+	for [position, row] in irregular:
+		rows.insert(position, row)
+	return rows
+
+def readInpSection(fileName, start, end, parseLine, section):
+	"""Reads and parses every line of a section of the inp file, one shard at a time in the Step3 pool.
+			
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the section header
+		end (int): Line number of the header following the section
+		parseLine (function): parseNodeLine or parseElementLine
+		section (str): 'node' or 'element', naming its shards in the progress reports and picking their inpShardColumns
+
+	Returns:
+		rows (list): Parsed line of each line of the section, in file order.
+
+	"""
+	return collectInpSection(submitInpSection(fileName, start, end, parseLine, section), fileName, start, end, parseLine)
+
+def submitInpSection(fileName, start, end, parseLine, section):
+	"""Hands the shards of a section of the inp file to the Step3 pool.
+			
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the section header
+		end (int): Line number of the header following the section
+		parseLine (function): parseNodeLine or parseElementLine
+		section (str): 'node' or 'element', naming its shards in the progress reports and picking their inpShardColumns
+
+	Returns:
+		reading (list): [pool2, progress, results] gathered by collectInpSection, or None for a compressed inp file.
+		
+	With the auto backend, only the first autoProbeBytes of the section are parsed in this process before a backend is picked for
+	the other shards. The pool is started by the thread calling this function, so it should be the main thread: a process forked
+	from another thread could inherit locks held by the main thread.
+
+	"""
+	# Bytes of a compressed file can only be reached by decompressing everything before them
+	if fileCompression(fileName) is not None:
+		return None
+
+	[begin, stop] = inpSectionByteRange(fileName, start, end)
+	shards = inpSectionShards(fileName, begin, stop)
+
+	pool2 = createPool('Step3', len(shards), probeItems=max(1, autoProbeBytes // inpShardBytes))
+	progress = StepProgress('Step3', len(shards), '%s shards' % section)
+	results = [pool2.apply_async(parseInpShard, args=(fileName, shardBegin, shardStop, parseLine, inpShardColumns[section],)) for [shardBegin, shardStop] in shards]
+	pool2.close()
+
+	return [pool2, progress, results]
+
+def collectInpSection(reading, fileName, start, end, parseLine):
+	"""Gathers the parsed shards of a section of the inp file handed to the Step3 pool by submitInpSection.
+			
+	Args:
+		reading (list): Returned by submitInpSection
+		fileName (str): File name of the inp file
+		start (int): Line number of the section header
+		end (int): Line number of the header following the section
+		parseLine (function): parseNodeLine or parseElementLine
+
+	Returns:
+		rows (list): Parsed line of each line of the section, in file order.
+		
+	Compressed inp files are parsed line by line here instead.
+
+	"""
+	if reading is None:
+		return [parseLine(line) for num, line in iterInpSectionLines(fileName, start, end)]
+
+	[pool2, progress, results] = reading
+	rows = []
+	for r in results:
+		rows.extend(unpackInpShard(r.get()))
+		progress.update()
+	pool2.join()
+	progress.finish()
+
+	return rows
+
+def readDamageSet(fileName, start, end):
+	"""Reads the element numbers of a damage set.
+			
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the damage set
+		end (int): Line number of the header following the damage set
+
+	Returns:
+		elementNumbers (list): Element numbers of the damage set.
+		
+	Lines of the set are stacked in reverse order. A set made of only 3 numbers with the same first and last number is read as a
+	range of elements.
+
+	"""
+	rows = []
+	with openInpFile(fileName) as fp:
+		elementEndTemp = end - 1
+		for num, line in enumerate(fp):
+			if num < start:
+				continue
+			if num >= elementEndTemp:
+				break
+			#getting rid of empty entries and of the extra space of each number
+			rows.append([int(d.strip()) for d in line.strip().split(",") if d])
+
+	# Stack the lines in reverse order once they are all read, as adding each line in front of the others copies all of them
+	rows.reverse()
+	elementNumbers = list(itertools.chain.from_iterable(rows))
+	rows = None
+
+	#Correcting for if damage elements is a range rather than a list
+	if len(elementNumbers) == 3 and elementNumbers[0] == elementNumbers[2]:
+		elementNumbers = range(elementNumbers[0], elementNumbers[1] + 1)
+
+	return elementNumbers
+
+def findElsetSection(name, fileName):
+	"""Finds the element set of a variant in the inp file.
+			
+	Args:
+		name (str): Name of the element set, compared without case as Abaqus does
+		fileName (str): File name of the inp file
+
+	Returns:
+		[start, end] (list): Line numbers of the header of the set and of the header following it, as found by
+			findInpSectionStartEnd, or [-1, -1] if the set is missing.
+		
+	"""
+	start = -1
+	with openInpFile(fileName) as fp:
+		for num, line in enumerate(fp, 1):
+			if start > 0 and line.startswith('*'):
+				return [start, num]
+			keyword = [v.strip().lower() for v in line.split(',')]
+			if keyword[0] == '*elset' and 'elset=%s' % name.lower() in keyword[1:]:
+				start = num
+	return [-1, -1]
+
+def maxSectionNumber(lines):
+	"""Returns the largest node or element number of the lines of a section of the inp file from iterInpSectionLines."""
+	return max(int(line.split(",")[0]) for num, line in lines)
+
+def parseNodeLine(line):
+	"""Splits a line of the node section into the node number and its coordinates.
+			
+	Args:
+		line (str): Line of the node section
+
+	Returns:
+		node (list): Node number and x, y, z coordinates as stripped strings.
+		
+	"""
+	d = line.strip().split(",")
+	for k in range (0,4):
+		d[k] = d[k].strip()
+	return d
+
+def parseElementLine(line):
+	"""Splits a line of the element section into the element number and its defining node numbers.
+			
+	Args:
+		line (str): Line of the element section
+
+	Returns:
+		element (list): Element number followed by its 8 node numbers as ints.
+		
+	"""
+	d = line.strip().split(",")
+	for k in range (0,9):
+		d[k] = int(d[k].strip())
+	return d
+
+def parseMemorySize(size):
+	"""Converts a memory size such as "8G" or "512M" to a number of bytes.
+			
+	Args:
+		size (str): Number with an optional K, M, G or T suffix (powers of 1024)
+
+	Returns:
+		bytes (int): Memory size in bytes.
+		
+	"""
+	size = str(size).strip().upper()
+	if size.endswith('B'):
+		size = size[:-1]
+	multiplier = 1
+	if size and size[-1] in 'KMGT':
+		multiplier = 1024**('KMGT'.index(size[-1]) + 1)
+		size = size[:-1]
+	return int(float(size)*multiplier)
+
+def iterPickledList(fileName):
+	"""Unpickles a list from disk only once it starts being iterated over and yields its entries.
+			
+	Args:
+		fileName (str): File name where the pickled list is stored
+
+	Returns:
+		entries (iterator): Entries of the unpickled list.
+		
+	"""
+	for entry in unpklObj(fileName):
+		yield entry
+
+def iterPatchedList(entries, patches):
+	"""Yields the entries of a list, replacing the ones at the rows of patches with their patched copy.
+
+	Args:
+		entries (list): Entries of the list
+		patches (dict): Entries replacing the ones of the list, by row index
+
+	Returns:
+		entries (iterator): Entries of the patched list.
+
+	"""
+	for (row, entry) in enumerate(entries):
+		yield patches.get(row, entry)
+
+def iterBlockRows(block, width):
+	"""Yields the rows of a block of values stored row after row in a flat array.
+			
+	Args:
+		block (array): Values of the block, row after row
+		width (int): Number of values in each row
+
+	Returns:
+		rows (iterator): Each row of the block as a list.
+		
+	"""
+	for i in range(0, len(block), width):
+		yield block[i:i+width].tolist()
+
+def formatCoordinate(value):
+	"""Formats a coordinate as str formats a float on Python 2.7, so that the output inp file is the same on Python 2.7 and 3.
+
+	Args:
+		value (float): Coordinate of a node
+
+	Returns:
+		text (str): value with 12 significant digits, as in 0.123456789012, 5.0 or 1.23456789012e+11.
+
+	Python 3 writes the shortest text giving back the float instead, such as 0.123456789012345.
+
+	"""
+	text = '%.12g' % value
+	if not text.lstrip('-').isdigit():
+		return text
+	if len(text.lstrip('-')) < 12:
+		return text + '.0'
+	[mantissa, exponent] = ('%.11e' % value).split('e')
+	return mantissa.rstrip('0').rstrip('.') + 'e' + exponent
+
+def formatNodeRow(row):
+	"""Formats a node number and its coordinates as a data line of the output inp file, see formatCoordinate."""
+	return ','.join([formatCoordinate(v) if isinstance(v, float) else str(v) for v in row]) + "\n"
+
+def writeOutputInp(outputFileName, sections, nodeRows, elementRows, cohesiveRows, cohesiveNumbers):
+	"""Writes the new inp file from the original inp file and the modified nodes, elements and cohesive elements.
+			
+	Args:
+		outputFileName (str): File name of the new inp file
+		sections (dict): Line numbers of the sections of the input inp file found in Step 1 and 2
+		nodeRows (iterable): Node numbers and their positions, including the newly created nodes
+		elementRows (iterable): Elements and their defining node numbers, with the damage elements renumbered
+		cohesiveRows (iterable): Cohesive elements and their defining node numbers
+		cohesiveNumbers (list): First and last cohesive element numbers used to generate the cohesive element set
+
+	Rows are consumed one at a time so they can be streamed from disk instead of being held in memory. The file is split by
+	writeSplitOutputInp when includeStore is set. Without any cohesive element, the cohesive elements, their element set and
+	section are left out, as Abaqus rejects an empty generated set.
+		
+	"""
+	if cohesiveNumbers[1] < cohesiveNumbers[0]:
+		print("Warning: no face is shared by two damage elements, the output inp file has no cohesive element")
+
+	# A partial output inp file left behind by a failed write could be taken for a finished one
+	written = False
+	try:
+		if includeStore is not None:
+			writeSplitOutputInp(outputFileName, sections, nodeRows, elementRows, cohesiveRows, cohesiveNumbers)
+		else:
+			with openOutputFile(outputFileName) as f:
+		
+				#Copy the header into the file
+				copyFromFileLineNumber(inputFile,f,1,sections['nodeStart'])
+
+				f.writelines(nodeStartInp+"\n")
+				for k in nodeRows:
+					f.writelines(formatNodeRow(k))
+
+				f.writelines(elementNormalStartInp+"\n")
+				for s in elementRows:
+					f.writelines(','.join(str(h) for h in s)+"\n")
+
+				# Copy everything after the element list up to the end of the damage regiion section
+				copyFromFileLineNumber(inputFile,f,sections['elementNormalEnd'],sections['elementDamageEnd'])
+
+				if cohesiveNumbers[1] >= cohesiveNumbers[0]:
+					f.writelines(cohesiveTitle)
+					for r in cohesiveRows:
+						f.writelines(','.join(str(h) for h in r)+"\n")
+
+					f.writelines(elementSetCohesive)
+					f.writelines("%s,%s, \n"% (str(cohesiveNumbers[0]), str(cohesiveNumbers[1])))
+					f.writelines(sectionCohesive)
+
+				# Copy the rest of the file
+				copyFromFileLineNumber(inputFile,f,sections['elementDamageEnd'],endOfFileLineNumber(inputFile)+1)
+		written = True
+	finally:
+		if not written:
+			removeOutputInp(outputFileName)
+
+def removeOutputInp(outputFileName):
+	"""Removes the output inp file and the blocks of writeSplitOutputInp named after it that were written.
+
+	Args:
+		outputFileName (str): File name of the output inp file
+
+	"""
+	[directory, mainName] = os.path.split(outputFileName)
+	fileNames = [outputFileName]
+	if includeStore is not None:
+		fileNames = fileNames + [os.path.join(directory, mainName[:-len(".inp")] + "-%s.inp" % block) for block in ['header', 'nodes', 'elements', 'sets', 'cohesive', 'tail']]
+	for fileName in fileNames:
+		if os.path.exists(fileName):
+			delFile(fileName)
+
+def writeSplitOutputInp(outputFileName, sections, nodeRows, elementRows, cohesiveRows, cohesiveNumbers):
+	"""Writes the new inp file as a main file including its blocks, with the unchanged blocks hardlinked from the include store.
+			
+	Args:
+		outputFileName (str): File name of the main inp file
+		sections (dict): Line numbers of the sections of the input inp file found in Step 1 and 2
+		nodeRows (iterable): Node numbers and their positions, including the newly created nodes
+		elementRows (iterable): Elements and their defining node numbers, with the damage elements renumbered
+		cohesiveRows (iterable): Cohesive elements and their defining node numbers
+		cohesiveNumbers (list): First and last cohesive element numbers used to generate the cohesive element set
+
+	The blocks are the ones written by writeOutputInp, in the same order, each one in a file named after the main file. Including
+	them in order gives the same lines as the single output inp file.
+		
+	"""
+	[directory, mainName] = os.path.split(outputFileName)
+	blockName = mainName[:-len(".inp")] + "-%s.inp"
+	blocks = []
+
+	blocks.append(linkStoredBlock(inputFile, 1, sections['nodeStart'], directory, blockName % "header"))
+
+	with openOutputFile(os.path.join(directory, blockName % "nodes")) as f:
+		f.writelines(nodeStartInp+"\n")
+		for k in nodeRows:
+			f.writelines(formatNodeRow(k))
+	blocks.append(blockName % "nodes")
+
+	with openOutputFile(os.path.join(directory, blockName % "elements")) as f:
+		f.writelines(elementNormalStartInp+"\n")
+		for s in elementRows:
+			f.writelines(','.join(str(h) for h in s)+"\n")
+	blocks.append(blockName % "elements")
+
+	blocks.append(linkStoredBlock(inputFile, sections['elementNormalEnd'], sections['elementDamageEnd'], directory, blockName % "sets"))
+
+	if cohesiveNumbers[1] >= cohesiveNumbers[0]:
+		with openOutputFile(os.path.join(directory, blockName % "cohesive")) as f:
+			f.writelines(cohesiveTitle)
+			for r in cohesiveRows:
+				f.writelines(','.join(str(h) for h in r)+"\n")
+
+			f.writelines(elementSetCohesive)
+			f.writelines("%s,%s, \n"% (str(cohesiveNumbers[0]), str(cohesiveNumbers[1])))
+			f.writelines(sectionCohesive)
+		blocks.append(blockName % "cohesive")
+
+	blocks.append(linkStoredBlock(inputFile, sections['elementDamageEnd'], endOfFileLineNumber(inputFile)+1, directory, blockName % "tail"))
+
+	with openText(outputFileName, 'w') as f:
+		for block in blocks:
+			if block is not None:
+				f.writelines(includeLine % block)
+
+class BlockDigest(object):
+	"""Stands in for the output file of copyFromFileLineNumber to get the sha1 digest and number of the lines copied to it."""
+	def __init__(self):
+		self.sha1 = hashlib.sha1()
+		self.lines = 0
+
+	def writelines(self, line):
+		"""Adds a copied line to the digest."""
+		self.sha1.update(bytesFromText(line))
+		self.lines = self.lines + 1
+
+def linkStoredBlock(inputFileName, start, stop, directory, blockFileName):
+	"""Stores an unchanged block of the input inp file in the include store if it is not there yet and hardlinks it next to the output.
+			
+	Args:
+		inputFileName (str): File name of the input inp file
+		start (int): Line number of the first line of the block
+		stop (int): Line number following the last line of the block
+		directory (str): Directory of the output inp file
+		blockFileName (str): File name the block is linked to in directory
+
+	Returns:
+		blockFileName (str): blockFileName, or None if the block has no lines and nothing was linked.
+
+	The digest of a block is remembered in the index of the store from the size and modification time of the input inp file, so
+	later runs on the same model neither read nor write the block again. Blocks are copied when the store is on another file system.
+		
+	"""
+	indexFileName = os.path.join(includeStore, includeStoreIndexName)
+	stat = os.stat(inputFileName)
+	key = (os.path.abspath(inputFileName), stat.st_size, stat.st_mtime, start, stop)
+
+	if not os.path.isdir(includeStore):
+		os.makedirs(includeStore)
+	index = unpklObj(indexFileName) if os.path.isfile(indexFileName) else {}
+
+	if key not in index:
+		digest = BlockDigest()
+		copyFromFileLineNumber(inputFileName, digest, start, stop)
+		index[key] = digest.sha1.hexdigest() if digest.lines > 0 else None
+
+		# Runs sharing the store replace the index as a whole, so the worst a concurrent run can do is drop a digest to be found again
+		(fileDescriptor, tmpFileName) = tempfile.mkstemp(dir=includeStore)
+		os.close(fileDescriptor)
+		pklObj(index, tmpFileName)
+		os.rename(tmpFileName, indexFileName)
+
+	if index[key] is None:
+		return None
+
+	storedFileName = os.path.join(includeStore, index[key] + ".inp")
+	if not os.path.isfile(storedFileName):
+		(fileDescriptor, tmpFileName) = tempfile.mkstemp(dir=includeStore)
+		os.close(fileDescriptor)
+		with openText(tmpFileName, 'w') as f:
+			copyFromFileLineNumber(inputFileName, f, start, stop)
+		# mkstemp only lets this user read the file, while stored blocks are linked into the output of every run
+		os.chmod(tmpFileName, 0o644)
+		os.rename(tmpFileName, storedFileName)
+
+	try:
+		os.link(storedFileName, os.path.join(directory, blockFileName))
+	except OSError:
+		shutil.copyfile(storedFileName, os.path.join(directory, blockFileName))
+
+	return blockFileName
+	
+#_____________________________________
+# Validation of the output inp file
+
+def iterOutputInpLines(fileName):
+	"""Reads the lines of an output inp file, replacing the *INCLUDE lines written by writeSplitOutputInp with the lines of their block.
+			
+	Args:
+		fileName (str): File name of the output inp file
+
+	Returns:
+		lines (iterator): Lines of the output inp file.
+
+	Runs of lines without *INCLUDE lines are chained as they are, so that the lines are not handed over one at a time.
+		
+	"""
+	return itertools.chain.from_iterable(iterOutputInpRuns(fileName))
+
+def iterOutputInpRuns(fileName):
+	"""Reads an output inp file as runs of lines, replacing each *INCLUDE line by the lines of its block, for iterOutputInpLines."""
+	[includePrefix, includeSuffix] = includeLine.split("%s")
+	directory = os.path.dirname(fileName)
+
+	with openInpFile(fileName) as fp:
+		for included, lines in itertools.groupby(fp, operator.methodcaller('startswith', includePrefix)):
+			if included:
+				for line in lines:
+					yield iterOutputInpLines(os.path.join(directory, line[len(includePrefix):].strip()))
+			else:
+				yield lines
+
+def duplicateNumbers(numbers):
+	"""Returns the numbers found more than once in an array of node or element numbers."""
+	numbers = sorted(numbers)
+	if len(set(numbers)) == len(numbers):
+		return []
+	return [number for number, repeats in itertools.groupby(numbers) if len(list(repeats)) > 1]
+
+def faceNormals(xs, ys, zs, k):
+	"""Returns the normals of a face of 4 nodes of many elements from the cross product of its diagonals, pointing as given by the right hand rule.
+			
+	Args:
+		xs (list): x coordinates of each node of the elements, as one list per node of an element
+		ys (list): y coordinates of each node of the elements, as one list per node of an element
+		zs (list): z coordinates of each node of the elements, as one list per node of an element
+		k (int): Node of the elements the 4 nodes of the face start at, in order
+
+	Returns:
+		normals (list): Lists of the x, y, z components of the normal of each element, as long as twice the area of its face.
+		
+	"""
+	[u0, u1, u2] = [list(map(operator.sub, axis[k+2], axis[k])) for axis in [xs, ys, zs]]
+	[v0, v1, v2] = [list(map(operator.sub, axis[k+3], axis[k+1])) for axis in [xs, ys, zs]]
+	return [	list(map(operator.sub, map(operator.mul, u1, v2), map(operator.mul, u2, v1))),\
+				list(map(operator.sub, map(operator.mul, u2, v0), map(operator.mul, u0, v2))),\
+				list(map(operator.sub, map(operator.mul, u0, v1), map(operator.mul, u1, v0)))]
+
+def parseValidationBlock(section, lines, first, parsed, badRows):
+	"""Converts consecutive data lines of a node or element section of the output inp file for validateOutputInp.
+			
+	Args:
+		section (str): 'node', 'solid', 'cohesive' or 'other'
+		lines (list): Data lines of the section
+		first (int): Line number of the first line
+		parsed (dict): Arrays of the numbers and of the coordinates or element nodes read from each section, extended here
+		badRows (list): Line numbers of the empty or malformed lines, extended here
+
+	A block whose lines all hold the number of values of its section is converted as a whole by the json module, which reads
+	numbers faster than int and float. Otherwise, or if one of its values is not a number of the right type, its lines are
+	converted one at a time so that the malformed ones are found.
+		
+	"""
+	columns = {'node': 4, 'solid': 9, 'cohesive': 9}.get(section)
+	text = ','.join(lines)
+	if columns is not None and set(map(operator.methodcaller('count', ','), lines)) == set([columns - 1]) and 'true' not in text and 'false' not in text:
+		try:
+			values = json.loads('[' + text + ']')
+			if section == 'node':
+				converted = [array.array('i', values[0::4])] + [array.array('d', values[k::4]) for k in range(1, 4)]
+			else:
+				values = array.array('i', values)
+				numbers = values[0::9]
+				del values[0::9]
+				converted = [numbers, values]
+		except (ValueError, TypeError, OverflowError):
+			converted = None
+		if converted is not None:
+			for [column, values] in zip(parsed[section], converted):
+				column.extend(values)
+			return
+
+	[number, values] = parsed[section][:2]
+	for offset, line in enumerate(lines):
+		d = line.split(',')
+		try:
+			if section == 'node':
+				if len(d) != 4:
+					raise ValueError
+				position = list(map(float, d[1:]))
+				number.append(int(d[0]))
+				for k in range(3):
+					parsed['node'][k + 1].append(position[k])
+			elif section == 'other':
+				number.append(int(d[0]))
+				values.extend(int(v) for v in d[1:] if v.strip())
+			else:
+				if len(d) != 9:
+					raise ValueError
+				row = list(map(int, d))
+				number.append(row[0])
+				values.extend(row[1:])
+		except ValueError:
+			badRows.append(first + offset)
+
+def elementsUsing(columns, nodes):
+	"""Returns the positions of the elements using any of a set of nodes.
+			
+	Args:
+		columns (list): Lists of the node numbers of the elements, one list per node of an element
+		nodes (set): Node numbers looked for
+
+	Returns:
+		positions (list): Positions in the lists of the elements using one of the nodes, in increasing order.
+		
+	"""
+	if not nodes:
+		return []
+	return list(itertools.compress(itertools.count(), map(any, zip(*[map(nodes.__contains__, column) for column in columns]))))
+
+def sumColumns(columns):
+	"""Returns an iterator over the sums of the values of several columns, added in the order of the columns as sum() would."""
+	total = columns[0]
+	for column in columns[1:]:
+		total = map(operator.add, total, column)
+	return total
+
+def validateOutputInp(fileName, fallbackNodes=()):
+	"""Checks the output inp file for the defects that would otherwise only be found once Abaqus fails, and prints those found.
+			
+	Args:
+		fileName (str): File name of the output inp file
+		fallbackNodes (iterable): Numbers of the new nodes whose original node could not be found, from findFallbackNodes
+
+	Returns:
+		problems (int): Number of defects found.
+		
+	The file is read back as Abaqus would read it, whatever the engine or the output options, into flat arrays of node numbers,
+	coordinates and element nodes. The checks are then:
+		- node numbers, and element numbers of all element types, are unique
+		- element rows hold one element number and 8 node numbers for C3D8 and COH3D8 elements
+		- every node used by an element exists
+		- none of fallbackNodes, left at 0,0,0 by newNodeRow, was written
+		- the 4 nodes of the bottom face (1-4) of each COH3D8 element coincide with the nodes of its top face (5-8)
+		- both faces of each COH3D8 element have a non zero normal pointing the same way
+		- the top face of each COH3D8 element is a face of a C3D8 element lying on the side its normal points to, as Abaqus stacks
+		  the thickness of a cohesive element from its bottom face to its top face
+		- the ranges of the generated element sets are not empty or inverted, and the cohesive element set of elementSetCohesive
+		  generates exactly the COH3D8 elements
+	
+	"""
+	nodeNumber = array.array('i')
+	coordinates = [array.array('d'), array.array('d'), array.array('d')]
+	[x, y, z] = coordinates
+	solidNumber = array.array('i')
+	solidNodes = array.array('i')
+	cohesiveNumber = array.array('i')
+	cohesiveNodes = array.array('i')
+	otherNumber = array.array('i')
+	otherNodes = array.array('i')
+	parsed = {	'node': [nodeNumber, x, y, z], 'solid': [solidNumber, solidNodes],\
+				'cohesive': [cohesiveNumber, cohesiveNodes], 'other': [otherNumber, otherNodes]}
+	badRows = []
+	generatedSets = collections.OrderedDict()
+	cohesiveSet = [v for v in elementSetCohesive.upper().replace(' ', '').strip().split(',') if v.startswith('ELSET=')][0]
+
+	# Read the data lines of the node and element sections into flat arrays, and the ranges of the generated element sets. Runs of
+	# data lines between keyword or comment lines are converted validationBlockLines at a time
+	section = None
+	num = 0
+	for keywordLines, lines in itertools.groupby(iterOutputInpLines(fileName), operator.methodcaller('startswith', '*')):
+		if keywordLines:
+			for line in lines:
+				num = num + 1
+				if line.startswith('**'):
+					continue
+
+				keyword = line.upper().replace(' ', '').strip().split(',')
+				if keyword[0] == '*NODE':
+					section = 'node'
+				elif keyword[0] == '*ELEMENT':
+					section = {'TYPE=C3D8': 'solid', 'TYPE=COH3D8': 'cohesive'}.get(keyword[1] if len(keyword) > 1 else '', 'other')
+				elif keyword[0] == '*ELSET' and 'GENERATE' in keyword:
+					section = 'generate'
+					generatedSet = ([v for v in keyword if v.startswith('ELSET=')] or ['ELSET='])[0]
+					generatedSets.setdefault(generatedSet, [])
+				else:
+					section = None
+			continue
+
+		block = list(itertools.islice(lines, validationBlockLines))
+		while block:
+			if section == 'generate':
+				for offset, line in enumerate(block):
+					try:
+						generated = [int(v) for v in line.split(',') if v.strip()]
+						if len(generated) not in [2, 3]:
+							raise ValueError
+						generatedSets[generatedSet].append(generated + [1]*(3 - len(generated)))
+					except ValueError:
+						badRows.append(num + 1 + offset)
+			elif section is not None:
+				parseValidationBlock(section, block, num + 1, parsed, badRows)
+			num = num + len(block)
+			block = list(itertools.islice(lines, validationBlockLines))
+
+	nodeIndex = dict(zip(nodeNumber, itertools.count()))
+	missingNodes = set(solidNodes).union(cohesiveNodes, otherNodes).difference(nodeIndex)
+
+	# Coordinates are gathered from lists, as indexing a list is faster than indexing an array
+	coordinateLists = [list(axis) for axis in coordinates]
+
+	# Faces of the cohesive elements, computed for one node of every cohesive element at a time. Elements using a missing node are skipped
+	cohesiveColumns = [cohesiveNodes[k::8].tolist() for k in range(8)]
+	checked = [True] * len(cohesiveNumber)
+	for c in elementsUsing(cohesiveColumns, missingNodes):
+		checked[c] = False
+	cohesiveRows = [list(map(nodeIndex.get, column, itertools.repeat(0))) for column in cohesiveColumns]
+	[xs, ys, zs] = [[array.array('d', map(axis.__getitem__, rows)) for rows in cohesiveRows] for axis in coordinateLists]
+	cohesiveRows = None
+	offset = list(map(max, *[map(abs, map(operator.sub, axis[k], axis[k+4])) for axis in [xs, ys, zs] for k in range(4)]))
+	bottom = faceNormals(xs, ys, zs, 0)
+	top = faceNormals(xs, ys, zs, 4)
+	cosine = list(map(operator.add, map(operator.add, map(operator.mul, bottom[0], top[0]), map(operator.mul, bottom[1], top[1])), map(operator.mul, bottom[2], top[2])))
+	topCenter = [array.array('d', map(operator.mul, sumColumns(axis[4:]), itertools.repeat(0.25))) for axis in [xs, ys, zs]]
+	[xs, ys, zs] = [None, None, None]
+
+	flat = list(map(operator.and_, checked, map(operator.or_, map(operator.not_, map(any, zip(*bottom))), map(operator.not_, map(any, zip(*top))))))
+	opposite = list(map(operator.le, cosine, itertools.repeat(0)))
+	notCoincident = list(itertools.compress(cohesiveNumber, map(operator.and_, checked, map(operator.gt, offset, itertools.repeat(validationTolerance)))))
+	degenerate = list(itertools.compress(cohesiveNumber, flat))
+	inverted = list(itertools.compress(cohesiveNumber, map(operator.and_, checked, map(operator.and_, opposite, map(operator.not_, flat)))))
+	topFaces = dict(itertools.compress(zip(map(frozenset, zip(*cohesiveColumns[4:])), itertools.count()),\
+										map(operator.and_, checked, map(operator.not_, map(operator.or_, flat, opposite)))))
+
+	# Find the C3D8 element on top of each cohesive element, only looking at the faces of the elements using a node of a top face
+	topNodes = set(itertools.chain(*cohesiveColumns[4:]))
+	solidColumns = [solidNodes[k::8].tolist() for k in range(8)]
+	solidSkipped = set(elementsUsing(solidColumns, missingNodes))
+	touching = [e for e in elementsUsing(solidColumns, topNodes) if e not in solidSkipped]
+	solidColumns = [list(map(column.__getitem__, touching)) for column in solidColumns]
+	solidRows = [list(map(nodeIndex.get, column)) for column in solidColumns]
+	solidCenter = [array.array('d', map(operator.mul, sumColumns([map(axis.__getitem__, rows) for rows in solidRows]), itertools.repeat(0.125))) for axis in coordinateLists]
+	solidRows = None
+	coordinateLists = None
+
+	above = set()
+	for name in faceNames:
+		candidates = list(map(topFaces.get, map(frozenset, zip(*[solidColumns[n - 1] for n in faceOrientationDefinition[name]])), itertools.repeat(-1)))
+		for t in itertools.compress(itertools.count(), map(operator.ne, candidates, itertools.repeat(-1))):
+			c = candidates[t]
+			side = [solidCenter[i][t] - topCenter[i][c] for i in range(3)]
+			if bottom[0][c]*side[0] + bottom[1][c]*side[1] + bottom[2][c]*side[2] > 0:
+				above.add(c)
+	wrongSide = [cohesiveNumber[c] for c in topFaces.values() if c not in above]
+
+	# Ranges of the generated element sets, and the elements generated by the cohesive element set
+	emptyRanges = ["%s %d,%d,%d" % (name[len('ELSET='):], first, last, step) for (name, ranges) in generatedSets.items()\
+					for [first, last, step] in ranges if first > last or step < 1]
+	cohesiveGenerated = set()
+	for [first, last, step] in generatedSets.get(cohesiveSet, []):
+		if step >= 1:
+			cohesiveGenerated.update(range(first, last + 1, step))
+	wrongCohesiveSet = []
+	if cohesiveGenerated != set(cohesiveNumber):
+		wrongCohesiveSet.append("%s generates %d element(s), %d of them COH3D8 elements, for %d COH3D8 elements" %\
+								(cohesiveSet[len('ELSET='):], len(cohesiveGenerated), len(cohesiveGenerated.intersection(cohesiveNumber)), len(cohesiveNumber)))
+
+	problems = [	["duplicate node number(s)", duplicateNumbers(nodeNumber)],\
+					["duplicate element number(s)", duplicateNumbers(itertools.chain(solidNumber, cohesiveNumber, otherNumber))],\
+					["line(s) of a node or element section that are empty or malformed", badRows],\
+					["node(s) used by an element that do not exist", sorted(missingNodes)],\
+					["node(s) left at 0,0,0 by a failed lookup of their original node", sorted(set(fallbackNodes).intersection(nodeIndex))],\
+					["cohesive element(s) whose two faces do not coincide", notCoincident],\
+					["cohesive element(s) with a face of zero area", degenerate],\
+					["cohesive element(s) whose two faces are numbered in opposite directions", inverted],\
+					["cohesive element(s) whose top face is not a face of an element lying on the side of their normal", sorted(wrongSide)],\
+					["generated element set range(s) that are empty or inverted", emptyRanges],\
+					["cohesive element set(s) not generating exactly the COH3D8 elements", wrongCohesiveSet] ]
+
+	print("Validation of %s: %d nodes, %d C3D8 elements, %d COH3D8 elements" % (fileName, len(nodeNumber), len(solidNumber), len(cohesiveNumber)))
+	for [problem, numbers] in problems:
+		if numbers:
+			print("%d %s:" % (len(numbers), problem), numbers[:validationReportLimit])
+
+	count = sum(len(numbers) for [problem, numbers] in problems)
+	if count == 0:
+		print("No problem found")
+	return count
+
+#_____________________________________
+# Background input and output overlapping reading and writing files with the work of the program
+
+class BackgroundTask(object):
+	"""Runs a function in a background thread so that the file it reads is read while the program keeps working.
+
+	Args:
+		function (function): Function to run
+		*args: Arguments of the function
+
+	The function is run right away in this thread when backgroundIO is off.
+
+	"""
+	def __init__(self, function, *args):
+		self.result = None
+		self.error = None
+		self.thread = None
+
+		if backgroundIO:
+			self.thread = threading.Thread(target=self.run, args=(function, args))
+			self.thread.daemon = True
+			self.thread.start()
+		else:
+			self.run(function, args)
+
+	def run(self, function, args):
+		"""Runs the function and keeps its result or the traceback of its error."""
+		try:
+			self.result = function(*args)
+		except Exception:
+			self.error = traceback.format_exc()
+
+	def get(self):
+		"""Waits for the function to be completed and returns its result."""
+		if self.thread is not None:
+			self.thread.join()
+		if self.error is not None:
+			raise RuntimeError("Background task failed:\n%s" % self.error)
+		return self.result
+
+class BackgroundWriter(object):
+	"""File opened for writing whose lines are written to disk by a background thread.
+
+	Args:
+		f (obj): File object the lines are written to
+
+	Lines are gathered in chunks of ioChunkLines handed to the thread through a queue of at most ioQueueChunks chunks, so new
+	lines are formatted while earlier ones are written and the lines waiting to be written stay bounded.
+
+	"""
+	def __init__(self, f):
+		self.file = f
+		self.chunks = queue.Queue(ioQueueChunks)
+		self.chunk = []
+		self.error = None
+
+		self.thread = threading.Thread(target=self.run)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, excTraceback):
+		self.close()
+
+	def write(self, text):
+		"""Queues text to be written."""
+		self.chunk.append(text)
+		if len(self.chunk) >= ioChunkLines:
+			self.flush()
+
+	def writelines(self, lines):
+		"""Queues lines to be written. A single string is queued as a whole."""
+		if isinstance(lines, str):
+			self.chunk.append(lines)
+		else:
+			self.chunk.extend(lines)
+		if len(self.chunk) >= ioChunkLines:
+			self.flush()
+
+	def flush(self):
+		"""Hands the lines queued so far to the background thread, waiting if too many chunks are already waiting."""
+		if self.chunk:
+			self.chunks.put(self.chunk)
+			self.chunk = []
+
+	def run(self):
+		"""Writes the chunks to the file until close is called."""
+		while True:
+			chunk = self.chunks.get()
+			if chunk is None:
+				break
+			# Keep emptying the queue after an error so that flush never blocks
+			if self.error is None:
+				try:
+					self.file.writelines(chunk)
+				except Exception:
+					self.error = traceback.format_exc()
+
+	def close(self):
+		"""Waits for every line to be written and closes the file."""
+		self.flush()
+		self.chunks.put(None)
+		self.thread.join()
+		self.file.close()
+		if self.error is not None:
+			raise RuntimeError("Writing failed:\n%s" % self.error)
+
+def compressBlock(data, codec):
+	"""Compresses a block of the output inp file into a complete gzip member or zstd frame.
+
+	Args:
+		data (str): Block to compress
+		codec (str): 'gzip' or 'zstd'
+
+	Returns:
+		data (bytes): Compressed block.
+
+	"""
+	data = bytesFromText(data)
+	if codec == 'gzip':
+		compressor = zlib.compressobj(compressionLevels['gzip'], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+		return compressor.compress(data) + compressor.flush()
+	return requireZstandard().ZstdCompressor(level=compressionLevels['zstd']).compress(data)
+
+class CompressedFile(object):
+	"""File opened for writing whose content is compressed in blocks by a pool of threads.
+
+	Args:
+		fileName (str): File name of the file to write
+		codec (str): 'gzip' or 'zstd'
+
+	Every compressionBlockBytes bytes are compressed independently into a gzip member or a zstd frame, and a file made of several
+	members or frames is a valid gzip or zstd file. zlib and zstd release the GIL while compressing, so the blocks are compressed
+	on core threads at once while they are written in order, with at most 2*core blocks held in memory.
+
+	"""
+	def __init__(self, fileName, codec):
+		self.file = open(fileName, 'wb')
+		self.codec = codec
+		self.pool = ThreadPool(processes=core)
+		self.pending = []
+		self.written = 0
+		self.block = []
+		self.blockBytes = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, excTraceback):
+		self.close()
+
+	def write(self, text):
+		"""Adds text to the current block, which is handed to the pool once it is full."""
+		self.block.append(text)
+		self.blockBytes = self.blockBytes + len(text)
+		if self.blockBytes >= compressionBlockBytes:
+			self.compress()
+
+	def writelines(self, lines):
+		"""Adds lines to the current block. A single string is added as a whole."""
+		if isinstance(lines, str):
+			self.write(lines)
+		else:
+			for line in lines:
+				self.write(line)
+
+	def compress(self):
+		"""Hands the current block to the pool and writes the compressed blocks completed in order."""
+		self.pending.append(self.pool.apply_async(compressBlock, (''.join(self.block), self.codec,)))
+		self.block = []
+		self.blockBytes = 0
+		while len(self.pending) > 2 * core or (self.pending and self.pending[0].ready()):
+			self.file.write(self.pending.pop(0).get())
+			self.written = self.written + 1
+
+	def close(self):
+		"""Compresses the last block, writes every block left and closes the file."""
+		# An empty file still gets one member or frame so that it can be decompressed
+		try:
+			if self.block or self.written + len(self.pending) == 0:
+				self.compress()
+			for result in self.pending:
+				self.file.write(result.get())
+		finally:
+			self.pending = []
+			self.pool.close()
+			self.pool.join()
+			self.file.close()
+
+def openOutputFile(fileName):
+	"""Opens a file for writing, compressed if its name ends with a compression suffix and written in the background if backgroundIO is on.
+
+	Args:
+		fileName (str): File name of the file to write
+
+	Returns:
+		f (obj): BackgroundWriter, CompressedFile or file object.
+
+	"""
+	codec = fileCompression(fileName)
+	if codec is not None:
+		f = CompressedFile(fileName, codec)
+	else:
+		f = openText(fileName, 'w')
+
+	if backgroundIO:
+		return BackgroundWriter(f)
+	return f
+
+def outputInpFileName():
+	"""Returns the file name of the output inp file, with the suffix of the compression picked."""
+	return "%s/OutPut-%s.inp%s" %(outputDirectory, inputName, compressionSuffixes.get(compression, ''))
+
+#_____________________________________
+# Backends running the pools used by the funcN functions
+
+def parseBackend(name):
+	"""Splits a backend setting such as 'processes:8' into the backend and its number of threads or processes.
+
+	Args:
+		name (str): Backend setting
+
+	Returns:
+		[backend, workers] (list): Name of the backend and number of threads or processes, core if not given.
+
+	"""
+	if ':' in name:
+		[name, workers] = name.split(':', 1)
+		workers = int(workers)
+	else:
+		workers = core
+
+	if name not in ['auto', 'serial', 'threads', 'processes', 'distributed']:
+		raise ValueError("Unknown backend: %s" % name)
+
+	return [name, workers]
+
+def createPool(step, items, initializer=None, initargs=(), threadSafe=True, probeItems=None):
+	"""Creates the pool used to run the checkN functions of a step on its backend.
+
+	Args:
+		step (str): Name of the step, used to look up its backend in stepBackends
+		items (int): Number of items the step will hand to the pool
+		initializer (function): initN function run by every process before any task, or None
+		initargs (tuple): Arguments of the initializer
+		threadSafe (bool): False if the tasks set global variables, in which case processes are used instead of threads
+		probeItems (int): Number of items timed by the auto backend before it picks a backend, or None for autoProbeItems
+
+	Returns:
+		pool (obj): Pool with the apply_async, close and join methods.
+
+	"""
+	[name, workers] = parseBackend(stepBackends.get(step, backend))
+
+	if name == 'threads' and not threadSafe:
+		print("%s: tasks set global variables, using processes instead of threads" % step)
+		name = 'processes'
+
+	if name == 'auto':
+		return AutoPool(step, items, initializer, initargs, probeItems)
+	if name == 'serial':
+		return SerialPool(initializer, initargs)
+	if name == 'threads':
+		return WorkerGlobalsPool(ThreadPool(processes=workers, initializer=initializer, initargs=initargs))
+	if name == 'distributed':
+		return DistributedPool(initializer, initargs)
+	return processPool(workers, initializer, initargs)
+
+def processPool(workers, initializer=None, initargs=()):
+	"""Starts a pool of processes of this computer running initializer(*initargs) before any task.
+
+	Args:
+		workers (int): Number of processes
+		initializer (function): initN function run by every process before any task, or None
+		initargs (tuple): Arguments of the initializer
+
+	Returns:
+		pool (obj): Pool with the apply_async, close and join methods.
+
+	Forked processes share the arguments with this process. Processes started afresh, as on WINDOWS, would each receive a pickled
+	copy of them instead, so the arrays among the arguments are moved to shared memory on Python 3.8 and later.
+
+	"""
+	if shared_memory is None or initializer is None or mp.get_start_method() == 'fork':
+		return mp.Pool(processes=workers, initializer=initializer, initargs=initargs)
+
+	blocks = []
+	sharedArgs = shareArrays(initargs, blocks)
+	return SharedMemoryPool(mp.Pool(processes=workers, initializer=attachSharedArrays, initargs=(initializer, sharedArgs)), blocks)
+
+class SharedArray(object):
+	"""Array copied to a block of shared memory, which is pickled as the name of the block, its type code and its length.
+
+	Args:
+		values (array): Array to copy
+		blocks (list): Blocks of shared memory created, unlinked by the SharedMemoryPool once it is joined
+
+	"""
+	def __init__(self, values, blocks):
+		size = len(values) * values.itemsize
+		block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+		block.buf[:size] = memoryview(values).cast('B')
+		blocks.append(block)
+		[self.name, self.typecode, self.size] = [block.name, values.typecode, size]
+
+	def attach(self):
+		"""Returns a view of the items of the array in the block, read by the process without copying them."""
+		try:
+			# Only the pool frees the block, not the resource tracker of this process (Python 3.13 and later)
+			block = shared_memory.SharedMemory(name=self.name, track=False)
+		except TypeError:
+			block = shared_memory.SharedMemory(name=self.name)
+		attachedBlocks.append(block)
+		return block.buf[:self.size].cast(self.typecode)
+
+def shareArrays(value, blocks):
+	"""Replaces the arrays of a value, alone or in a tuple, list or dictionary, by SharedArray copies in shared memory."""
+	if isinstance(value, array.array):
+		return SharedArray(value, blocks)
+	if isinstance(value, (tuple, list)):
+		return type(value)(shareArrays(v, blocks) for v in value)
+	if isinstance(value, dict):
+		return dict((k, shareArrays(value[k], blocks)) for k in value)
+	return value
+
+def attachSharedArrays(initializer, initargs):
+	"""Initializer of the processes of a SharedMemoryPool running initializer with the SharedArray of initargs attached."""
+	def attach(value):
+		if isinstance(value, SharedArray):
+			return value.attach()
+		if isinstance(value, (tuple, list)):
+			return type(value)(attach(v) for v in value)
+		if isinstance(value, dict):
+			return dict((k, attach(value[k])) for k in value)
+		return value
+
+	initializer(*attach(initargs))
+
+	# The blocks can only be closed once the global variables viewing them are released, before the process exits
+	mp.util.Finalize(None, detachSharedArrays, exitpriority=0)
+
+def detachSharedArrays():
+	"""Releases the global variables set by the initializer of a SharedMemoryPool process and closes the blocks they viewed."""
+	releaseWorkerGlobals()
+	for block in attachedBlocks:
+		block.close()
+	del attachedBlocks[:]
+
+class SharedMemoryPool(object):
+	"""Wraps a pool of processes so that the shared memory holding the arguments of its initializer is freed once it is joined.
+
+	Args:
+		pool (obj): Pool of processes run by attachSharedArrays
+		blocks (list): Blocks of shared memory of the SharedArray handed to the pool
+
+	"""
+	def __init__(self, pool, blocks):
+		self.pool = pool
+		self.blocks = blocks
+
+	def apply_async(self, function, args=()):
+		"""Queues function(*args) on the wrapped pool."""
+		return self.pool.apply_async(function, args)
+
+	def close(self):
+		"""Closes the wrapped pool."""
+		self.pool.close()
+
+	def join(self):
+		"""Waits for the wrapped pool and frees the shared memory."""
+		self.pool.join()
+		for block in self.blocks:
+			block.close()
+			block.unlink()
+
+def iterTaskResults(pool, function, tasks, progress):
+	"""Hands tasks to a pool and yields their results in order, with at most pendingTaskLimit tasks waiting for their result at once.
+
+	Args:
+		pool (obj): Pool from createPool, closed once every task is handed to it
+		function (function): checkN function run by each task
+		tasks (iterator): Arguments of each task
+		progress (StepProgress): Progress of the step, counting each result yielded and finished with the last one
+
+	Returns:
+		results (iterator): Result of each task, in the order of tasks.
+
+	Results already back are yielded while the tasks are handed out, so that the progress follows the pool.
+
+	"""
+	pending = collections.deque()
+	for args in tasks:
+		pending.append(pool.apply_async(function, args))
+		while pending and (pending[0].ready() or (pendingTaskLimit is not None and len(pending) >= pendingTaskLimit)):
+			result = pending.popleft().get()
+			progress.update()
+			yield result
+	pool.close()
+
+	while pending:
+		result = pending.popleft().get()
+		progress.update()
+		yield result
+	progress.finish()
+
+def releaseWorkerGlobals():
+	"""Releases the global variables set by the initN functions run in this process so their data can be freed."""
+	for name in workerGlobals:
+		globals()[name] = None
+
+class SerialResult(object):
+	"""Result of a task already run by the SerialPool."""
+	def __init__(self, value):
+		self.value = value
+
+	def ready(self):
+		"""Returns True, as the task is already run."""
+		return True
+
+	def get(self):
+		"""Returns the result of the task."""
+		return self.value
+
+class SerialPool(object):
+	"""Pool running every task in this process as soon as it is applied, with the interface of the multiprocessing pool.
+
+	Args:
+		initializer (function): initN function run once before any task, or None
+		initargs (tuple): Arguments of the initializer
+
+	"""
+	def __init__(self, initializer=None, initargs=()):
+		if initializer is not None:
+			initializer(*initargs)
+
+	def apply_async(self, function, args=()):
+		"""Runs function(*args) and returns its SerialResult."""
+		return SerialResult(function(*args))
+
+	def close(self):
+		"""Nothing left to hand over as every task has already been run."""
+		pass
+
+	def join(self):
+		"""Releases the global variables set by the initializer."""
+		releaseWorkerGlobals()
+
+class WorkerGlobalsPool(object):
+	"""Wraps a pool of threads so that the global variables set by its initializer are released once it is joined.
+
+	Args:
+		pool (obj): Pool of threads sharing the global variables of this process
+
+	"""
+	def __init__(self, pool):
+		self.pool = pool
+
+	def apply_async(self, function, args=()):
+		"""Queues function(*args) on the wrapped pool."""
+		return self.pool.apply_async(function, args)
+
+	def close(self):
+		"""Closes the wrapped pool."""
+		self.pool.close()
+
+	def join(self):
+		"""Waits for the wrapped pool and releases the global variables set by its initializer."""
+		self.pool.join()
+		releaseWorkerGlobals()
+
+class AutoPool(object):
+	"""Pool picking the backend of a step from the time its first tasks take, with the interface of the multiprocessing pool.
+
+	Args:
+		step (str): Name of the step, printed with the backend picked
+		items (int): Number of items the step will hand to the pool
+		initializer (function): initN function run before any task, or None
+		initargs (tuple): Arguments of the initializer
+		probeItems (int): Number of tasks timed before the backend is picked, or None for autoProbeItems
+
+	The first probeItems tasks are run in this process and timed. The remaining work is estimated from them: if it is under
+	autoSerialSeconds, or only one core is available, the rest of the tasks are also run here. Otherwise a pool of processes is
+	started with enough processes for each to get at least autoSecondsPerProcess of work, up to core processes.
+
+	"""
+	def __init__(self, step, items, initializer=None, initargs=(), probeItems=None):
+		self.step = step
+		self.items = items
+		self.probeItems = probeItems if probeItems is not None else autoProbeItems
+		self.initializer = initializer
+		self.initargs = initargs
+		self.serial = SerialPool(initializer, initargs)
+		self.pool = None
+		self.probed = 0
+		self.probeTime = 0.0
+
+	def apply_async(self, function, args=()):
+		"""Runs function(*args) in this process while probing, or hands it to the backend picked afterwards."""
+		if self.pool is None and self.probed == self.probeItems:
+			self.pool = self.pickBackend()
+
+		if self.pool is None:
+			time1 = time.time()
+			result = self.serial.apply_async(function, args)
+			self.probeTime = self.probeTime + time.time() - time1
+			self.probed = self.probed + 1
+			return result
+
+		return self.pool.apply_async(function, args)
+
+	def pickBackend(self):
+		"""Picks the pool running the remaining tasks from the time taken by the probed ones."""
+		estimate = self.probeTime / self.probed * (self.items - self.probed)
+		workers = min(core, int(estimate / autoSecondsPerProcess))
+
+		if estimate < autoSerialSeconds or workers < 2:
+			print("%s: serial backend (%.2f s estimated for %d items left)" % (self.step, estimate, self.items - self.probed))
+			return self.serial
+
+		print("%s: processes backend with %d processes (%.2f s estimated for %d items left)" % (self.step, workers, estimate, self.items - self.probed))
+		return processPool(workers, self.initializer, self.initargs)
+
+	def close(self):
+		"""Closes the backend picked, if any."""
+		if self.pool is not None:
+			self.pool.close()
+
+	def join(self):
+		"""Waits for the backend picked, if any, and releases the global variables set by the initializer."""
+		if self.pool is not None:
+			self.pool.join()
+		releaseWorkerGlobals()
+
+def connectWorkers():
+	"""Starts the coordinator of the distributed backend on first use and waits for its workers to connect.
+
+	Returns:
+		connections (list): Connections to every worker.
+
+	distributedLocalWorkers worker processes are started on this computer and distributedRemoteWorkers workers started
+	on other computers are waited for. Connections are kept open for the whole run and closed by stopWorkers. Without
+	distributedAuthKey, a random key is generated and handed to the local workers through distributedKeyVariable.
+
+	"""
+	global coordinator
+	global distributedAuthKey
+
+	if coordinator is None:
+		if distributedAuthKey is None:
+			distributedAuthKey = textFromBytes(binascii.hexlify(os.urandom(32)))
+		listener = Listener(distributedAddress, authkey=bytesFromText(distributedAuthKey))
+		address = "%s:%d" % listener.address
+
+		localWorkers = distributedLocalWorkers if distributedLocalWorkers is not None else core
+		environment = dict(os.environ)
+		environment[distributedKeyVariable] = distributedAuthKey
+		processes = []
+		for i in range(localWorkers):
+			processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', address], env=environment))
+
+		print("Waiting for %d worker(s) on %s" % (localWorkers + distributedRemoteWorkers, address))
+		connections = []
+		for i in range(localWorkers + distributedRemoteWorkers):
+			connections.append(listener.accept())
+
+		coordinator = [listener, connections, processes]
+
+	return coordinator[1]
+
+def stopWorkers():
+	"""Stops the workers of the distributed backend and closes the coordinator, if it was started.
+
+	"""
+	global coordinator
+
+	if coordinator is None:
+		return
+
+	[listener, connections, processes] = coordinator
+	for conn in connections:
+		try:
+			conn.send(['stop'])
+			conn.close()
+		except (IOError, EOFError):
+			pass
+	listener.close()
+	for process in processes:
+		process.wait()
+
+	coordinator = None
+
+def runWorker(address):
+	"""Main loop of a worker of the distributed backend.
+
+	Args:
+		address (str): "<host>:<port>" address of the coordinator
+
+	The worker connects to the coordinator with distributedAuthKey, or the key handed to local workers through
+	distributedKeyVariable, and runs the messages it receives until it is told to stop:
+		['init', initializer, initargs]: runs the initN function of the next step
+		['tasks', tasks]: runs each [checkN, args] task and sends back [succeeded, result or error] for each of them
+		['stop']: exits
+
+	"""
+	[host, port] = address.rsplit(':', 1)
+
+	# Keep trying until the coordinator is listening
+	deadline = time.time() + distributedConnectTimeout
+	while True:
+		try:
+			conn = Client((host, int(port)), authkey=bytesFromText(distributedAuthKey or os.environ[distributedKeyVariable]))
+			break
+		except socket.error:
+			if time.time() > deadline:
+				raise
+			time.sleep(1)
+
+	while True:
+		try:
+			message = conn.recv()
+		except EOFError:
+			break
+
+		if message[0] == 'init':
+			[initializer, initargs] = message[1:]
+			if initializer is not None:
+				initializer(*initargs)
+
+		elif message[0] == 'tasks':
+			results = []
+			for [function, args] in message[1]:
+				try:
+					results.append([True, function(*args)])
+				except Exception:
+					results.append([False, traceback.format_exc()])
+			conn.send(results)
+
+		elif message[0] == 'stop':
+			break
+
+	conn.close()
+
+class DistributedResult(object):
+	"""Result of a task run by the distributed backend, returned by DistributedPool.apply_async.
+
+	Args:
+		pool (DistributedPool): Pool the task is handed to
+
+	"""
+	def __init__(self, pool):
+		self.pool = pool
+		self.event = threading.Event()
+		self.reply = None
+
+	def set(self, reply):
+		"""Stores [succeeded, result or error] sent back by the worker."""
+		self.reply = reply
+		self.event.set()
+
+	def ready(self):
+		"""Returns True if the worker sent back the result of the task."""
+		return self.event.is_set()
+
+	def get(self):
+		"""Waits for the task and returns its result. Raises an error if the task failed on the worker."""
+		# The task may still be queued with the next chunk, which is handed to the workers now
+		if not self.event.is_set():
+			self.pool.flush()
+		self.event.wait()
+		if not self.reply[0]:
+			raise RuntimeError("Task failed on distributed worker:\n%s" % self.reply[1])
+		return self.reply[1]
+
+class DistributedPool(object):
+	"""Pool running tasks on the workers of the distributed backend, with the interface of the multiprocessing pool.
+
+	Args:
+		initializer (function): initN function run by every worker before any task, or None
+		initargs (tuple): Arguments of the initializer
+
+	Tasks are grouped in chunks of distributedChunkSize which are handed to the next idle worker by one thread per worker,
+	so results stream back while later tasks are still being submitted. The chunk of a worker that disconnects is handed to
+	another worker and its connection is dropped. Once no worker is left, the tasks not completed fail instead of being waited
+	for. The workers are used by one pool at a time, a pool created while another is running waits for it to be joined.
+
+	"""
+	def __init__(self, initializer=None, initargs=()):
+		coordinatorLock.acquire()
+		self.released = False
+		started = False
+		try:
+			self.connections = connectWorkers()
+			self.chunks = queue.Queue()
+			self.pending = []
+			self.remaining = 0
+			self.closed = False
+			self.lock = threading.Lock()
+			self.workers = []
+
+			for conn in list(self.connections):
+				try:
+					conn.send(['init', initializer, initargs])
+				except (IOError, EOFError):
+					# A worker that disconnected since the last pool
+					self.connections.remove(conn)
+					continue
+				worker = threading.Thread(target=self.serve, args=(conn,))
+				worker.daemon = True
+				worker.start()
+				self.workers.append(worker)
+			self.live = len(self.workers)
+
+			if self.live == 0:
+				raise RuntimeError("Every distributed worker has disconnected")
+			started = True
+		finally:
+			# A pool that could not start hands the workers over to the next one
+			if not started:
+				self.release()
+
+	def apply_async(self, function, args=()):
+		"""Queues function(*args) to be run by a worker and returns its DistributedResult."""
+		result = DistributedResult(self)
+		self.pending.append([function, args, result])
+		if len(self.pending) >= distributedChunkSize:
+			self.flush()
+		return result
+
+	def flush(self):
+		"""Hands the tasks queued so far to the workers as one chunk."""
+		if self.pending:
+			with self.lock:
+				self.remaining = self.remaining + 1
+				self.chunks.put(self.pending)
+				if self.live == 0:
+					self.failChunks()
+			self.pending = []
+
+	def close(self):
+		"""Hands the last tasks to the workers. No task can be added afterwards."""
+		self.flush()
+		self.closed = True
+
+	def join(self):
+		"""Waits for every task to be completed and hands the workers over to the next pool."""
+		try:
+			for worker in self.workers:
+				worker.join()
+		finally:
+			self.release()
+		if self.remaining > 0:
+			raise RuntimeError("Every distributed worker disconnected before the tasks were completed")
+
+	def release(self):
+		"""Hands the workers over to the next pool, once."""
+		if not self.released:
+			self.released = True
+			coordinatorLock.release()
+
+	def failChunks(self):
+		"""Fails the tasks of every chunk still queued, once no worker is left to run them. Called with self.lock held."""
+		while True:
+			try:
+				chunk = self.chunks.get_nowait()
+			except queue.Empty:
+				break
+			for [function, args, result] in chunk:
+				result.set([False, "Every distributed worker disconnected before the task was completed"])
+
+	def disconnect(self, conn, chunk):
+		"""Drops the connection of a worker that disconnected and hands its chunk to another worker, if any is left."""
+		conn.close()
+		with self.lock:
+			self.connections.remove(conn)
+			self.live = self.live - 1
+			self.chunks.put(chunk)
+			if self.live == 0:
+				self.failChunks()
+				# Nothing is left to wait for, so the next pool does not depend on this one being joined
+				self.release()
+
+	def serve(self, conn):
+		"""Sends chunks to one worker and stores their results until every chunk is completed."""
+		while not (self.closed and self.remaining == 0):
+			try:
+				chunk = self.chunks.get(timeout=0.1)
+			except queue.Empty:
+				continue
+			try:
+				conn.send(['tasks', [[function, args] for [function, args, result] in chunk]])
+				replies = conn.recv()
+			except (IOError, EOFError):
+				# Give the chunk to another worker
+				self.disconnect(conn, chunk)
+				return
+			for i in range(len(chunk)):
+				chunk[i][2].set(replies[i])
+			with self.lock:
+				self.remaining = self.remaining - 1
+
+#_____________________________________
+# Subfunctions used by processes to perform multiprocessing tasks
+
+# Called in step 4
+def func(elementNumbers, elementListNormal, elementListNormalNumber, elementListNormalIndex):
+	"""Fuction to get the elements in the damage zone from the list of normal elements.
+		
+	Args:
+		elementNumbers (list): List of element numbers to have cohesive elements inserted into
+		elementListNormal (list): List that contains the list of all elements and their defining node numbers
+		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
+		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
+	
+	Returns:
+		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into.
+	
+	All element numbers are joined with the sorted element numbers of elementListNormal at once. Element numbers that cannot be
+	found are reported together and left out of elementList.
+
+	"""
+	
+	#Retrieve the elements and their defining nodes given element numbers defined in elementNumbers. Store result in elementList
+	elementNumbers = [int(k) for k in elementNumbers]
+	rows = findElementRows(elementNumbers, elementListNormalNumber, elementListNormalIndex)
+	
+	# Copy the rows so that renumbering the damage elements later on leaves elementListNormal untouched
+	elementList = [list(elementListNormal[row]) for row in rows if row >= 0]
+
+	if len(elementList) < len(elementNumbers):
+		missingElements = [elementNumbers[i] for i in range(len(rows)) if rows[i] < 0]
+		print("%d damage element(s) could not be found in the element section and were skipped:" % len(missingElements), missingElements[:10])
+	
+	return elementList
+
+# Called in Step 5 and 6
+
+def init2(_elementList, _faceOrientation, _topology):
+	"""Fuction to initialize global read only variables for each process.
+			
+	Args:
+		_elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
+		_faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
+		_topology (dict): Topology index of _elementList built by buildTopologyIndex
+	
+	"""
+	
+	global elementList
+	global faceOrientation
+	global topology
+	
+	elementList = _elementList
+	faceOrientation = _faceOrientation
+	topology = _topology
+		
+	
+def check2(row):
+	"""Fuction processed by individual processes to search for cohesive faces from list of elements in the damage zone.
+			
+	Args:
+		row (int): Row in elementList of the element in the damage zone we want to search faces for.
+		
+	Returns:
+		cohesiveFacesList (list): Face pairs found as rows of the face pair table: found element, its connected element, the shared
+			cohesive face nodes and the codes of both faces.
+	
+	"""
+	
+	cohesiveFacesList = []
+	elem = elementList[row]
+
+	#For combinations A, B and C:
+	#Look up the element whose forward face is the backward face of this element in the face adjacency of the topology index
+	for [forward, backward] in faceCombinations:
+		neighbour = topology['faceNeighbour'][6*row + faceCodes[backward]]
+
+		if neighbour >= 0:
+			face = [elem[i] for i in faceOrientation[backward]]
+			cohesiveFacesList.append([elementList[neighbour][0], elem[0]] + face + [faceCodes[forward], faceCodes[backward]])
+	
+	return cohesiveFacesList
+
+def func2(elementList, faceOrientation, topology):
+	"""Fuction to set up the multiprocess procedure to find cohesive faces from elements in the damange zone.
+		
+	Args:
+		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
+		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+	
+	Returns:
+		cohesiveFaces (dict): Face pair table of all cohesive faces, holding the elements on both sides of each face, their face codes and the face nodes
+	
+	Corresponding node index numbers for each face can be found through faceOrientation[faceNames[code]].
+	
+	"""
+	
+	#Define all connected faces in cohesive zone region and their corresponding element, face orientation, and nodes
+	pool2 = createPool('Step5and6', len(elementList), init2, (elementList, faceOrientation, topology,))
+	
+	cohesiveFaces = newFacePairTable()
+	
+	for cohesiveFacesList in iterTaskResults(pool2, check2, ((row,) for row in range(len(elementList))), StepProgress('Step5and6', len(elementList), 'elements')):
+		appendFacePairs(cohesiveFaces, cohesiveFacesList)
+	pool2.join()
+		
+	return cohesiveFaces
+	
+	
+# Called in step 7-1
+def func3(elementList, cohesiveFaces, topology):
+	"""Fuction to find each element in the damage zone that connects with an affected node.
+		
+	Args:
+		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
+		cohesiveFaces (dict): Face pair table of the cohesive faces
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+
+	Returns:
+		nodeSupport (list): Each cohesive face node followed by the element numbers attached to it.
+	
+	The elements attached to each node are read from the node incidence of the topology index, so no search is needed.
+
+	"""
+	#Make a list of all unique nodes that make up of cohesive faces and sort them
+	cohesiveFaceNodes = sorted(set(itertools.chain(cohesiveFaces['node1'], cohesiveFaces['node2'], cohesiveFaces['node3'], cohesiveFaces['node4'])))
+	
+	#Make a list of elements with a cohesive face and define which nodes are affected by inserting cohesive nodes
+	nodeSupport = [] #Variable to store all cohesive nodes and cohesive elements attached to those nodes
+	
+	for node in cohesiveFaceNodes:
+		nodeSupport.append([node] + [elementList[r][0] for r in topologyNodeElementRows(topology, node)])
+			
+	return nodeSupport
+	
+		
+# Called in step 7-2
+def init4(_elementList, _topology, _cohesiveNodeStartNumber):
+	"""Fuction to initialize global read only variables for each process.
+			
+	Args:
+		_elementList (list): List of element numbers to have cohesive elements inserted into
+		_topology (dict): Topology index of _elementList built by buildTopologyIndex
+		_cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
+	
+	"""
+	
+	global elementList
+	global topology
+	global cohesiveNodeStartNumber
+	
+	elementList = _elementList
+	topology = _topology
+	cohesiveNodeStartNumber = _cohesiveNodeStartNumber
+	
+def check4(n):
+	"""Fuction processed by individual processes to search for elements attached to each cohesive face node.
+			
+	Args:
+		n (list): Node number and list of elements attached to the node.
+		
+	Returns:
+		[tempNode, fixNode] (list): lement number and node that needs to be fixed as well as new nodes to be added to the nodeList
+		
+	Format of n = [nodenumber, element1, element2,..., elementN]. Number of nodes in n will range from 2 to 8 nodes.
+	
+	"""
+	tempNode = []
+	fixNode = []
+	
+	#Increment number for each element that uses the same node number
+	increase = cohesiveNodeStartNumber
+	
+	#For each element that uses the node number
+	for r in n[2:]:
+
+		#Find the element in elementList from the element rows of the topology index
+		index = topologyElementRow(topology, r)
+		elementListNode = elementList[index]
+
+		if r == elementListNode[0]: #r is the element number
+		
+			#Increase the node number by the increment number for each element found and record this change for later modifications
+			for k in range(1,9):
+				if	n[0] == elementListNode[k]:
+					# Store changes to be made into queue for editing elementList at main program
+					fixNodeNumber = [index,k,(n[0] + increase)]
+					fixNode.append(fixNodeNumber)
+					tempNode.append(n[0]+increase)
+			increase = increase + cohesiveNodeStartNumber
+	return [tempNode, fixNode]
+				   
+def func4(nodeSupport, elementList, topology, cohesiveNodeStartNumber):
+	"""Fuction to set up the multiprocess procedure to renumber repeated nodes that make up of cohesive faces
+	
+	Args:
+		nodeSupport (list): List of nodes and affected elements that need to be modified.
+		elementList (list): List of element numbers to have cohesive elements inserted into
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+		cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
+
+	Returns:
+		tempNodeNode (list): List of newly created node numbers that need their positions to be defined
+		
+	"""
+	pool2 = createPool('Step7-2', len(nodeSupport), init4, (elementList, topology, cohesiveNodeStartNumber,))
+	
+	tempNodeNode = []
+	fixes = []
+	
+	for (tempNodes, fixElementNodes) in iterTaskResults(pool2, check4, ((a,) for a in nodeSupport), StepProgress('Step7-2', len(nodeSupport), 'nodes')):
+		tempNodeNode.append(tempNodes)
+		fixes.append(fixElementNodes)
+	pool2.join()
+	
+	#Write changes marked by the processes into elementList, once no task reads it anymore
+	for fixElementNodes in fixes:
+		for i in range(len(fixElementNodes)):
+			elementList[fixElementNodes[i][0]][fixElementNodes[i][1]] = fixElementNodes[i][2]
+			
+	return tempNodeNode
+
+# Called in step 7-3
+def init5(_nodeList, _nodeListNodeNumber, _nodeListNodeIndex, _cohesiveNodeStartNumber):
+	"""Fuction to initialize global read only variables for each process.
+			
+	Args:
+		_nodeList (list): List of node numbers and their positions
+		_nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		_nodeListNodeIndex (list): Paired list corresponding with _nodeListNodeNumber which points to index of the element number in _nodeList
+		_cohesiveNodeStartNumber (list): Starting node number when creating cohesive nodes
+	
+	"""
+	
+	global nodeList
+	global nodeListNodeNumber
+	global nodeListNodeIndex
+	global cohesiveNodeStartNumber
+
+	nodeList = _nodeList
+	nodeListNodeNumber = _nodeListNodeNumber
+	nodeListNodeIndex = _nodeListNodeIndex
+	cohesiveNodeStartNumber = _cohesiveNodeStartNumber
+	
+def check5(r):
+	"""Fuction processed by individual processes to search for the coordinates of the original node, copy those coordinates to newly created nodes and add them to nodeList.
+			
+	Args:
+		r (string): Newly created node number.
+		
+	Returns:
+		[r,nodeList[index][1],nodeList[index][2],nodeList[index][3]] (list): Newly created node number entry to be added to nodeList.
+	
+	"""
+	
+	return newNodeRow(r, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber)
+
+def newNodeRow(r, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber):
+	"""Fuction to copy the coordinates of the original node to a newly created node.
+			
+	Args:
+		r (string): Newly created node number.
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the element number in nodeList
+		cohesiveNodeStartNumber (list): Starting node number when creating cohesive nodes
+		
+	Returns:
+		[r,nodeList[index][1],nodeList[index][2],nodeList[index][3]] (list): Newly created node number entry to be added to nodeList.
+	
+	"""
+	
+	# Calculate quotient and remainder of modified node number
+	nodeNumCheck = int(r)
+	quotientNodeNumber = nodeNumCheck//cohesiveNodeStartNumber
+	remainderNodeNumber = nodeNumCheck%cohesiveNodeStartNumber
+
+	# Make sure modified node number falls within correct numbering conventions
+	if quotientNodeNumber >= 1 and quotientNodeNumber < 8:
+
+		# Find original node number from sorted list
+		index = bisectSearchSortedList(remainderNodeNumber, nodeListNodeNumber, nodeListNodeIndex)
+		nodeNum = nodeList[index][0]
+
+		# Check to make sure node number found at index matches the original node number we are looking for (could be skipped)
+		if int(nodeNum) == remainderNodeNumber:
+			return [r,nodeList[index][1],nodeList[index][2],nodeList[index][3]]
+
+	#Should never get here
+	return [r, 0 ,0, 0]
+
+def findFallbackNodes(tempNodeNode, nodeListNodeNumber, cohesiveNodeStartNumber):
+	"""Lists the new nodes that newNodeRow cannot trace back to an original node and places at 0,0,0.
+
+	Args:
+		tempNodeNode (list): List of newly created node numbers that need their positions to be defined
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		cohesiveNodeStartNumber (int): Starting node number when creating cohesive nodes
+
+	Returns:
+		fallbacks (list): New node numbers left at 0,0,0.
+
+	"""
+	fallbacks = []
+	for r in itertools.chain.from_iterable(tempNodeNode):
+		remainder = int(r) % cohesiveNodeStartNumber
+		index = bisect.bisect_left(nodeListNodeNumber, remainder)
+		if not 1 <= int(r)//cohesiveNodeStartNumber < 8 or index == len(nodeListNodeNumber) or nodeListNodeNumber[index] != remainder:
+			fallbacks.append(int(r))
+	return fallbacks
+
+def func5(tempNodeNode, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber):
+	"""Fuction to set up the multiprocess procedure to get create new node entries for the newly created nodes.
+	
+	Args:
+		tempNodeNode (list): List of cohesive node numbers that need to be created
+		nodeList (list): List of node numbers and their positions
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the element number in nodeList
+		cohesiveNodeStartNumber (list): Starting index number when creating cohesive nodes
+	
+	"""
+	
+	newNodes = sum(len(a) for a in tempNodeNode)
+	pool2 = createPool('Step7-3', newNodes, init5, (nodeList,nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber,))
+	
+	for nodeListTemp in iterTaskResults(pool2, check5, ((r,) for a in tempNodeNode for r in a), StepProgress('Step7-3', newNodes, 'new nodes')):
+		# Add the newly create node numbers and their coordinates into the nodeList
+		nodeList.append(nodeListTemp)
+	pool2.join()
+
+# Called in step 8
+def func6(elementList, elementListNormal, elementListNormalNumber, elementListNormalIndex):
+	"""Fuction to write the renumbered damage elements into the normal element list to add cohesive elements.
+		
+	Args:
+		elementList (list): List of renumbered elements and defining node numbers to have cohesive elements inserted into
+		elementListNormal (list): List that contains the list of all elements and their defining node numbers
+		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
+		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
+	
+	The rows of all damage elements are found at once and their nodes replaced in place by row index, without sending any element to
+	another process. Damage elements missing from elementListNormal are left out.
+	
+	"""
+	rows = findElementRows([elementListNode[0] for elementListNode in elementList], elementListNormalNumber, elementListNormalIndex)
+
+	# Apply the changes found in node ordering to cohseive nodes
+	for (row, elementListNode) in zip(rows, elementList):
+		if row >= 0:
+			elementListNormal[row][1:len(elementListNode)] = elementListNode[1:]
+
+def damageRowPatches(elementList, elementListNormal, elementListNormalNumber, elementListNormalIndex):
+	"""Fuction to write the renumbered damage elements into copies of their rows of the normal element list.
+
+	Args:
+		elementList (list): List of renumbered elements and defining node numbers to have cohesive elements inserted into
+		elementListNormal (list): List that contains the list of all elements and their defining node numbers
+		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
+		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
+
+	Returns:
+		patches (dict): Renumbered copy of the row of each damage element in elementListNormal, by row index.
+
+	Used by the service in place of func6, as the elementListNormal it keeps for all requests must be left unchanged.
+
+	"""
+	rows = findElementRows([elementListNode[0] for elementListNode in elementList], elementListNormalNumber, elementListNormalIndex)
+
+	patches = {}
+	for (row, elementListNode) in zip(rows, elementList):
+		if row >= 0:
+			patch = patches.get(row) or list(elementListNormal[row])
+			patch[1:len(elementListNode)] = elementListNode[1:]
+			patches[row] = patch
+	return patches
+		
+# Called in step 9
+def assembleCohesiveElements(cohesiveFaces, elementList, topology, faceOrientation, cohesiveElementStartNumber, order=None):
+	"""Fuction to create and number the cohesive elements of all the cohesive face pairs at once.
+	
+	Args:
+		cohesiveFaces (dict): Face pair table of the cohesive faces
+		elementList (list): List of renumbered elements and defining node numbers
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
+		cohesiveElementStartNumber (int): Element number of the first cohesive element
+		order (list): Indices of the face pairs in the order their cohesive elements are numbered, or None to follow the face pair table
+
+	Returns:
+		cohesive (array): COH3D8 block holding cohesiveElementWidth values per cohesive element, row after row: its element number
+			followed by the nodes of the forward and backward faces. Element numbers run contiguously from cohesiveElementStartNumber.
+	
+	"""
+	return array.array('i', itertools.chain.from_iterable(iterAssembledCohesiveElements(cohesiveFaces, elementList, topology, faceOrientation, cohesiveElementStartNumber, order)))
+
+def iterAssembledCohesiveElements(cohesiveFaces, elementList, topology, faceOrientation, cohesiveElementStartNumber, order=None):
+	"""Fuction to create and number the cohesive elements of the cohesive face pairs one after the other.
+	
+	Args:
+		cohesiveFaces (dict): Face pair table of the cohesive faces
+		elementList (list): List of renumbered elements and defining node numbers
+		topology (dict): Topology index of elementList built by buildTopologyIndex
+		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
+		cohesiveElementStartNumber (int): Element number of the first cohesive element
+		order (list): Indices of the face pairs in the order their cohesive elements are numbered, or None to follow the face pair table
+
+	Returns:
+		cohesive (iterator): Each cohesive element as a tuple of its element number followed by the nodes of the forward and backward
+			faces. Element numbers run contiguously from cohesiveElementStartNumber.
+	
+	The nodes of a face are gathered from the renumbered element with one itemgetter per face code, built from faceOrientation.
+	
+	"""
+	# Row in elementList of the elements on both sides of each face pair. Rows are mapped in decreasing order so that the first
+	# row of a repeated element number is kept, as found by topologyElementRow
+	elementRow = dict(zip(reversed(topology['elementNumber']), reversed(topology['elementRow'])))
+	forwardRows = list(map(elementRow.__getitem__, cohesiveFaces['forwardElement']))
+	backwardRows = list(map(elementRow.__getitem__, cohesiveFaces['backwardElement']))
+	elementRow = {}
+
+	# Node columns of each face code
+	faceNodes = [operator.itemgetter(*faceOrientation[name]) for name in faceNames]
+
+	forwardFace = cohesiveFaces['forwardFace']
+	backwardFace = cohesiveFaces['backwardFace']
+
+	if order is None:
+		order = range(facePairCount(cohesiveFaces))
+
+	# Create the cohesive elements by placing the 2 faces of each pair back to back
+	for (number, p) in zip(itertools.count(cohesiveElementStartNumber), order):
+		yield (number,) + faceNodes[forwardFace[p]](elementList[forwardRows[p]]) + faceNodes[backwardFace[p]](elementList[backwardRows[p]])
+
+# Called in step 9 and 10 when the output is streamed
+def iterStreamedNodes(nodeListFileName, tempNodeNode, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber):
+	"""Fuction to create the nodes of the output inp file as they are written.
+
+	Args:
+		nodeListFileName (str): File name where nodeList is pickled, or nodeList itself when the service keeps it
+		tempNodeNode (list): List of cohesive node numbers that need to be created
+		nodeListNodeNumber (list): List that contains node numbers in nodeList sorted in increasing order
+		nodeListNodeIndex (list): Paired list corresponding with nodeListNodeNumber which points to index of the element number in nodeList
+		cohesiveNodeStartNumber (int): Starting index number when creating cohesive nodes
+
+	Returns:
+		nodes (iterator): Nodes of nodeList followed by the newly created nodes as in step 7-3, converted to numbers as in step 9.
+
+	nodeList is only unpickled once the first node is written and each new node is created just before being written.
+
+	"""
+	nodeList = nodeListFileName if isinstance(nodeListFileName, list) else unpklObj(nodeListFileName)
+	newNodes = (newNodeRow(r, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber) for a in tempNodeNode for r in a)
+
+	for a in itertools.chain(nodeList, newNodes):
+		a[0] = int(float(a[0]))
+		a[1] = float(a[1])
+		a[2] = float(a[2])
+		a[3] = float(a[3])
+		yield a
+
+def iterStreamedCohesiveElements(elementListFileName, topologyFileName, cohesiveFacesFileName, faceOrientation, cohesiveElementStartNumber, order, debug):
+	"""Fuction to create the cohesive elements of the output inp file as they are written.
+
+	Args:
+		elementListFileName (str): File name where the renumbered elementList is pickled
+		topologyFileName (str): File name where the topology index of elementList is pickled
+		cohesiveFacesFileName (str): File name where the face pair table is saved
+		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
+		cohesiveElementStartNumber (int): Element number of the first cohesive element
+		order (list): Indices of the face pairs in the order their cohesive elements are numbered, or None to follow the face pair table
+		debug (DiagnosticWriter): Diagnostic dump the cohesive elements are also written to, or None
+
+	Returns:
+		cohesive (iterator): Cohesive elements as created by iterAssembledCohesiveElements.
+
+	The inputs are only loaded once the first cohesive element is written.
+
+	"""
+	elementList = unpklObj(elementListFileName)
+	topology = unpklObj(topologyFileName)
+	cohesiveFaces = loadFacePairTable(cohesiveFacesFileName)
+
+	for cohesiveElement in iterAssembledCohesiveElements(cohesiveFaces, elementList, topology, faceOrientation, cohesiveElementStartNumber, order):
+		if debug is not None:
+			debug.write(cohesiveElement)
+		yield cohesiveElement
+	if debug is not None:
+		debug.close()
+
+# Called in step 5 to 7-2 by the domain engine
+def check8(subdomain):
+	"""Fuction processed by individual processes to find the cohesive faces and renumber the cohesive face nodes of one subdomain.
+
+	Args:
+		subdomain (list): [positions, elements, owned, cohesiveNodeStartNumber] where elements are the elements of the subdomain
+			and its halo sorted by their position in elementList and owned flags the elements belonging to the subdomain.
+
+	Returns:
+		[facePairs, fixes, newNodes] (list): Cohesive face pairs found for the owned elements as [position, face pair table row],
+			node renumbering as [position, column, new node number] and new node numbers created for each cohesive face node.
+
+	Runs the kernels of steps 5 and 6 (check2), 7-1 (func3) and 7-2 (check4) on the subdomain alone. Every element sharing a face
+	or a node with an owned element is in the halo, so the results are the same as when the whole damage zone is searched.
+
+	"""
+	[positions, elements, owned, _cohesiveNodeStartNumber] = subdomain
+
+	# Topology index of the subdomain and its halo
+	subdomainTopology = buildTopologyIndex(elements)
+
+	# Step 5 and 6: faces of the owned elements shared with the elements of the subdomain and its halo
+	init2(elements, faceOrientationDefinition, subdomainTopology)
+
+	cohesiveFaces = newFacePairTable()
+	for i in range(len(elements)):
+		if owned[i]:
+			appendFacePairs(cohesiveFaces, check2(i))
+
+	# Step 7-1: elements attached to each cohesive face node
+	nodeSupport = func3(elements, cohesiveFaces, subdomainTopology)
+
+	# Step 7-2: renumber the cohesive face nodes in each attached element
+	init4(elements, subdomainTopology, _cohesiveNodeStartNumber)
+
+	fixes = []
+	newNodes = []
+	for n in nodeSupport:
+		(tempNodes, fixElementNodes) = check4(n)
+		newNodes.append([n[0], tempNodes])
+		for [index, k, newNode] in fixElementNodes:
+			fixes.append([positions[index], k, newNode])
+
+	facePairs = []
+	for facePair in iterFacePairs(cohesiveFaces):
+		facePairs.append([positions[topologyElementRow(subdomainTopology, facePair[1])], facePair])
+
+	return [facePairs, fixes, newNodes]
+
+def func8(subdomains, elementList, cohesiveNodeStartNumber):
+	"""Fuction to set up the multiprocess procedure to process each subdomain of the damage zone and reconcile their results.
+
+	Args:
+		subdomains (list): Subdomains of the damage zone from partitionDamageZone
+		elementList (list): List of elements and defining node numbers to have coheesive elements inserted into
+		cohesiveNodeStartNumber (int): Starting index number when creating cohesive nodes
+
+	Returns:
+		[cohesiveFaces, tempNodeNode] (list): Face pair table of all cohesive faces in the same order as func2 and list of newly created node
+			numbers for each cohesive face node in increasing order as in func4.
+
+	Each process only receives the elements of one subdomain and its halo. Nodes on the boundary between subdomains are renumbered
+	by each subdomain they belong to; their decisions are merged here and the renumbering is applied to elementList.
+
+	"""
+	pool2 = createPool('Step5to7-2', len(subdomains), threadSafe=False)
+	progress = StepProgress('Step5to7-2', len(subdomains), 'subdomains')
+
+	results = []
+
+	for [positions, owned] in subdomains:
+		results.append(pool2.apply_async(check8, ([positions, [elementList[p] for p in positions], owned, cohesiveNodeStartNumber],)))
+	pool2.close()
+
+	facePairs = []
+	fixes = {}
+	newNodes = {}
+	conflicts = 0
+
+	for s in range(len(results)):
+		(subdomainFacePairs, subdomainFixes, subdomainNewNodes) = results[s].get()
+		progress.update()
+
+		facePairs.extend(subdomainFacePairs)
+
+		# Nodes shared by several subdomains are renumbered by each of them and must agree
+		for [position, k, newNode] in subdomainFixes:
+			if fixes.setdefault((position, k), newNode) != newNode:
+				conflicts = conflicts + 1
+		for [node, tempNodes] in subdomainNewNodes:
+			if newNodes.setdefault(node, tempNodes) != tempNodes:
+				conflicts = conflicts + 1
+
+	pool2.join()
+	progress.finish()
+
+	if conflicts > 0:
+		print("Warning: %d node renumbering(s) differ between subdomains" % conflicts)
+
+	#Write changes into elementList
+	for (position, k) in fixes:
+		elementList[position][k] = fixes[(position, k)]
+
+	# Face pairs ordered by the position of their backward element and orientation, as found by func2
+	facePairs.sort(key = lambda pair: (pair[0], pair[1][-1]))
+	cohesiveFaces = newFacePairTable()
+	appendFacePairs(cohesiveFaces, [pair[1] for pair in facePairs])
+
+	tempNodeNode = [newNodes[node] for node in sorted(newNodes)]
+
+	return [cohesiveFaces, tempNodeNode]
+
+#_____________________________________
+# Out-of-core engine used when the model does not fit in memory
+
+def spillRecords(records, tmpDirectory):
+	"""Writes records to a new file in the temporary directory in pickled blocks.
+
+	Args:
+		records (iterable): Records to be stored, in the order they should be read back
+		tmpDirectory (str): Directory where the file is created
+
+	Returns:
+		fileName (str): File name of the stored records.
+
+	"""
+	(fileDescriptor, fileName) = tempfile.mkstemp(suffix='.run', dir=tmpDirectory)
+	os.close(fileDescriptor)
+
+	block = []
+	with openTemporaryFile(fileName, 'wb') as runFP:
+		for record in records:
+			block.append(record)
+			if len(block) >= outOfCoreBlockSize:
+				pickle.dump(block, runFP, -1)
+				block = []
+		if block:
+			pickle.dump(block, runFP, -1)
+	return fileName
+
+def readRecords(fileName):
+	"""Streams back records stored by spillRecords.
+
+	Args:
+		fileName (str): File name of the stored records
+
+	Returns:
+		records (iterator): Stored records in the order they were written.
+
+	"""
+	with openTemporaryFile(fileName, 'rb') as runFP:
+		while True:
+			try:
+				block = pickle.load(runFP)
+			except EOFError:
+				return
+			for record in block:
+				yield record
+
+def mergeSortedRuns(runs):
+	"""Merges sorted runs stored on disk into a single sorted stream and deletes them once they have been read.
+
+	Args:
+		runs (list): File names of the sorted runs
+
+	Returns:
+		records (iterator): Records of all runs in increasing order.
+
+	"""
+	for record in heapq.merge(*[readRecords(run) for run in runs]):
+		yield record
+	for run in runs:
+		delFile(run)
+
+def externalSort(records, runLength, tmpDirectory):
+	"""Sorts records that may not fit in memory using an external merge sort.
+
+	Args:
+		records (iterable): Tuples to be sorted in their natural order
+		runLength (int): Maximum number of records sorted in memory at once
+		tmpDirectory (str): Directory where sorted runs are stored
+
+	Returns:
+		sortedRecords (iterator): Records in increasing order.
+
+	Records are read when this function is called and sorted in runs of runLength records which are spilled to disk and
+	merged back lazily. No file is written if every record fits in a single run. Runs are merged in several passes when
+	there are more than outOfCoreMergeFanIn of them so that the number of open files stays bounded.
+
+	"""
+	runs = []
+	run = []
+	for record in records:
+		run.append(record)
+		if len(run) >= runLength:
+			run.sort()
+			runs.append(spillRecords(run, tmpDirectory))
+			run = []
+
+	run.sort()
+	if not runs:
+		return iter(run)
+	if run:
+		runs.append(spillRecords(run, tmpDirectory))
+	run = []
+
+	while len(runs) > outOfCoreMergeFanIn:
+		runs = [spillRecords(mergeSortedRuns(runs[i:i + outOfCoreMergeFanIn]), tmpDirectory) for i in range(0, len(runs), outOfCoreMergeFanIn)]
+
+	return mergeSortedRuns(runs)
+
+def mergeJoin(leftRecords, rightRecords):
+	"""Joins two record streams sorted by their first field.
+
+	Args:
+		leftRecords (iterable): Records sorted by their first field. Keys may repeat
+		rightRecords (iterable): Records sorted by their first field. Only the first record of each key is used
+
+	Returns:
+		pairs (iterator): [leftRecord, rightRecord] for every left record, where rightRecord is None if no right record shares its key.
+
+	"""
+	rightRecords = iter(rightRecords)
+	right = next(rightRecords, None)
+	for left in leftRecords:
+		while right is not None and right[0] < left[0]:
+			right = next(rightRecords, None)
+		if right is not None and right[0] == left[0]:
+			yield [left, right]
+		else:
+			yield [left, None]
+
+def iterDamageElementNumbers(fileName, start, end):
+	"""Reads the element numbers of the damage set along with their position in the elementNumbers list of the in-memory engine.
+
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the damage section
+		end (int): Line number of the header following the damage section
+
+	Returns:
+		damageNumbers (iterator): Tuples of (elementNumber, position). Positions are tuples that sort in the same order as elementNumbers.
+
+	Lines of the damage set are stacked in reverse order in the in-memory engine, so position is (-line, column). A damage set made of
+	only 3 numbers with the same first and last number is read as a range of elements, as in the in-memory engine.
+
+	"""
+	count = 0
+	for num, line in iterInpSectionLines(fileName, start, end):
+		count = count + len(list(filter(None, line.strip().split(","))))
+
+	if count == 3:
+		elementNumbers = []
+		for num, line in iterInpSectionLines(fileName, start, end):
+			elementNumbers = [int(d.strip()) for d in filter(None, line.strip().split(","))] + elementNumbers
+		if elementNumbers[0] == elementNumbers[2]:
+			for elementNumber in range(elementNumbers[0], elementNumbers[1] + 1):
+				yield (elementNumber, (0, elementNumber))
+			return
+
+	for num, line in iterInpSectionLines(fileName, start, end):
+		for column, d in enumerate(filter(None, line.strip().split(","))):
+			yield (int(d.strip()), (-num, column))
+
+def joinDamageElements(sortedDamageNumbers, sortedElements, missingElements):
+	"""Joins the damage element numbers with their elements as done in step 4.
+		
+	Args:
+		sortedDamageNumbers (iterable): (elementNumber, position) of the damage set sorted by element number
+		sortedElements (iterable): (elementNumber, line, element) of the element section sorted by element number
+		missingElements (list): List to which damage element numbers missing from the element section are appended
+
+	Returns:
+		damageRows (iterator): Damage elements as (position, line, element).
+	
+	"""
+	for [[elementNumber, position], element] in mergeJoin(sortedDamageNumbers, sortedElements):
+		if element is None:
+			missingElements.append(elementNumber)
+		else:
+			yield (position, element[1], element[2])
+
+def iterFaceKeys(damageRows):
+	"""Lists the forward and backward faces of every damage element so that shared faces sort next to each other.
+
+	Args:
+		damageRows (iterable): Damage elements as (position, line, element) sorted by position
+
+	Returns:
+		faceKeys (iterator): Tuples of (combination, face nodes, direction, position, element number) where direction is 0 for forward faces.
+
+	"""
+	for (position, line, element) in damageRows:
+		for combination in range(len(faceCombinations)):
+			[forward, backward] = faceCombinations[combination]
+			yield (combination, tuple(element[i] for i in faceOrientationDefinition[forward]), 0, position, element[0])
+			yield (combination, tuple(element[i] for i in faceOrientationDefinition[backward]), 1, position, element[0])
+
+def matchFaceKeys(faceKeys):
+	"""Finds the cohesive face pairs from the sorted face keys of the damage elements.
+
+	Args:
+		faceKeys (iterable): Sorted face keys from iterFaceKeys
+
+	Returns:
+		facePairs (iterator): Tuples of (backward position, combination, forward position, forward element, backward element, face nodes).
+
+	As with the bisect search of the in-memory engine, every backward face is paired with the first damage element (in elementList order)
+	whose forward face has the same nodes.
+
+	"""
+	for [combination, face], keys in itertools.groupby(faceKeys, lambda key: [key[0], key[1]]):
+		forward = None
+		for key in keys:
+			if key[2] == 0:
+				if forward is None:
+					forward = key
+			elif forward is not None:
+				yield (key[3], combination, forward[3], forward[4], key[4], face)
+
+def splitCohesiveNodes(cohesiveNodes, incidences, cohesiveNodeStartNumber):
+	"""Renumbers the cohesive face nodes in every damage element after the first one that uses them.
+
+	Args:
+		cohesiveNodes (iterable): Sorted unique node numbers making up cohesive faces
+		incidences (iterable): Sorted (node number, position, column) for every node of every damage element
+		cohesiveNodeStartNumber (int): Increment added to a node number for each damage element sharing it
+
+	Returns:
+		fixes (iterator): Tuples of (position, column, new node number, node number) in the order new nodes are created.
+
+	"""
+	incidenceGroups = itertools.groupby(incidences, lambda incidence: incidence[0])
+	for [node, group] in mergeJoin(((node,) for node in cohesiveNodes), ((node, list(group)) for node, group in incidenceGroups)):
+		if group is None:
+			continue
+		increase = 0
+		lastPosition = None
+		for (n, position, column) in group[1]:
+			if lastPosition is not None and position != lastPosition:
+				increase = increase + cohesiveNodeStartNumber
+			lastPosition = position
+			if increase > 0:
+				yield (position, column, node[0] + increase, node[0])
+
+def iterRenumberedRows(damageRows, sortedFixes):
+	"""Applies the node renumbering of step 7 to the damage elements.
+
+	Args:
+		damageRows (iterable): Damage elements as (position, line, element) sorted by position
+		sortedFixes (iterable): (position, column, new node number) sorted by position
+
+	Returns:
+		renumberedRows (iterator): Damage elements as (position, line, element) with their new node numbers.
+
+	"""
+	fixGroups = ((position, list(fixes)) for position, fixes in itertools.groupby(sortedFixes, lambda fix: fix[0]))
+	for [[position, line, element], fixes] in mergeJoin(damageRows, fixGroups):
+		element = list(element)
+		if fixes is not None:
+			for (p, column, newNode) in fixes[1]:
+				element[column] = newNode
+		yield (position, line, element)
+
+def iterNewNodes(newNodes, sortedNodes, cohesiveNodeStartNumber, tmpDirectory, runLength, fallbacks):
+	"""Copies the coordinates of the original node to each newly created node.
+
+	Args:
+		newNodes (iterable): New node numbers in the order they are created
+		sortedNodes (iterable): (node number, line, node) for every node sorted by node number
+		cohesiveNodeStartNumber (int): Increment added to a node number for each damage element sharing it
+		tmpDirectory (str): Directory where sorted runs are stored
+		runLength (int): Maximum number of records sorted in memory at once
+		fallbacks (list): List to which the new node numbers placed at the origin are appended
+
+	Returns:
+		nodes (iterator): New nodes as [node number, x, y, z] in the order they are created.
+
+	Follows check5: the original node number is the remainder of the new node number by cohesiveNodeStartNumber and nodes
+	that cannot be traced back are placed at the origin.
+
+	"""
+	lookups = externalSort(((newNode % cohesiveNodeStartNumber, order, newNode) for order, newNode in enumerate(newNodes)), runLength, tmpDirectory)
+
+	def nodes():
+		for [[remainder, order, newNode], original] in mergeJoin(lookups, sortedNodes):
+			if original is not None and 1 <= newNode//cohesiveNodeStartNumber < 8:
+				yield (order, [newNode] + original[2][1:4])
+			else:
+				fallbacks.append(newNode)
+				yield (order, [newNode, 0, 0, 0])
+
+	for (order, node) in externalSort(nodes(), runLength, tmpDirectory):
+		yield node
+
+def iterOutputNodes(nodeLines, newNodes):
+	"""Converts the nodes of the node section and the newly created nodes to numbers as done in step 9.
+
+	Args:
+		nodeLines (iterable): Lines of the node section
+		newNodes (iterable): Newly created nodes
+
+	Returns:
+		nodes (iterator): Nodes ready to be written.
+
+	"""
+	for a in itertools.chain((parseNodeLine(line) for num, line in nodeLines), newNodes):
+		a[0] = int(float(a[0]))
+		a[1] = float(a[1])
+		a[2] = float(a[2])
+		a[3] = float(a[3])
+		yield a
+
+def iterOutputElements(elementLines, sortedRenumberedRows):
+	"""Replaces the damage elements of the element section by their renumbered rows as done in step 8.
+
+	Args:
+		elementLines (iterable): Lines of the element section with their index
+		sortedRenumberedRows (iterable): (line, position, element) of the renumbered damage elements sorted by line
+
+	Returns:
+		elements (iterator): Elements ready to be written, in the order of the element section.
+
+	"""
+	replacements = ((line, list(rows)[-1][2]) for line, rows in itertools.groupby(sortedRenumberedRows, lambda row: row[0]))
+	for [[num, line], replacement] in mergeJoin(elementLines, replacements):
+		if replacement is not None:
+			yield replacement[1]
+		else:
+			yield parseElementLine(line)
+
+def iterCohesiveElements(facePairs, renumberedRows, cohesiveElementStartNumber, tmpDirectory, runLength):
+	"""Creates the cohesive elements from the cohesive face pairs and the renumbered damage elements as done in step 9.
+
+	Args:
+		facePairs (iterable): Face pairs from matchFaceKeys sorted by backward position and combination
+		renumberedRows (function): Function returning a new stream of the renumbered damage elements sorted by position
+		cohesiveElementStartNumber (int): Number of the first cohesive element
+		tmpDirectory (str): Directory where sorted runs are stored
+		runLength (int): Maximum number of records sorted in memory at once
+
+	Returns:
+		cohesive (iterator): Numbered cohesive elements in the same order as the in-memory engine.
+
+	"""
+	# Nodes of the forward face, joined on the position of the forward element
+	firstFaces = externalSort(((pair[2], pair[0], pair[1]) for pair in facePairs), runLength, tmpDirectory)
+	firstFaces = ((backwardPosition, combination, [row[2][i] for i in faceOrientationDefinition[faceCombinations[combination][0]]])\
+					for [[forwardPosition, backwardPosition, combination], row] in mergeJoin(firstFaces, renumberedRows()))
+	firstFaces = externalSort(firstFaces, runLength, tmpDirectory)
+
+	# Nodes of the backward face, joined on the position of the backward element
+	rcount = cohesiveElementStartNumber
+	for [[backwardPosition, combination, firstFaceCohesiveNodes], row] in mergeJoin(firstFaces, renumberedRows()):
+		secondFaceCohesiveNodes = [row[2][i] for i in faceOrientationDefinition[faceCombinations[combination][1]]]
+		yield [rcount] + firstFaceCohesiveNodes + secondFaceCohesiveNodes
+		rcount = rcount + 1
+
+def runVariants(variants):
+	"""Forks a process for each variant once the model is parsed, running as many at once as fit in memory.
+
+	Args:
+		variants (list): Names of the element sets used as damage zone by each variant
+
+	Returns:
+		[variant, failed] (list): In the process of a variant, its name and an empty list. In the parent process, None once every
+			variant is completed and the names of the variants whose process failed.
+
+	The process of a variant writes to a folder named after the variant inside outputDirectory, set up by useRunDirectory.
+
+	"""
+	missing = [variant for variant in variants if findElsetSection(variant, inputFile)[0] == -1]
+	if missing:
+		print("%d variant(s) have no element set in the inp file:" % len(missing), missing)
+		return [None, missing]
+
+	processes = variantProcessCount(len(variants))
+	print("Running %d variant(s), %d at once" % (len(variants), processes))
+
+	# Only the main thread is left to be forked, the parent process starting no thread while the variants run
+	joinBackgroundThreads(variantThreadTimeout)
+
+	running = {}
+	failed = []
+	for variant in variants:
+		# Wait for a variant to be completed before starting another one
+		while len(running) >= processes:
+			waitVariant(running, failed)
+
+		# Flush the output printed so far, or the forked process would print it again
+		sys.stdout.flush()
+		pid = os.fork()
+
+		if pid == 0:
+			useRunDirectory(os.path.join(outputDirectory, variant))
+			print("Variant %s" % variant)
+			return [variant, []]
+
+		running[pid] = variant
+
+	while running:
+		waitVariant(running, failed)
+
+	return [None, failed]
+
+def joinBackgroundThreads(timeout):
+	"""Stops the progress reports and waits for every thread but this one to end, before the process is forked.
+
+	Args:
+		timeout (float): Seconds waited for each thread
+
+	A forked process only keeps the thread that forked it, so a lock held by another thread at that time, such as the one of
+	sys.stdout while a progress line is printed or the one of a queue of the background writer, would stay locked in it forever.
+	A RuntimeError is raised if a thread is still running after the timeout.
+
+	"""
+	with progressLock:
+		tasks = list(progressTasks)
+	for task in tasks:
+		task.stopped.set()
+
+	running = []
+	for thread in threading.enumerate():
+		if thread is threading.current_thread():
+			continue
+		thread.join(timeout)
+		if thread.is_alive():
+			running.append(thread.name)
+
+	if running:
+		raise RuntimeError("%d thread(s) still running before forking: %s" % (len(running), ', '.join(running)))
+
+def waitVariant(running, failed):
+	"""Waits for the process of a variant to exit.
+
+	Args:
+		running (dict): Name of the variant of each running process, from which the exited one is removed
+		failed (list): Names of the variants whose process failed, to which the exited one is added if it failed
+
+	"""
+	[pid, status] = os.waitpid(-1, 0)
+	if pid in running:
+		if status != 0:
+			failed.append(running[pid])
+		del running[pid]
+
+def useRunDirectory(directory):
+	"""Makes steps 4 to 10 write to another folder, for one of several damage zones of the same parsed model.
+
+	Args:
+		directory (str): Folder replacing outputDirectory, created here
+
+	The pickles of step 3 are hardlinked into the folder and pklFileName points into it. Linking is safe as pklObj replaces pickles
+	instead of overwriting them.
+
+	"""
+	global outputDirectory
+
+	os.makedirs(directory)
+	for key in pklFileName:
+		runFileName = os.path.join(directory, os.path.basename(pklFileName[key]))
+		if os.path.isfile(pklFileName[key]):
+			os.link(pklFileName[key], runFileName)
+		pklFileName[key] = runFileName
+	outputDirectory = directory
+
+	# The status file of the folder only follows the steps run in it
+	with progressLock:
+		del progressSteps[:]
+		del progressTasks[:]
+
+def isLoopbackHost(host):
+	"""Returns True if every address of host is a loopback address, only reachable from this computer."""
+	if not host:
+		return False
+	try:
+		addresses = [info[4][0] for info in socket.getaddrinfo(host, None)]
+	except socket.error:
+		return False
+	return bool(addresses) and all(a.startswith('127.') or a == '::1' for a in addresses)
+
+def serviceListenerAddress(address):
+	"""Turns a service address into the address of a Listener or Client: (host, port) for "<host>:<port>", otherwise a Unix socket path.
+
+	Raises a ValueError if the host is not a loopback address, as the service runs the requests it receives as its user.
+
+	"""
+	if ':' in address and not address.startswith('/'):
+		[host, port] = address.rsplit(':', 1)
+		if not isLoopbackHost(host):
+			raise ValueError("the service only listens on loopback addresses such as localhost, not %s" % host)
+		return (host, int(port))
+	return address
+
+def serviceKeyFile(address):
+	"""Returns the file holding the key of the service at an address: next to its Unix socket, or in the temporary folder for a port."""
+	listenerAddress = serviceListenerAddress(address)
+	if isinstance(listenerAddress, tuple):
+		return os.path.join(tempfile.gettempdir(), "cohesive-service-%s-%d%s" % (listenerAddress[0], listenerAddress[1], serviceKeySuffix))
+	return listenerAddress + serviceKeySuffix
+
+def writeServiceKey(fileName, key):
+	"""Writes the key of the service to a file only this user can read and write, replacing the file of an earlier service."""
+	if os.path.exists(fileName):
+		os.remove(fileName)
+	fd = os.open(fileName, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+	with os.fdopen(fd, 'wb') as fp:
+		fp.write(key)
+
+def serveModel(model):
+	"""Answers insertion requests against a parsed model, one at a time in this process, until a stop request is received.
+
+	Args:
+		model (dict): Sections and search lists of the parsed model from steps 1 to 3 of generateCohesiveElements
+
+	Requests are dictionaries sent with a Client connected to serviceAddress, see runServiceRequest, and each one is answered with
+	a dictionary of results. Connections are accepted by a background thread and each one is authenticated and read by a thread of
+	its own, which queues its request or drops it after serviceRequestTimeout seconds, so a silent client never holds up the others
+	and clients connecting while a request is running wait for their turn. The request {'stop': True} stops the service. nodeList and elementListNormal are unpickled once and
+	kept in model, and each request only copies the rows it changes.
+
+	Clients must present a random key generated for this service and written to serviceKeyFile, readable by this user only. A Unix
+	socket is also created readable and writable by this user only.
+
+	"""
+	authkey = os.urandom(serviceKeyBytes)
+	keyFileName = serviceKeyFile(serviceAddress)
+
+	# The key is checked by the thread of each connection instead of by accept
+	oldMask = os.umask(0o177)
+	try:
+		listener = Listener(serviceListenerAddress(serviceAddress))
+	finally:
+		os.umask(oldMask)
+	writeServiceKey(keyFileName, authkey)
+	requests = queue.Queue()
+
+	# Keep the nodes and elements of step 3 for all requests instead of unpickling them for each one
+	model = dict(model, nodeList=unpklObj(pklFileName['nodeList']), elementListNormal=unpklObj(pklFileName['elementListNormal']))
+	delFile(pklFileName['nodeList'])
+	delFile(pklFileName['elementListNormal'])
+
+	def disconnect(conn, timedOut):
+		# Shutting the socket down wakes the thread of the connection from the handshake or recv it waits in
+		timedOut.set()
+		try:
+			socket.fromfd(conn.fileno(), socket.AF_UNIX if isinstance(listener.address, str) else socket.AF_INET, socket.SOCK_STREAM).shutdown(socket.SHUT_RDWR)
+		except (IOError, socket.error):
+			pass
+
+	def receive(conn):
+		timedOut = threading.Event()
+		timer = threading.Timer(serviceRequestTimeout, disconnect, args=(conn, timedOut))
+		timer.daemon = True
+		timer.start()
+		try:
+			deliver_challenge(conn, authkey)
+			answer_challenge(conn, authkey)
+			request = conn.recv()
+		except (IOError, EOFError, socket.error, mp.AuthenticationError):
+			# A client that disconnected before sending its request, presented the wrong key or was too slow
+			request = None
+		timer.cancel()
+		timer.join()
+
+		if request is not None and not timedOut.is_set():
+			requests.put([conn, request])
+			return
+		if timedOut.is_set():
+			print("A client sent no request within %d seconds and was disconnected" % serviceRequestTimeout)
+		conn.close()
+
+	def accept():
+		while True:
+			try:
+				conn = listener.accept()
+			except (IOError, EOFError, socket.error):
+				# The listener closed when stopping
+				continue
+			receiver = threading.Thread(target=receive, args=(conn,))
+			receiver.daemon = True
+			receiver.start()
+
+	acceptor = threading.Thread(target=accept)
+	acceptor.daemon = True
+	acceptor.start()
+	print("Serving %s on %s" % (inputFile, serviceAddress))
+
+	number = 0
+	try:
+		while True:
+			[conn, request] = requests.get()
+			if request.get('stop'):
+				conn.send({'ok': True})
+				conn.close()
+				break
+
+			number = number + 1
+			reply = runServiceRequest(model, request, number)
+			try:
+				conn.send(reply)
+			except (IOError, EOFError):
+				print("Client of request %d disconnected before its reply" % number)
+			conn.close()
+	finally:
+		listener.close()
+		delFile(keyFileName)
+
+	delFile(pklFileName['elementNumbers'])
+
+def runServiceRequest(model, request, number):
+	"""Runs steps 4 to 10 for a request of the service.
+
+	Args:
+		model (dict): Sections and search lists of the parsed model
+		request (dict): Request holding the damage zone as one of
+				'elset': name of an element set of the inp file
+				'elements': list of element numbers
+				'regions': list of regions as in damageRegions
+			and the options
+				'name': name of the request, used in the name of its folder
+				'validate': True to check the output inp file with validateOutputInp
+				'inp': True to send back the lines of the output inp file
+		number (int): Number of the request since the service started, used in the name of its folder
+
+	Returns:
+		reply (dict): 'ok', then 'directory', 'outputFile', 'damageElements', 'cohesiveElements', 'problems' if validated and
+			'inp' if asked for, or 'error' with the traceback if the request failed. 'seconds' the request took.
+
+	"""
+	global outputDirectory
+
+	time1 = time.time()
+	serviceDirectory = outputDirectory
+	serviceFiles = dict(pklFileName)
+	try:
+		sections = dict(model['sections'])
+		if 'elset' in request:
+			[sections['elementDamageStart'], sections['elementDamageEnd']] = findElsetSection(request['elset'], inputFile)
+			if sections['elementDamageStart'] == -1:
+				raise ValueError("No element set %s in %s" % (request['elset'], inputFile))
+
+		useRunDirectory(os.path.join(serviceDirectory, "%d-%s" % (number, request.get('name', 'request'))))
+
+		if 'elset' in request:
+			elementNumbers = readDamageSet(inputFile, sections['elementDamageStart'], sections['elementDamageEnd'])
+		elif 'regions' in request:
+			if 'centroidGrid' not in model:
+				model['centroidGrid'] = readCentroidGrid(model['elementListNormal'], model['nodeList'], model['nodeListNodeNumber'],\
+										model['nodeListNodeIndex'], model['sections'])
+			elementNumbers = selectDamageElements(model['elementListNormal'], request['regions'], model['centroidGrid'])
+		else:
+			elementNumbers = list(request['elements'])
+		pklObj(elementNumbers, pklFileName['elementNumbers'])
+
+		cohesiveCount = insertCohesiveElements(dict(model, sections=sections))
+
+		reply = {	'ok': True, 'directory': outputDirectory, 'outputFile': outputInpFileName(),\
+					'damageElements': len(elementNumbers), 'cohesiveElements': cohesiveCount}
+		if request.get('validate'):
+			reply['problems'] = validateOutputInp(outputInpFileName(), fallbackNodeNumbers)
+		if request.get('inp'):
+			reply['inp'] = ''.join(iterOutputInpLines(outputInpFileName()))
+	except Exception:
+		reply = {'ok': False, 'error': traceback.format_exc()}
+		print(reply['error'])
+	finally:
+		outputDirectory = serviceDirectory
+		pklFileName.update(serviceFiles)
+
+	reply['seconds'] = time.time() - time1
+	return reply
+
+def requestService(address, request, inpFileName=None):
+	"""Sends a request to the service at an address and prints its reply.
+
+	Args:
+		address (str): "<host>:<port>" or Unix socket path of the service
+		request (dict): Request, see runServiceRequest
+		inpFileName (str): File the lines of the output inp file sent back are written to, or None
+
+	Returns:
+		status (int): 0 if the request succeeded without problems, 1 otherwise.
+
+	The key of the service is read from serviceKeyFile, so requests can only be sent by the user running the service.
+
+	"""
+	try:
+		with open(serviceKeyFile(address), 'rb') as fp:
+			authkey = fp.read()
+	except (IOError, OSError) as e:
+		print("Cannot read the key of the service at %s: %s" % (address, e))
+		return 1
+
+	conn = Client(serviceListenerAddress(address), authkey=authkey)
+	conn.send(request)
+	reply = conn.recv()
+	conn.close()
+
+	if not reply['ok']:
+		print(reply.get('error', "Request failed"))
+		return 1
+
+	if inpFileName is not None and 'inp' in reply:
+		with openText(inpFileName, 'w') as f:
+			f.write(reply.pop('inp'))
+
+	for key in sorted(reply):
+		print("%s: %s" % (key, reply[key]))
+	return 1 if reply.get('problems') else 0
+
+def availableMemory():
+	"""Returns the memory in bytes this program can still use, or None if it cannot be found.
+
+	memoryLimit is used if set. Otherwise the available memory of the system is read from /proc/meminfo and the memory left under
+	the limit of the cgroup of this program, not counting its reclaimable page cache, from cgroupMemoryFiles, and the smallest is kept.
+
+	"""
+	if memoryLimit is not None:
+		return parseMemorySize(memoryLimit)
+
+	limits = []
+	try:
+		with open('/proc/meminfo') as fp:
+			limits.extend(int(line.split()[1])*1024 for line in fp if line.startswith('MemAvailable:'))
+	except (IOError, OSError):
+		pass
+
+	for [limitFile, usageFile, statFile, statKey] in cgroupMemoryFiles:
+		try:
+			with open(limitFile) as fp:
+				limit = fp.read().strip()
+			with open(usageFile) as fp:
+				usage = int(fp.read())
+			with open(statFile) as fp:
+				usage = usage - sum(int(line.split()[1]) for line in fp if line.split()[0] == statKey)
+		except (IOError, OSError, ValueError, IndexError):
+			continue
+		# Without a limit, cgroup v2 reads "max" and cgroup v1 the largest page aligned 64 bit number
+		if limit != 'max' and int(limit) < 2**60:
+			limits.append(int(limit) - usage)
+
+	return max(0, min(limits)) if limits else None
+
+def planMemory(sections):
+	"""Fits the run in the memory it can use, from the size of the model estimated from the line numbers of its sections.
+
+	Args:
+		sections (dict): Line numbers of the sections found in steps 1 and 2
+
+	The memory of the pool and domain engines is estimated from the number of nodes, elements and damage elements (plannerNodeBytes,
+	plannerElementBytes and plannerDamageElementBytes), each process adding the memory of the damage zone it works on. Within
+	plannerMemoryFraction of availableMemory:
+		the out-of-core engine is used if the model does not fit, unless an option needing the whole model in memory is set
+		core is lowered to the number of processes that fit next to the model
+		pendingTaskLimit is set to the number of tasks whose results fit in the memory left
+	The out-of-core engine gets the memory left as its memory budget when maxMemory is not set. Nothing changes when the available
+	memory cannot be found.
+
+	"""
+	global core
+	global engine
+	global maxMemory
+	global pendingTaskLimit
+
+	available = availableMemory()
+	if available is None:
+		print("Memory plan: available memory unknown, running as configured")
+		return
+	budget = int(available * plannerMemoryFraction)
+
+	nodes = max(0, sections['nodeEnd'] - sections['nodeStart'] - 1)
+	elements = max(0, sections['elementNormalEnd'] - sections['elementNormalStart'] - 1)
+	damageLines = max(0, sections['elementDamageEnd'] - sections['elementDamageStart'] - 1)
+	# A damage set of a single line may be a range of element numbers
+	damage = elements if (damageRegions or damageVariants or damageLines <= 1) else min(elements, damageLines * plannerDamageValuesPerLine)
+
+	[modelBytes, processBytes] = modelMemory(nodes, elements, damage)
+	if engine == 'domain':
+		processBytes = processBytes // max(1, subdomainCount if subdomainCount is not None else core)
+
+	if engine != 'outofcore' and modelBytes > budget:
+		if not inCoreModelRequired():
+			print("Memory plan: model estimated at %s does not fit in %s, using the out-of-core engine" % (formatMemorySize(modelBytes), formatMemorySize(budget)))
+			engine = 'outofcore'
+		else:
+			print("Memory plan: model estimated at %s may not fit in %s, running with one process" % (formatMemorySize(modelBytes), formatMemorySize(budget)))
+			core = 1
+			pendingTaskLimit = plannerMinimumPendingTasks
+			return
+
+	if engine == 'outofcore':
+		if maxMemory is None and budget < parseMemorySize(outOfCoreDefaultMemory):
+			maxMemory = str(budget)
+		print("Memory plan: %s available, out-of-core engine with a memory budget of %s" % (formatMemorySize(budget), formatMemorySize(parseMemorySize(maxMemory if maxMemory is not None else outOfCoreDefaultMemory))))
+		return
+
+	if processBytes > 0:
+		core = max(1, min(core, (budget - modelBytes) // processBytes))
+	pendingTaskLimit = max(plannerMinimumPendingTasks, (budget - modelBytes - core * processBytes) // plannerTaskBytes)
+	print("Memory plan: %s available, model estimated at %s and %s per process: %d process(es), %d tasks at once" %\
+			(formatMemorySize(budget), formatMemorySize(modelBytes), formatMemorySize(processBytes), core, pendingTaskLimit))
+
+def modelMemory(nodes, elements, damage):
+	"""Estimates the memory held by the pool and domain engines for a model.
+
+	Args:
+		nodes (int): Number of nodes
+		elements (int): Number of elements
+		damage (int): Number of damage elements
+
+	Returns:
+		[modelBytes, processBytes] (list): Memory of the model and memory added by each process working on the whole damage zone.
+
+	"""
+	modelBytes = nodes * plannerNodeBytes + elements * plannerElementBytes + damage * plannerDamageElementBytes
+	processBytes = damage * plannerDamageElementBytes
+	return [modelBytes, processBytes]
+
+def inCoreModelRequired():
+	"""Returns True if an option needs the whole model in memory, so that the out-of-core engine cannot be used."""
+	return coincidentNodeTolerance is not None or bool(damageRegions) or bool(damageVariants) or serviceAddress is not None
+
+def formatMemorySize(size):
+	"""Converts a number of bytes to a memory size such as "1.5G", the reverse of parseMemorySize."""
+	for [suffix, multiplier] in [['T', 1024**4], ['G', 1024**3], ['M', 1024**2], ['K', 1024]]:
+		if size >= multiplier:
+			return "%.1f%s" % (size / multiplier, suffix)
+	return "%dB" % size
+
+def formatDuration(seconds):
+	"""Converts a number of seconds to a duration such as "12.5s", "3m20s" or "2h05m"."""
+	if seconds < 60:
+		return "%.1fs" % seconds
+	if seconds < 3600:
+		return "%dm%02ds" % (seconds // 60, seconds % 60)
+	return "%dh%02dm" % (seconds // 3600, seconds % 3600 // 60)
+
+def sampleInpSectionLines(fileName, start, end, blocks, lines):
+	"""Reads blocks of consecutive data lines spread evenly through a section of the inp file, skipping the lines in between.
+
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the section
+		end (int): Line number of the header following the section
+		blocks (int): Number of blocks
+		lines (int): Number of lines of each block
+
+	Returns:
+		samples (list): Lines of each block, the whole section being a single block when it has no more than blocks*lines lines.
+
+	The blocks start at evenly spaced bytes of the section, found by inpSectionByteRange. A compressed inp file can only be read
+	up to a byte by decompressing everything before it, so its first blocks*lines lines are read instead.
+
+	"""
+	if fileCompression(fileName) is not None:
+		return [[line for [num, line] in itertools.islice(iterInpSectionLines(fileName, start, end), blocks * lines)]]
+
+	[begin, stop] = inpSectionByteRange(fileName, start, end)
+	with open(fileName, 'rb') as fp:
+		if end - start - 1 <= blocks * lines:
+			fp.seek(begin)
+			return [textFromBytes(fp.read(stop - begin)).split('\n')[:-1]]
+
+		samples = []
+		for b in range(blocks):
+			# Start after the newline ending the line the block's first byte falls in
+			fp.seek(begin + (stop - begin) * b // blocks - 1)
+			fp.readline()
+			block = []
+			while len(block) < lines and fp.tell() < stop:
+				block.append(textFromBytes(fp.readline()))
+			samples.append(block)
+	return samples
+
+def estimateSetSize(fileName, start, end):
+	"""Estimates the number of elements of an element set from a sample of its lines, as read by readDamageSet.
+
+	Args:
+		fileName (str): File name of the inp file
+		start (int): Line number of the header of the set
+		end (int): Line number of the header following the set
+
+	Returns:
+		[elements, exact] (list): Number of elements of the set, and True if it was counted on every line of the set.
+
+	A set longer than the lines of sampleInpSectionLines is estimated from its number of lines times the mean number of elements
+	on the lines read.
+
+	"""
+	samples = sampleInpSectionLines(fileName, start, end, dryRunSampleBlocks, dryRunSampleLines)
+	lines = max(0, end - start - 1)
+	if len(samples) == 1 and len(samples[0]) >= lines:
+		values = [int(v) for line in samples[0] for v in line.split(',') if v.strip()]
+		if len(values) == 3 and values[0] == values[2]:
+			return [max(0, values[1] - values[0] + 1), True]
+		return [len(values), True]
+
+	sampled = [line for block in samples for line in block]
+	values = sum(len([v for v in line.split(',') if v.strip()]) for line in sampled)
+	return [int(round(values * lines / max(1, len(sampled)))), False]
+
+def parsingSpeed(sections):
+	"""Returns how many times longer than on the computer dryRunStepCosts were measured on the lines of the model take to parse.
+
+	Args:
+		sections (dict): Line numbers of the sections found in steps 1 and 2
+
+	The first dryRunCalibrationLines lines of the node and of the element sections are read, then parsed dryRunCalibrationRepeats
+	times and the fastest time is kept.
+
+	"""
+	samples = []
+	for [parseLine, start, end] in [	[parseNodeLine, sections['nodeStart'], sections['nodeEnd']],\
+										[parseElementLine, sections['elementNormalStart'], sections['elementNormalEnd']] ]:
+		samples.append([parseLine, sampleInpSectionLines(inputFile, start, end, 1, dryRunCalibrationLines)[0]])
+
+	seconds = None
+	for repeat in range(dryRunCalibrationRepeats):
+		time1 = time.time()
+		for [parseLine, lines] in samples:
+			for line in lines:
+				parseLine(line)
+		seconds = min(seconds, time.time() - time1) if seconds is not None else time.time() - time1
+
+	lines = sum(len(lines) for [parseLine, lines] in samples)
+	return seconds / max(1, lines) / dryRunReferenceLineSeconds
+
+def predictStep(step, items, seconds, dispatchSeconds, workers):
+	"""Predicts the time a step takes and the number of processes it runs on.
 
-	elementListNormal = _elementListNormal
-	elementListNormalNumber = _elementListNormalNumber
-	elementListNormalIndex = _elementListNormalIndex
-	
-def check6(elementListNode):
-	"""Fuction processed by individual processes to search for the element with modified node numbers from the complete list of elements.
-			
 	Args:
-		elementListNode (list): Element node entry with defining nodes that have been modified to add cohesive elements.
-		
+		step (str): Name of the step, used to look up its backend in stepBackends
+		items (int): Number of items of the step
+		seconds (float): Seconds each item takes in this process
+		dispatchSeconds (float): Seconds each item takes to be handed to a process of a pool, or None if the step does not use a pool
+		workers (int): Number of cores the step can use
+
 	Returns:
-		[index, elementListNormalNode] (list): Index of the element to be modified and its new node numbers.
-	
+		[seconds, processes] (list): Predicted seconds of the step and number of processes running it, 1 in this process.
+
+	The backend is picked as createPool and AutoPool would. Threads are counted as this process, as the steps hold the GIL.
+
 	"""
-	index = bisectSearchSortedList(elementListNode[0], elementListNormalNumber, elementListNormalIndex)
-	elementListNormalNode = elementListNormal[index]
+	work = items * seconds
+	if dispatchSeconds is None:
+		return [work, 1]
 
-	if elementListNode[0] == elementListNormalNode[0]:
-		for k in range(1,len(elementListNode)):
-			elementListNormalNode[k] = elementListNode[k]
-		return [index, elementListNormalNode]
+	setting = stepBackends.get(step, backend)
+	[name, processes] = parseBackend(setting)
+	if ':' not in setting:
+		processes = workers
 
-	# Should not go here
-	return [index, elementListNormalNode]
+	if name == 'auto':
+		processes = min(workers, int(work / autoSecondsPerProcess))
+		if work < autoSerialSeconds or processes < 2:
+			return [work, 1]
+	if name in ['serial', 'threads']:
+		return [work, 1]
 
+	return [items * dispatchSeconds + work / processes, processes]
+
+def estimateRun(sections):
+	"""Prints the predicted time and peak memory of each step at several numbers of processes without running them (--dry-run).
 
-def func6(elementList, elementListNormal, elementListNormalNumber, elementListNormalIndex):
-	"""Fuction to set up the multiprocess procedure to find and modify elements in the normal element list to add cohesive elements.
-		
 	Args:
-		elementNumbers (list): List of element numbers to have cohesive elements inserted into
-		elementListNormal (list): List that contains the list of all elements and their defining node numbers
-		elementListNormalNumber (list): List that contains element numbers in elementListNormal sorted in increasing order
-		elementListNormalIndex (list): Paired list corresponding with _elementListNormalNumber which points to index of the element number in _elementListNormal
-	
+		sections (dict): Line numbers of the sections found in steps 1 and 2
+
+	The nodes and elements are counted from the line numbers of their sections and the damage elements estimated by estimateSetSize
+	from the damage set (the largest set of the variants, or every element when the damage zone comes from regions). In a mesh of
+	hexahedra, each element has 3 faces shared with another element, less about one for each node in excess of the elements on the
+	boundary of the mesh: a block of n*n*n elements has 3*n*n*(n-1) shared faces and (n+1)**3 nodes. The damage elements are assumed
+	to share as many faces as the elements of the whole mesh, which is within a few percent on compact damage zones. The time of each step is the cost of its items in dryRunStepCosts, scaled to this computer by parsingSpeed
+	and split between the processes its backend would start. Its peak memory is estimated as in planMemory. Only blocks of lines of
+	the sections are read, so the prediction takes little more than the scan of steps 1 and 2 whatever the size of the model.
+
 	"""
-	
-	pool2 = mp.Pool(processes=core, initializer = init6, initargs=(elementListNormal,elementListNormalNumber, elementListNormalIndex,))
-	
-	results = []
-	
-	for elementListNode in elementList:
-		results.append(pool2.apply_async(check6,(elementListNode,)))
-	pool2.close()
-	pool2.join()
+	nodes = max(0, sections['nodeEnd'] - sections['nodeStart'] - 1)
+	elements = max(0, sections['elementNormalEnd'] - sections['elementNormalStart'] - 1)
+
+	if damageRegions:
+		[damage, exact] = [elements, True]
+	elif damageVariants:
+		[damage, exact] = max(estimateSetSize(inputFile, *findElsetSection(variant, inputFile)) for variant in damageVariants)
+	else:
+		[damage, exact] = estimateSetSize(inputFile, sections['elementDamageStart'], sections['elementDamageEnd'])
+
+	facesPerElement = min(3, max(0, 3 - (nodes - elements) / max(1, elements)))
+	faces = int(facesPerElement * damage)
+	items = {'lines': nodes + elements, 'damage': damage, 'faces': faces, 'output': nodes + elements + int(faces * (1 + dryRunNewNodesPerFace))}
+	speed = parsingSpeed(sections)
+
+	print("Dry run: %d nodes, %d elements, %s%d damage elements%s and about %d shared faces (%.2f per element)" %\
+			(nodes, elements, "" if exact else "about ", damage, " (every element, the damage zone coming from regions)" if damageRegions else "",\
+			faces, facesPerElement))
+	print("Step costs scaled by %.2f from the time taken to parse the first lines of the node and element sections" % speed)
+
+	available = availableMemory()
+	budget = int(available * plannerMemoryFraction) if available is not None else None
+	[modelBytes, processBytes] = modelMemory(nodes, elements, damage)
+	parsedBytes = nodes * plannerNodeBytes + elements * plannerElementBytes
+
+	stepEngine = engine
+	if memoryPlanning and budget is not None and engine != 'outofcore' and modelBytes > budget and not inCoreModelRequired():
+		print("Model estimated at %s does not fit in %s, the memory plan would use the out-of-core engine" % (formatMemorySize(modelBytes), formatMemorySize(budget)))
+		stepEngine = 'outofcore'
+	outOfCoreBytes = parseMemorySize(maxMemory if maxMemory is not None else outOfCoreDefaultMemory)
+	if memoryPlanning and budget is not None and maxMemory is None:
+		outOfCoreBytes = min(outOfCoreBytes, budget)
+
+	workerCounts = sorted(set(dryRunWorkers + [core]))
+	steps = []
+	for [step, kind, seconds, dispatchSeconds, stream] in dryRunStepCosts[stepEngine]:
+		if stream is not None and stream != streamOutput:
+			continue
+		cells = []
+		for workers in workerCounts:
+			[stepSeconds, processes] = predictStep(step, items[kind], seconds * speed, dispatchSeconds * speed if dispatchSeconds is not None else None, workers)
+			if stepEngine == 'outofcore':
+				stepBytes = min(outOfCoreBytes, modelBytes)
+			elif kind == 'lines':
+				stepBytes = parsedBytes
+			else:
+				subdomains = subdomainCount if subdomainCount is not None else workers
+				stepBytes = modelBytes + (processes * processBytes // (subdomains if stepEngine == 'domain' else 1) if processes > 1 else 0)
+			cells.append([stepSeconds, dryRunBaseBytes + stepBytes])
+		steps.append([step, cells])
+
+	print("Predicted time and peak memory of the %s engine for each number of processes:" % stepEngine)
+	print("%-12s" % "Processes" + "".join("%18d" % workers for workers in workerCounts))
+	for [step, cells] in steps:
+		print("%-12s" % step + "".join("%18s" % ("%s %s" % (formatDuration(stepSeconds), formatMemorySize(stepBytes))) for [stepSeconds, stepBytes] in cells))
+
+	totals = [[sum(cells[w][0] for [step, cells] in steps), max(cells[w][1] for [step, cells] in steps)] for w in range(len(workerCounts))]
+	print("%-12s" % "Total" + "".join("%18s" % ("%s %s%s" % (formatDuration(stepSeconds), formatMemorySize(stepBytes), "*" if budget is not None and stepBytes > budget else "")) for [stepSeconds, stepBytes] in totals))
+	if budget is not None:
+		print("Memory available: %s%s" % (formatMemorySize(budget), ", * marks peaks above it" if any(stepBytes > budget for [stepSeconds, stepBytes] in totals) else ""))
+
+def variantProcessCount(variants):
+	"""Returns the number of variants run at once: variantProcesses if set, otherwise as many as fit in the available memory, up to core.
 
-	for result in results:
-		fixElementListNormal = result.get()
-		
-		# Apply the changes found in node ordering to cohseive nodes
-		elementListNormal[fixElementListNormal[0]] = fixElementListNormal[1]
-		
-# Called in step 9
-# Support functions for multiprocessing for this step
-def init7(_elementList, _elementListNumber, _elementListIndex, _faceOrientation):
-	"""Fuction to initialize global read only variables for each process.
-			
 	Args:
-		_elementList (list): List of element numbers to have cohesive elements inserted into
-		_elementListNumber (list): List that contains element numbers in elementList sorted in increasing order
-		_elementListIndex (list): Paired list corresponding with _elementListNumber which points to index of the element number in _elementList
-		_faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
-	
+		variants (int): Number of variants
+
+	Returns:
+		processes (int): Number of variants run at once.
+
+	The memory used by a variant is estimated as variantMemoryFactor times the size of the pickled nodes and elements, and the
+	available memory is found by availableMemory. Without it, core variants are run at once.
+
 	"""
+	if variantProcesses is not None:
+		return max(1, min(variantProcesses, variants))
+
+	processes = min(core, variants)
+	modelSize = os.path.getsize(pklFileName['nodeList']) + os.path.getsize(pklFileName['elementListNormal'])
+	available = availableMemory()
+	if available is None:
+		return processes
+	return max(1, min(processes, available // (variantMemoryFactor * modelSize)))
+
+def validateStep():
+	"""Checks the output inp file before it is handed to Abaqus if validateOutput is on, exiting with status 1 if it has defects."""
+	if validateOutput:
+		time1 = stepStart("Step11")
+		problems = validateOutputInp(outputInpFileName(), fallbackNodeNumbers)
+		stepEnd("Step11", time1)
+		if problems > 0:
+			sys.exit(1)
+
+def stepStart(step):
+	"""Prints the start of a step and returns its starting time for savingTime.
 
-	global elementList
-	global elementListNumber
-	global elementListIndex
-	global faceOrientation
-	
-	elementList = _elementList
-	elementListNumber = _elementListNumber
-	elementListIndex = _elementListIndex
-	faceOrientation = _faceOrientation
-	
-def check7(cohesiveFacePair):
-	"""Fuction processed by individual processes to search for the elements that make up the cohesive face pairs and create the cohesive element.
-			
 	Args:
-		cohesiveFacePair (list): A list containing a pair of cohesiveFace elements that combine to form a cohesive element.
-		
+		step (str): Tag of the step
+
 	Returns:
-		cohesiveElement (list): Fully formed cohesive element from the cohesiveFace pair.
-	
+		time1 (str): Starting time of the step.
+
 	"""
-	# Seperate out the first face and second faces that make up the cohesive element
-	[firstFace, secondFace] = cohesiveFacePair
+	print(step)
+	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+	print(time1)
+	return time1
 
-	# For each face, find the element attached to each side of each cohesive face from elementList
-	index = bisectSearchSortedList(firstFace[0], elementListNumber, elementListIndex)
-	firstFaceElementNode = elementList[index]
-	
-	index = bisectSearchSortedList(secondFace[0], elementListNumber, elementListIndex)
-	secondFaceElementNode = elementList[index]
-	
-	# Reconstruct the cohesive element based on orientation information saved from step 5 and 6
-	
-	# We know the node numbers we want and their final positions based on the orientation of the first and second faces (defined in face[1])
-	
-	# Get the element numbers relevant for creating the cohesive nodes for the first and second faces
-	firstFaceCohesiveNodes = [firstFaceElementNode[i] for i in faceOrientation[firstFace[1]]]
-	secondFaceCohesiveNodes = [secondFaceElementNode[i] for i in faceOrientation[secondFace[1]]]
-	
-	# Create the cohesive element by placing the 2 faces back to back
-	cohesiveElement = [0] + firstFaceCohesiveNodes + secondFaceCohesiveNodes
-	
-	# Return the reconstructed element
-	return cohesiveElement
+def stepEnd(step, time1):
+	"""Prints the end of a step and saves the time it took.
 
-def func7(cohesiveFaces, elementList, elementListNumber, elementListIndex, faceOrientation):
-	"""Fuction to set up the multiprocess procedure to create the cohesive element from the cohesive faces.
-	
 	Args:
-		cohesiveFaces (list): List of cohesive faces sorted by corresponding pairs of cohesive faces
-		elementList (list): List of element numbers to have cohesive elements inserted into
-		elementListNumber (list): List that contains element numbers in elementList sorted in increasing order
-		elementListIndex (list): Paired list corresponding with elementListNumber which points to index of the element number in elementList
-		faceOrientation (dict): Dictionary containing all possible face orientations for an element defined by node index number
-	
-	cohesiveFaces is a global variable containing the list of cohesive faces that make up the cohesive elements. Note that the 
-	structure of cohesiveFaces make it such that each pair of faces strating from index 0 form a cohesive element with each other
-	(i.e: (cohesiveFaces[0], cohesiveFaces[1]) form a pair to make a cohesive element as will (cohesiveFaces[2n], cohesiveFaces[2n+1])).
-	
+		step (str): Tag of the step
+		time1 (str): Starting time of the step from stepStart
+
 	"""
-	createFaceElement = False
-	firstFace = []
-	
-	pool2 = mp.Pool(processes=core, initializer = init7, initargs=(elementList, elementListNumber, elementListIndex, faceOrientation,))
-	
-	results = []
-	
-	for cohesiveFaceNode in cohesiveFaces:
-		
-		if createFaceElement:
-			results.append(pool2.apply_async(check7,([firstFace,cohesiveFaceNode],)))
-			createFaceElement = False
-			
-		else:
-			firstFace = cohesiveFaceNode
-			createFaceElement = True
-		
-	pool2.close()
-	pool2.join()
-	
-	cohesive = []
-	
-	for result in results:
-		cohesive.append(result.get())
-		
-	return cohesive
+	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+	print(time2)
+	print("##############################")
+	savingTime(step,time1,time2)
+
+def insertCohesiveElementsOutOfCore(sections):
+	"""Inserts cohesive elements while holding at most maxMemory worth of records in memory (steps 3 to 10).
+
+	Args:
+		sections (dict): Line numbers of the sections of the input inp file found in Step 1 and 2
+
+	Instead of building every list in memory, each step streams the sections of the input inp file and joins sorted record
+	streams. Lookups done with bisect searches in the in-memory engine become merge joins between streams sorted on the same
+	key, face matching becomes an external sort of the face keys and node splitting a streaming join of the cohesive face nodes
+	with the nodes of the damage elements. Records that do not fit in the memory budget are spilled as sorted runs to a
+	temporary folder of the output directory, removed at the end of the run. The output is the same as the in-memory engine.
+
+	"""
+	memoryBudget = parseMemorySize(maxMemory if maxMemory is not None else outOfCoreDefaultMemory)
+	runLength = max(outOfCoreBlockSize, memoryBudget//(outOfCoreRecordSize*outOfCoreLiveRuns))
+	print("Out-of-core engine with a memory budget of %d bytes (%d records per sorted run)" % (memoryBudget, runLength))
+
+	tmpDirectory = tempfile.mkdtemp(prefix='outofcore-', dir=outputDirectory)
+	elementSection = [inputFile, sections['elementNormalStart'], sections['elementNormalEnd']]
+	nodeSection = [inputFile, sections['nodeStart'], sections['nodeEnd']]
+	nodeLines = sections['nodeEnd'] - sections['nodeStart'] - 1
+	elementLines = sections['elementNormalEnd'] - sections['elementNormalStart'] - 1
+
+	# Steps stream their records instead of running a pool, so their progress counts the records each of them goes through
+	#____________________STEP 3 and 4______________________________
+	# Sort the nodes, the elements and the damage element numbers and join the damage element numbers with their elements
+	time1 = stepStart("Step3and4")
+	progress = StepProgress('Step3and4', 2 * (nodeLines + elementLines), 'lines')
+
+	# Find the largest node and element numbers to identify the starting numbers for new elements and nodes
+	maxElementNumber = BackgroundTask(maxSectionNumber, iterProgress(iterInpSectionLines(*elementSection), progress))
+	maxNodeNumber = maxSectionNumber(iterProgress(iterInpSectionLines(*nodeSection), progress))
+	maxElementNumber = maxElementNumber.get()
+	cohesiveElementStartNumber = int(10**(math.floor(math.log10(maxNodeNumber))+1))
+	cohesiveNodeStartNumber = int(10**(math.floor(math.log10(maxElementNumber))+1))
+
+	sortedNodes = externalSort(((int(node[0]), num, node) for num, node in ((num, parseNodeLine(line)) for num, line in iterProgress(iterInpSectionLines(*nodeSection), progress))), runLength, tmpDirectory)
+	sortedNodesFile = spillRecords(sortedNodes, tmpDirectory)
+
+	sortedElements = externalSort(((element[0], num, element) for num, element in ((num, parseElementLine(line)) for num, line in iterProgress(iterInpSectionLines(*elementSection), progress))), runLength, tmpDirectory)
+	sortedDamageNumbers = externalSort(iterDamageElementNumbers(inputFile, sections['elementDamageStart'], sections['elementDamageEnd']), runLength, tmpDirectory)
+
+	missingElements = []
+	damageRows = joinDamageElements(sortedDamageNumbers, sortedElements, missingElements)
+	damageRowsFile = spillRecords(externalSort(damageRows, runLength, tmpDirectory), tmpDirectory)
+	damageCount = sum(1 for row in readRecords(damageRowsFile))
+	progress.finish()
+
+	if missingElements:
+		print("%d damage element(s) could not be found in the element section and were skipped:" % len(missingElements), missingElements[:10])
+
+	stepEnd("Step3and4", time1)
+
+	#____________________STEP 5 and 6______________________________
+	# Sort the forward and backward faces of the damage elements together so that shared faces are next to each other
+	time1 = stepStart("Step5and6")
+	progress = StepProgress('Step5and6', 2 * 2 * len(faceCombinations) * damageCount, 'faces')
+
+	sortedFaceKeys = externalSort(iterProgress(iterFaceKeys(readRecords(damageRowsFile)), progress), runLength, tmpDirectory)
+	facePairsFile = spillRecords(externalSort(matchFaceKeys(iterProgress(sortedFaceKeys, progress)), runLength, tmpDirectory), tmpDirectory)
+	progress.finish()
+
+	#saving the pairNodes
+	dumpDiagnostic('pairNodes', (face for pair in readRecords(facePairsFile)\
+						for face in [[pair[3], faceCombinations[pair[1]][0]] + list(pair[5]), [pair[4], faceCombinations[pair[1]][1]] + list(pair[5])]))
+
+	stepEnd("Step5and6", time1)
+
+	#____________________STEP 7______________________________
+	# Renumber the cohesive face nodes of every damage element after the first one sharing them
+	time1 = stepStart("Step7")
+	progress = StepProgress('Step7', 2 * damageCount, 'damage elements')
+
+	cohesiveNodes = externalSort((node for pair in readRecords(facePairsFile) for node in pair[5]), runLength, tmpDirectory)
+	cohesiveNodes = (node for node, duplicates in itertools.groupby(cohesiveNodes))
+	incidences = externalSort(((element[k], position, k) for (position, line, element) in iterProgress(readRecords(damageRowsFile), progress) for k in range(1,9)), runLength, tmpDirectory)
+	fixesFile = spillRecords(splitCohesiveNodes(cohesiveNodes, incidences, cohesiveNodeStartNumber), tmpDirectory)
+
+	sortedFixes = externalSort(((position, column, newNode) for (position, column, newNode, node) in readRecords(fixesFile)), runLength, tmpDirectory)
+	renumberedRowsFile = spillRecords(iterRenumberedRows(iterProgress(readRecords(damageRowsFile), progress), sortedFixes), tmpDirectory)
+
+	# Nodes are created in order of the original node number, then of the damage elements sharing it
+	newNodes = externalSort(((node, position, newNode) for (position, column, newNode, node) in readRecords(fixesFile)), runLength, tmpDirectory)
+	fallbacks = []
+	newNodesFile = spillRecords(iterNewNodes((newNode for (node, position, newNode) in newNodes), readRecords(sortedNodesFile), cohesiveNodeStartNumber, tmpDirectory, runLength, fallbacks), tmpDirectory)
+	fallbackNodeNumbers[:] = fallbacks
+
+	progress.finish()
+
+	stepEnd("Step7", time1)
+
+	#____________________STEP 8 and 9______________________________
+	# Create the cohesive elements from the renumbered damage elements
+	time1 = stepStart("Step8and9")
+
+	# One cohesive element is created for each face pair
+	cohesiveCount = sum(1 for pair in readRecords(facePairsFile))
+	progress = StepProgress('Step8and9', cohesiveCount + damageCount, 'elements')
+
+	cohesiveFile = spillRecords(iterProgress(iterCohesiveElements(readRecords(facePairsFile), lambda: readRecords(renumberedRowsFile), cohesiveElementStartNumber, tmpDirectory, runLength), progress), tmpDirectory)
+	sortedRenumberedRowsFile = spillRecords(externalSort(((line, position, element) for (position, line, element) in iterProgress(readRecords(renumberedRowsFile), progress)), runLength, tmpDirectory), tmpDirectory)
+	progress.finish()
+
+	#Saving Files
+	dumpDiagnostic('elementList', (element for (position, line, element) in readRecords(renumberedRowsFile)))
+	dumpDiagnostic('cohesiveElement', readRecords(cohesiveFile))
+
+	stepEnd("Step8and9", time1)
+
+	#____________________STEP 10______________________________
+	time1 = stepStart("Step10")
+	newNodeCount = sum(1 for node in readRecords(newNodesFile))
+	progress = StepProgress('Step10', nodeLines + newNodeCount + elementLines + cohesiveCount, 'rows')
+
+	writeOutputInp(outputInpFileName(), sections,\
+					iterProgress(iterOutputNodes(iterInpSectionLines(*nodeSection), readRecords(newNodesFile)), progress),\
+					iterProgress(iterOutputElements(iterInpSectionLines(*elementSection), readRecords(sortedRenumberedRowsFile)), progress),\
+					iterProgress(readRecords(cohesiveFile), progress), [cohesiveElementStartNumber, cohesiveElementStartNumber + cohesiveCount - 1])
+	progress.finish()
+
+	stepEnd("Step10", time1)
+
+	# Remove sorted runs from disk
+	shutil.rmtree(tmpDirectory)
 
 def generateCohesiveElements():
 	"""Main function for generating cohesive elements.
@@ -1004,9 +5396,9 @@ def generateCohesiveElements():
 	""" Identify the individual sections of the files and store their starting and ending line numbers. Stop script if any section is not clearly defined.
 
 	"""
-	print "Step1and2"
+	print("Step1and2")
 	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+	print(time1)
 
 	#Preassign line numbers to each header and ending to identify if a section is incomplete
 	nodeStart = -1
@@ -1027,65 +5419,82 @@ def generateCohesiveElements():
 	#marking the start and end of Normal elements
 	[elementNormalStart, elementNormalEnd] = findInpSectionStartEnd(elementNormalStartInp, elementNormalEndInp, inputFile)
 
+	#Damage elements selected by damageRegions or damageVariants do not need a damage set. The cohesive elements are then written after the elements
+	if (damageRegions or damageVariants) and elementDamageStart == -1:
+		[elementDamageStart, elementDamageEnd] = [elementNormalEnd, elementNormalEnd]
+
 	#If any of the start and end sections were not found, display an error and exit:
 	if -1 in [nodeStart, nodeEnd, elementDamageStart, elementDamageEnd, elementNormalStart, elementNormalEnd]:
 		
-		print "\nOne or more section(s) is/are missing. Line number of each sections found are listed below:"
-		print "	   node = "+str(nodeStart)+" to "+str(nodeEnd)
-		print "	   elementDamage = "+str(elementDamageStart)+" to "+str(elementDamageEnd)
-		print "	   elementNormal = "+str(elementNormalStart)+" to "+str(elementNormalEnd)
-		print ""
+		print("\nOne or more section(s) is/are missing. Line number of each sections found are listed below:")
+		print("	   node = "+str(nodeStart)+" to "+str(nodeEnd))
+		print("	   elementDamage = "+str(elementDamageStart)+" to "+str(elementDamageEnd))
+		print("	   elementNormal = "+str(elementNormalStart)+" to "+str(elementNormalEnd))
+		print("")
 		
-		if nodeStart is -1:
-			print "Start of node section was not found. Missing header starting with:\n	   ", nodeStartInp
+		if nodeStart == -1:
+			print("Start of node section was not found. Missing header starting with:\n	   ", nodeStartInp)
 			
-		if nodeEnd is -1:
-			print "End of node section was not found. Missing header starting with:\n	 ", nodeEndInp
+		if nodeEnd == -1:
+			print("End of node section was not found. Missing header starting with:\n	 ", nodeEndInp)
 			
-		if elementDamageStart is -1:
-			print "Start of damage section was not found. Missing header starting with:\n	 ", elementDamageStartInp
+		if elementDamageStart == -1:
+			print("Start of damage section was not found. Missing header starting with:\n	 ", elementDamageStartInp)
 		
-		if elementDamageEnd is -1:
-			print "End of damage section was not found. Missing header starting with:\n	   ", elementDamageEndInp
+		if elementDamageEnd == -1:
+			print("End of damage section was not found. Missing header starting with:\n	   ", elementDamageEndInp)
 			
-		if elementNormalStart is -1:
-			print "Start of element section was not found. Missing header starting with:\n	  ", elementNormalStartInp
+		if elementNormalStart == -1:
+			print("Start of element section was not found. Missing header starting with:\n	  ", elementNormalStartInp)
 			
-		if elementNormalEnd is -1:
-			print "End of element section was not found. Missing header starting with:\n	", elementNormalEndInp
+		if elementNormalEnd == -1:
+			print("End of element section was not found. Missing header starting with:\n	", elementNormalEndInp)
 		
 		return
 
 		
 		
 	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
+	print(time2)
+	print("##############################")
 	savingTime("Step1and2",time1,time2)
+
+	# Line numbers of each section, used when writing the new inp file
+	sections = {'nodeStart': nodeStart, 'nodeEnd': nodeEnd,\
+				'elementDamageStart': elementDamageStart, 'elementDamageEnd': elementDamageEnd,\
+				'elementNormalStart': elementNormalStart, 'elementNormalEnd': elementNormalEnd}
+
+	# Predict the time and memory of the steps from the sections found instead of running them
+	if dryRun:
+		estimateRun(sections)
+		return
+
+	# Pick the engine, the number of processes and the number of tasks at once from the memory available
+	if memoryPlanning:
+		planMemory(sections)
+
+	# The out-of-core engine replaces steps 3 to 10 when the model does not fit in memory
+	if engine == 'outofcore':
+		insertCohesiveElementsOutOfCore(sections)
+		validateStep()
+		return
+
 	#____________________STEP 3______________________________
 	""" Parsing and storing the nodes, elements and damage elements into lists for easy access. 
 
 	"""
-	print "Step3"
+	print("Step3")
 	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+	print(time1)
 
-	#storing nodes from file
-	nodeList = []
-	with open(inputFile) as fp:
-		nodeEndTemp = nodeEnd - 1
-		for num, line in enumerate(fp):
-			if num < nodeStart:
-				continue
-			if num >= nodeEndTemp:
-				break
-			d = line.strip().split(",")
-			nodeList.append(d) 
+	# Read the element section in the background while the nodes and the damage elements are being stored. Its pool is started
+	# here so that no process is forked from the background thread, which only gathers the parsed shards
+	elementListNormalReading = submitInpSection(inputFile, elementNormalStart, elementNormalEnd, parseElementLine, 'element')
+	elementListNormalReader = BackgroundTask(collectInpSection, elementListNormalReading, inputFile, elementNormalStart, elementNormalEnd, parseElementLine)
+	elementListNormalReading = None
 
-	#getting rid of the extra space in the list
-	for z in range (0, len(nodeList)):
-		for k in range (0,4):
-			nodeList[z][k] = nodeList[z][k].strip()
+	#storing nodes from file
+	nodeList = readInpSection(inputFile, nodeStart, nodeEnd, parseNodeLine, 'node')
 
 	# Sort nodeList to make searching quicker (for safe measure)
 	nodeListNodeNumber = []
@@ -1100,48 +5509,25 @@ def generateCohesiveElements():
 
 	##############################################
 	#Storing damage elments from file
-	temp = []
-	with open(inputFile) as fp:
-		elementEndTemp = elementDamageEnd - 1
-		for num, line in enumerate(fp):
-			if num < elementDamageStart:
-				continue
-			if num >= elementEndTemp:
-				break
-			d = line.strip().split(",")
-			temp = d + temp
-
-	#getting rid of empty entry
-	elementNumbers = filter(None, temp)
-
-	#getting rid of the extra space in the list
-	for z in range (0, len(elementNumbers)):
-		elementNumbers[z] = int(elementNumbers[z].strip())
-		
-	#Correcting for if damage elements is a range rather than a list
-	if len(elementNumbers) == 3 and elementNumbers[0] == elementNumbers[2]:
-		elementNumbers = range(elementNumbers[0], elementNumbers[1] + 1)
+	elementNumbers = readDamageSet(inputFile, elementDamageStart, elementDamageEnd)
 
 	#Pickle object to disk for later use	
 	elementNumbers = pklObj(elementNumbers, pklFileName['elementNumbers'])
 
 	##############################################
 	#Storing normal elments from file
-	elementListNormal = []
-	with open(inputFile) as fp:
-		elementNormalEndTemp = elementNormalEnd - 1
-		for num, line in enumerate(fp):
-			if num < elementNormalStart:
-				continue
-			if num >= elementNormalEndTemp:
-				break
-			d = line.strip().split(",")
-			elementListNormal.append(d)
+	elementListNormal = elementListNormalReader.get()
+	elementListNormalReader = None
 
-	#getting rid of the extra space in the list
-	for z in range (0, len(elementListNormal)):
-		for k in range (0,9):
-			elementListNormal[z][k] = int(elementListNormal[z][k].strip())
+	# Select the damage elements by the position of their centroid in place of the damage set
+	if damageRegions:
+		nodeList = unpklObj(pklFileName['nodeList'])
+		grid = readCentroidGrid(elementListNormal, nodeList, nodeListNodeNumber, nodeListNodeIndex, sections)
+		nodeList = []
+		elementNumbers = selectDamageElements(elementListNormal, damageRegions, grid)
+		grid = None
+		print("%d damage element(s) selected inside %d region(s)" % (len(elementNumbers), len(damageRegions)))
+		elementNumbers = pklObj(elementNumbers, pklFileName['elementNumbers'])
 
 	# Sort elementListNormal by node number to prepare for binary search later on in the program
 	elementListNormalNumber = []
@@ -1155,22 +5541,103 @@ def generateCohesiveElements():
 	elementListNormal = pklObj(elementListNormal, pklFileName['elementListNormal'])
 
 	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
+	print(time2)
+	print("##############################")
 	savingTime("Step3",time1,time2)
+
+	if serviceAddress is not None:
+		#____________________SERVICE______________________________
+		""" Keep the parsed model and answer the insertion requests of other processes until told to stop.
+
+		"""
+		serveModel({	'sections': sections,\
+						'nodeListNodeNumber': nodeListNodeNumber, 'nodeListNodeIndex': nodeListNodeIndex,\
+						'elementListNormalNumber': elementListNormalNumber, 'elementListNormalIndex': elementListNormalIndex,\
+						'cohesiveElementStartNumber': cohesiveElementStartNumber, 'cohesiveNodeStartNumber': cohesiveNodeStartNumber})
+		return
+
+	if damageVariants:
+		#____________________VARIANTS______________________________
+		""" Run steps 4 to 10 for each variant in its own process forked from the parsed model. The parent process stops here.
+
+		"""
+		[variant, failed] = runVariants(damageVariants)
+
+		if variant is None:
+			delFile(pklFileName['elementListNormal'])
+			delFile(pklFileName['nodeList'])
+			delFile(pklFileName['elementNumbers'])
+			if failed:
+				print("%d variant(s) failed:" % len(failed), failed)
+				sys.exit(1)
+			return
+
+		# Damage set of the variant
+		[elementDamageStart, elementDamageEnd] = findElsetSection(variant, inputFile)
+		sections['elementDamageStart'] = elementDamageStart
+		sections['elementDamageEnd'] = elementDamageEnd
+		elementNumbers = pklObj(readDamageSet(inputFile, elementDamageStart, elementDamageEnd), pklFileName['elementNumbers'])
+
+	# Line numbers and search lists of the parsed model used by steps 4 to 10
+	model = {	'sections': sections,\
+				'nodeListNodeNumber': nodeListNodeNumber, 'nodeListNodeIndex': nodeListNodeIndex,\
+				'elementListNormalNumber': elementListNormalNumber, 'elementListNormalIndex': elementListNormalIndex,\
+				'cohesiveElementStartNumber': cohesiveElementStartNumber, 'cohesiveNodeStartNumber': cohesiveNodeStartNumber}
+
+	insertCohesiveElements(model)
+
+	validateStep()
+
+def modelList(model, key):
+	"""Returns the list nodeList or elementListNormal of a parsed model.
+
+	Args:
+		model (dict): Sections and search lists of the parsed model
+		key (str): 'nodeList' or 'elementListNormal'
+
+	Returns:
+		entries (list): The list kept in model by the service, or else unpickled from pklFileName[key].
+
+	"""
+	if key in model:
+		return model[key]
+	return unpklObj(pklFileName[key])
+
+def insertCohesiveElements(model):
+	"""Inserts the cohesive elements into the damage zone of a parsed model (steps 4 to 10).
+
+	Args:
+		model (dict): Sections and search lists of the parsed model from steps 1 to 3 of generateCohesiveElements
+
+	Returns:
+		cohesiveCount (int): Number of cohesive elements inserted.
+
+	The damage elements are read from pklFileName['elementNumbers'] and the nodes and elements from the other pickles of step 3,
+	which are deleted once the output inp file is written to outputDirectory. The service keeps nodeList and elementListNormal in
+	model instead, see serveModel, and they are left unchanged.
+
+	"""
+	sections = model['sections']
+	nodeListNodeNumber = model['nodeListNodeNumber']
+	nodeListNodeIndex = model['nodeListNodeIndex']
+	elementListNormalNumber = model['elementListNormalNumber']
+	elementListNormalIndex = model['elementListNormalIndex']
+	cohesiveElementStartNumber = model['cohesiveElementStartNumber']
+	cohesiveNodeStartNumber = model['cohesiveNodeStartNumber']
+
 	#____________________STEP 4______________________________
 	""" For each element in the damage zone, grab the element and its nodes and add them to elementList for processing.
 
 	"""
 
-	print "Step4"
+	print("Step4")
 	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+	print(time1)
 
 	##########################################################################################
 
 	# Unpickle elementListNormal for use
-	elementListNormal = unpklObj(pklFileName['elementListNormal'])
+	elementListNormal = modelList(model, 'elementListNormal')
 
 	# Unpickle elementNumbers for use
 	elementNumbers = unpklObj(pklFileName['elementNumbers'])
@@ -1180,314 +5647,647 @@ def generateCohesiveElements():
 
 	elementList = func(elementNumbers, elementListNormal, elementListNormalNumber, elementListNormalIndex)
 
-	# Sort elementList by node number to prepare for binary search later on in the program
-	elementListNumber = []
-	elementListIndex = []
-	[elementListNumber, elementListIndex] = sortIntColumnForBisectSearch(elementList,0)
+	# Merge the distinct but coincident nodes of the damage elements so that the faces they share are found by their node numbers
+	if coincidentNodeTolerance is not None:
+		nodeList = modelList(model, 'nodeList')
+		nodeMap = coincidentNodeMap(elementList, nodeList, nodeListNodeNumber, nodeListNodeIndex, coincidentNodeTolerance)
+		nodeList = []
+		print("%d coincident node(s) merged into the node with the smallest number of their group" % len(nodeMap))
+
+		collapsed = mergeCoincidentNodes(elementList, nodeMap)
+		if collapsed:
+			print("%d damage element(s) use a node more than once after merging, the tolerance may be too large:" % len(collapsed), collapsed[:10])
+		nodeMap = {}
+
+	# Reorder elementList along a space-filling curve so that neighbouring elements are processed together.
+	# elementListOrder keeps the original position of each element to put the results back in their original order.
+	# Step 7-2 visits the nodes of the damage zone in the curve order of their elements. nodeList keeps the order of the inp file, as
+	# the only pass over it after step 4, creating the new nodes, goes in node number order, which is the file order of most models
+	elementListOrder = None
+	if spatialOrdering is not None and engine == 'pool':
+		nodeList = modelList(model, 'nodeList')
+		elementListOrder = spaceFillingCurveOrder(elementCentroids(elementList, nodeList, nodeListNodeNumber, nodeListNodeIndex), spatialOrdering)
+		elementList = [elementList[i] for i in elementListOrder]
+		nodeList = []
 
-	# Pickle elementListNormal for later use
-	elementListNormal = pklObj(elementListNormal, pklFileName['elementListNormal'])
+	# Index the topology of elementList once for the following steps, reusing the index saved by an earlier run if it matches
+	topology = None
+	if topologyIndexFile is not None:
+		topology = loadTopologyIndex(topologyIndexFile, elementList)
+	if topology is None:
+		topology = buildTopologyIndex(elementList)
+		if topologyIndexFile is not None:
+			topology['elementKey'] = topologyKey(elementList)
+			pklObj(topology, topologyIndexFile)
+
+	# Element numbers of elementList in increasing order and their row, used for binary searches later on in the program
+	elementListNumber = topology['elementNumber']
+	elementListIndex = topology['elementRow']
+
+	# Paired list corresponding with elementListNumber which points to the position of the element before reordering
+	if elementListOrder is not None:
+		elementListOriginalPosition = [elementListOrder[i] for i in elementListIndex]
+
+	# Pickle elementListNormal for later use, unless the service keeps it
+	if 'elementListNormal' in model:
+		elementListNormal = []
+	else:
+		elementListNormal = pklObj(elementListNormal, pklFileName['elementListNormal'])
 
 	# Pickle elementNumbers for later use
 	elementNumbers = pklObj(elementNumbers, pklFileName['elementNumbers'])
 
 	##########################################################################################
 	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
+	print(time2)
+	print("##############################")
 	savingTime("Step4",time1,time2)
 
-	#____________________STEP 5 and 6______________________________
-	""" Find all the faces between all elements defined in the damage zone.
-
-		Each element can have 6 possible faces that is shared with another element. We check only 3 of those faces in eace element
-		in the damage zone to see if those faces connect with an element in the damage zone. If it does, append the current element
-		being checked as well as the element which share the face being checked to the cohesiveFaces list.
-
-	"""
-	print "Step5and6"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
-	##########################################################################################
-	# For every damage element, check if the forward facing faces are connected to another damanged element. If it is, then add it to the list.
-	cohesiveFaces = []	#Global variable to store element number and cohesive face node for each connecting element in the damage zone
+	if engine == 'domain':
+		#____________________STEP 5 to 7-2______________________________
+		""" Split the damage zone into subdomains of neighbouring elements, then find the cohesive faces and renumber the cohesive
+			nodes of each subdomain independently.
 
-	# Sort elementList by forward face orientation to prepare for binary search
+			Each subdomain is sent with its halo (the elements of other subdomains sharing a node with it) so that every face and
+			node decision can be made locally. Decisions on nodes shared by several subdomains are reconciled afterwards.
 
-	# Define face orientation (accounting for element number in col[0]) used for generating cohesive elements in the damage zone
-	faceOrientation = { 'Af': [5,6,7,8], 'Ab': [1,2,3,4],\
-						'Bf': [3,4,8,7], 'Bb': [2,1,5,6],\
-						'Cf': [2,3,7,6], 'Cb': [1,4,8,5] }	
-	
-	# Combination A
-	elementListFaceANumber = []
-	elementListFaceAIndex = []
-	[elementListFaceANumber, elementListFaceAIndex] = sortElementListForFaceBisectSearch(elementList,faceOrientation['Af'])
+		"""
+		print("Step5to7-2")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
 
-	# Combination B
-	elementListFaceBNumber = []
-	elementListFaceBIndex = []
-	[elementListFaceBNumber, elementListFaceBIndex] = sortElementListForFaceBisectSearch(elementList,faceOrientation['Bf'])
+		faceOrientation = faceOrientationDefinition
 
-	# Combination C
-	elementListFaceCNumber = []
-	elementListFaceCIndex = []
-	[elementListFaceCNumber, elementListFaceCIndex] = sortElementListForFaceBisectSearch(elementList,faceOrientation['Cf'])
+		# Unpickle nodeList to place the damage elements along a space-filling curve
+		nodeList = modelList(model, 'nodeList')
+		centroids = elementCentroids(elementList, nodeList, nodeListNodeNumber, nodeListNodeIndex)
+		nodeList = []
 
-	# Main function of this step
-	cohesiveFaces = func2(elementList, faceOrientation, elementListFaceANumber, elementListFaceAIndex, elementListFaceBNumber, elementListFaceBIndex, elementListFaceCNumber, elementListFaceCIndex)
+		subdomains = partitionDamageZone(elementList, topology, centroids, subdomainCount if subdomainCount is not None else core, spatialOrdering if spatialOrdering is not None else 'morton')
+		centroids = []
 
-	#Clean up of global variables that have no use anymore
-	elementListFaceANumber = []
-	elementListFaceAIndex = []
+		# Main function of this step
+		[cohesiveFaces, tempNodeNode] = func8(subdomains, elementList, cohesiveNodeStartNumber)
 
-	elementListFaceBNumber = []
-	elementListFaceBIndex = []
+		#saving the pairNodes
+		dumpDiagnostic('pairNodes', (face for p in range(facePairCount(cohesiveFaces)) for face in facePairFaces(cohesiveFaces, p)))
 
-	elementListFaceCNumber = []
-	elementListFaceCIndex = []
+		# Save for later use
+		cohesiveFaces = saveFacePairTable(cohesiveFaces, pklFileName['cohesiveFaces'])
+		elementList = pklObj(elementList, pklFileName['elementList'])
 
-	#saving the pairNodes
-	with open("%s/pairNodes-%s.txt" %(outputDirectory,inputName), 'w') as f:
-		for k in cohesiveFaces:
-			f.writelines ("%s\n" %k)
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step5to7-2",time1,time2)
 
-	##########################################################################################
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "############################"
-	savingTime("Step5and6",time1,time2)	 
+	else:
+		#____________________STEP 5 and 6______________________________
+		""" Find all the faces between all elements defined in the damage zone.
 
-	#____________________STEP 7______________________________  
-	""" Renumber each node in each element attached to a cohesive face so that the node numbers are not repeated.
+			Each element can have 6 possible faces that is shared with another element. We check only 3 of those faces in eace element
+			in the damage zone to see if those faces connect with an element in the damage zone. If it does, append the current element
+			being checked as well as the element which share the face being checked to the cohesiveFaces list.
 
-		cohesiveNodeStartNumber is used to dictate how much each node number is incremented for each duplicate found.
-	"""
-	print "Step7-1"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+		"""
+		print("Step5and6")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
+		##########################################################################################
+		# For every damage element, check if the forward facing faces are connected to another damanged element. If it is, then add it to the table.
+		cohesiveFaces = None	#Face pair table to store the element numbers, face codes and cohesive face nodes for each connecting element pair in the damage zone
 
-	##########################################################################################
-	nodeSupport = [] #Global variable to store list of cohesive nodes that make up a cohesive face and elements in the damage zone attached to these nodes
-	
-	# Main function of this step
-	nodeSupport = func3(elementList, cohesiveFaces)
+		# Define face orientation (accounting for element number in col[0]) used for generating cohesive elements in the damage zone
+		faceOrientation = faceOrientationDefinition
 
-	# Pickle cohesiveFaces for later use
-	cohesiveFaces = pklObj(cohesiveFaces, pklFileName['cohesiveFaces'])
+		# Main function of this step. Shared faces are read from the face adjacency of the topology index
+		cohesiveFaces = func2(elementList, faceOrientation, topology)
 
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
-	savingTime("Step7-1",time1,time2) 
-	##########################################################################################
-	##########################################################################################
-	# Go through each affected node and modify that node number in each affected element so that the node numbers are unique
-	print "Step7-2"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+		# Order of the face pairs had elementList not been reordered, used to number the cohesive elements in step 9
+		facePairOrder = None
+		if elementListOrder is not None:
+			facePairOrder = originalFacePairOrder(cohesiveFaces, elementListNumber, elementListOriginalPosition)
 
-	tempNodeNode = [] #Global variable to store new nodes created as a result of node renumbering
-	
-	# Main function of this step
-	tempNodeNode = func4(nodeSupport, elementList, elementListNumber, elementListIndex, cohesiveNodeStartNumber)
+		#saving the pairNodes
+		dumpDiagnostic('pairNodes', (face for p in (facePairOrder if facePairOrder is not None else range(facePairCount(cohesiveFaces)))\
+										for face in facePairFaces(cohesiveFaces, p)))
 
-	# Pickle for later use
-	elementList = pklObj(elementList, pklFileName['elementList'])
+		##########################################################################################
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("############################")
+		savingTime("Step5and6",time1,time2)	 
 
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
-	savingTime("Step7-2",time1,time2) 
-	##########################################################################################
-	##########################################################################################
-	# Unpickle nodeList for use
-	nodeList = unpklObj(pklFileName['nodeList'])
+		#____________________STEP 7______________________________  
+		""" Renumber each node in each element attached to a cohesive face so that the node numbers are not repeated.
 
-	# Go through each new node number that was changed and give back the (x,y,z) coordinates of the original node number. Then attach them to nodeList
-	print "Step7-3"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+			cohesiveNodeStartNumber is used to dictate how much each node number is incremented for each duplicate found.
+		"""
+		print("Step7-1")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
 
-	# Main function of this step
-	func5(tempNodeNode, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber)
+		##########################################################################################
+		nodeSupport = [] #Global variable to store list of cohesive nodes that make up a cohesive face and elements in the damage zone attached to these nodes
 	
-	# Resort node list for speed up on step 9
-	[nodeListNodeNumber, nodeListNodeIndex] = sortIntColumnForBisectSearch(nodeList,0)
+		# Main function of this step
+		nodeSupport = func3(elementList, cohesiveFaces, topology)
+
+		# Put the elements attached to each node back in their original order, which decides which element keeps the original node
+		if elementListOrder is not None:
+			# Original position of each element number, found once instead of by a binary search per element. The first row of a
+			# repeated element number is kept, as found by bisectSearchSortedList
+			originalPosition = dict(zip(reversed(elementListNumber), reversed(elementListOriginalPosition)))
+			for n in nodeSupport:
+				n[1:] = sorted(n[1:], key=originalPosition.__getitem__)
+			originalPosition = {}
+
+		# Save cohesiveFaces for later use
+		cohesiveFaces = saveFacePairTable(cohesiveFaces, pklFileName['cohesiveFaces'])
+
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step7-1",time1,time2) 
+		##########################################################################################
+		##########################################################################################
+		# Go through each affected node and modify that node number in each affected element so that the node numbers are unique
+		print("Step7-2")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
+
+		tempNodeNode = [] #Global variable to store new nodes created as a result of node renumbering
+	
+		# Main function of this step
+		if elementListOrder is None:
+			tempNodeNode = func4(nodeSupport, elementList, topology, cohesiveNodeStartNumber)
+		else:
+			# Process the nodes in the order of the first reordered element attached to them, then put the new nodes back in node number order.
+			# The row of each element number is found once instead of by a binary search per element
+			reorderedRow = dict(zip(reversed(elementListNumber), reversed(elementListIndex)))
+			nodeSupportOrder = sorted(range(len(nodeSupport)), key=lambda i: min([reorderedRow[r] for r in nodeSupport[i][1:]] or [0]))
+			reorderedRow = {}
+			tempNodeNode = func4([nodeSupport[i] for i in nodeSupportOrder], elementList, topology, cohesiveNodeStartNumber)
+			tempNodeNode = restoreOriginalOrder(tempNodeNode, nodeSupportOrder)
+
+		# Pickle for later use
+		elementList = pklObj(elementList, pklFileName['elementList'])
+
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step7-2",time1,time2) 
+		##########################################################################################
+		##########################################################################################
+	# Pickle the topology index for step 9
+	topology = pklObj(topology, pklFileName['topology'])
+	elementListNumber = []
+	elementListIndex = []
+	fallbackNodeNumbers[:] = findFallbackNodes(tempNodeNode, nodeListNodeNumber, cohesiveNodeStartNumber)
+
+	# Without streaming, the new nodes are created here. Otherwise they are created while writing the output inp file in step 10
+	if not streamOutput:
+		# Unpickle nodeList for use. The new nodes are added to a copy of the list kept by the service
+		nodeList = modelList(model, 'nodeList')
+		if 'nodeList' in model:
+			nodeList = list(nodeList)
+
+		# Go through each new node number that was changed and give back the (x,y,z) coordinates of the original node number. Then attach them to nodeList
+		print("Step7-3")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
+
+		# Main function of this step
+		func5(tempNodeNode, nodeList, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber)
+	
+		# Resort node list for speed up on step 9
+		[nodeListNodeNumber, nodeListNodeIndex] = sortIntColumnForBisectSearch(nodeList,0)
 
-	# Pickle nodeList for later use
-	nodeList = pklObj(nodeList, pklFileName['nodeList'])
+		# Pickle nodeList for later use
+		nodeList = pklObj(nodeList, pklFileName['nodeList'])
 
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
-	savingTime("Step7-3",time1,time2) 
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step7-3",time1,time2) 
 	##########################################################################################
 	#____________________STEP 8______________________________
 	# Fix the node number on damage elements
-	print "Step8"
+	print("Step8")
 	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+	print(time1)
 
 	# Unpickle elementList for use
 	elementList = unpklObj(pklFileName['elementList'])
 
-	# Unpickle elementListNormal for use
-	elementListNormal = unpklObj(pklFileName['elementListNormal'])
+	if 'elementListNormal' in model:
+		# Only copies of the rows of the damage elements are changed in the elementListNormal kept by the service
+		elementListNormalPatches = damageRowPatches(elementList, model['elementListNormal'], elementListNormalNumber, elementListNormalIndex)
+		elementListNormalRows = iterPatchedList(model['elementListNormal'], elementListNormalPatches)
+	else:
+		# Unpickle elementListNormal for use
+		elementListNormal = unpklObj(pklFileName['elementListNormal'])
 
-	# Main function of this step
-	func6(elementList, elementListNormal, elementListNormalNumber, elementListNormalIndex)
+		# Main function of this step
+		func6(elementList, elementListNormal, elementListNormalNumber, elementListNormalIndex)
 
-	# Pickle elementListNormal for later use
-	elementListNormal = pklObj(elementListNormal, pklFileName['elementListNormal'])
+		# Pickle elementListNormal for later use
+		elementListNormal = pklObj(elementListNormal, pklFileName['elementListNormal'])
+		elementListNormalRows = iterPickledList(pklFileName['elementListNormal'])
 
 	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
+	print(time2)
+	print("##############################")
 	savingTime("Step8",time1,time2) 
-	#____________________STEP 9______________________________
-	# Add the cohesive elements created to the cohesive list.
-	print "Step9"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
-
-	# Unpickle nodeList for use
-	nodeList = unpklObj(pklFileName['nodeList'])
+	if streamOutput:
+		#____________________STEP 9 and 10______________________________
+		""" Write the new inp file while creating the new nodes of step 7-3 and the cohesive elements of step 9.
+
+			Nodes and cohesive elements are handed to the writer one at a time, so neither is ever held in memory as a whole.
+
+		"""
+		print("Step9and10")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
+
+		#Finished using elementList. Print out results in their original order and clear variable for space.
+		dumpDiagnostic('elementList', restoreOriginalOrder(elementList, elementListOrder) if elementListOrder is not None else elementList)
+		elementList = []
+
+		#The cohesive elements are numbered contiguously, one for each face pair
+		cohesiveNumbers = [cohesiveElementStartNumber, cohesiveElementStartNumber + savedFacePairCount(pklFileName['cohesiveFaces']) - 1]
+
+		#The nodes, elements and cohesive elements are counted as they are written
+		rows = len(nodeListNodeNumber) + sum(len(a) for a in tempNodeNode) + len(elementListNormalNumber) + cohesiveNumbers[1] - cohesiveNumbers[0] + 1
+		progress = StepProgress('Step9and10', rows, 'rows')
+
+		#Write new inp file, creating the new nodes and the cohesive elements from the pickled damage elements as they are written.
+		#Face pairs are numbered in their original order if elementList was reordered
+		writeOutputInp(outputInpFileName(), sections,\
+						iterProgress(iterStreamedNodes(model.get('nodeList', pklFileName['nodeList']), tempNodeNode, nodeListNodeNumber, nodeListNodeIndex, cohesiveNodeStartNumber), progress),\
+						iterProgress(elementListNormalRows, progress),\
+						iterProgress(iterStreamedCohesiveElements(pklFileName['elementList'], pklFileName['topology'], pklFileName['cohesiveFaces'], faceOrientation,\
+								cohesiveElementStartNumber, facePairOrder if elementListOrder is not None else None, openDiagnostic('cohesiveElement')), progress),\
+						cohesiveNumbers)
+		progress.finish()
+
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step9and10",time1,time2)
+
+	else:
+		#____________________STEP 9______________________________
+		# Add the cohesive elements created to the cohesive list.
+		print("Step9")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
+
+		# Unpickle nodeList for use
+		nodeList = unpklObj(pklFileName['nodeList'])
 
-	#making sure the nodeList are actually numbers
-	for a in nodeList:
-		a[0] = int(float(a[0]))
-		a[1] = float(a[1])
-		a[2] = float(a[2])
-		a[3] = float(a[3])
+		#making sure the nodeList are actually numbers
+		for a in nodeList:
+			a[0] = int(float(a[0]))
+			a[1] = float(a[1])
+			a[2] = float(a[2])
+			a[3] = float(a[3])
 	   
-	time_intermediate = time.strftime("%d-%H-%M-%S", time.gmtime())
-	savingTime("	Step9to9.1",time1,time_intermediate)
+		time_intermediate = time.strftime("%d-%H-%M-%S", time.gmtime())
+		savingTime("	Step9to9.1",time1,time_intermediate)
 
-	# Pickle nodeList for use
-	nodeList = pklObj(nodeList, pklFileName['nodeList'])
+		# Pickle nodeList for use
+		nodeList = pklObj(nodeList, pklFileName['nodeList'])
 
-	# Unpickle elementList for use
-	elementList = unpklObj(pklFileName['elementList'])
+		# Unpickle elementList for use
+		elementList = unpklObj(pklFileName['elementList'])
 
-	# Unpickle cohesiveFaces for use
-	cohesiveFaces = unpklObj(pklFileName['cohesiveFaces'])
+		# Unpickle the topology index for use
+		topology = unpklObj(pklFileName['topology'])
 
-	cohesive = []
+		# Load cohesiveFaces for use
+		cohesiveFaces = loadFacePairTable(pklFileName['cohesiveFaces'])
 
-	# Main function of this step
-	cohesive = func7(cohesiveFaces, elementList, elementListNumber, elementListIndex, faceOrientation)
+		# Main function of this step. Face pairs are numbered in their original order if elementList was reordered
+		cohesive = assembleCohesiveElements(cohesiveFaces, elementList, topology, faceOrientation, cohesiveElementStartNumber, facePairOrder if elementListOrder is not None else None)
+		topology = []
 
+		# Put the damage elements back in their original order
+		if elementListOrder is not None:
+			elementList = restoreOriginalOrder(elementList, elementListOrder)
 
-	#Finished using elementList. Print out results and clear variable for space.
-	with open("%s/elementList-%s.txt" %(outputDirectory,inputName), 'w') as f:
-		for k in elementList:
-			f.writelines ("%s\n" %k)
 
-	# Pickle elementList for debugging if needed
-	elementList = pklObj(elementList,pklFileName['elementList'])
+		#Finished using elementList. Print out results and clear variable for space.
+		dumpDiagnostic('elementList', elementList)
 
-	# Pickle cohesiveFaces for debugging if needed
-	cohesiveFaces = pklObj(cohesiveFaces,pklFileName['cohesiveFaces'])
+		# Pickle elementList for debugging if needed
+		elementList = pklObj(elementList,pklFileName['elementList'])
 
-	time_intermediate2 = time.strftime("%d-%H-%M-%S", time.gmtime())
-	savingTime("	Step9.1to9.2",time_intermediate,time_intermediate2)
+		# Save cohesiveFaces for debugging if needed
+		cohesiveFaces = saveFacePairTable(cohesiveFaces,pklFileName['cohesiveFaces'])
 
-	#Create the element numbers for cohesive elements such that they are unique
-	elementNumberCohesive = []
-	rcount = cohesiveElementStartNumber	   
-	for k in range (0, len(cohesive)):
-		cohesive[k][0] = rcount
-		elementNumberCohesive.append(cohesive[k][0])
-		rcount=rcount+1
+		time_intermediate2 = time.strftime("%d-%H-%M-%S", time.gmtime())
+		savingTime("	Step9.1to9.2",time_intermediate,time_intermediate2)
 
-	#Saving Files
-	with open("%s/cohesiveElement-%s.txt" %(outputDirectory,inputName), 'w') as f:
-		for k in cohesive:
-			f.writelines ("%s\n" %k)
+		#The cohesive elements are numbered contiguously, so the element set only needs the first and last element numbers
+		cohesiveNumbers = [cohesiveElementStartNumber, cohesiveElementStartNumber + len(cohesive)//cohesiveElementWidth - 1]
 
-	#Pickle cohesive for later use
-	cohesive = pklObj(cohesive, pklFileName['cohesive'])
-			
-	#Pickle elementNumberCohesive for later use
-	elementNumberCohesive = pklObj(elementNumberCohesive, pklFileName['elementNumberCohesive'])
+		#Saving Files
+		dumpDiagnostic('cohesiveElement', iterBlockRows(cohesive, cohesiveElementWidth))
 
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
-	savingTime("	Step9.2to10",time_intermediate2,time2)
-	savingTime("Step9",time1,time2)
+		#Pickle cohesive for later use
+		cohesive = pklObj(cohesive, pklFileName['cohesive'])
 
-	#____________________STEP 10______________________________
-	print "10"
-	time1= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time1
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("	Step9.2to10",time_intermediate2,time2)
+		savingTime("Step9",time1,time2)
+
+		#____________________STEP 10______________________________
+		print("10")
+		time1= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time1)
 			
-	###################################################################
+		###################################################################
 					
-	#Write new inp file
-	with open("%s/OutPut-%s.inp" %(outputDirectory,inputName), 'w') as f:
-		
-		#Copy the header into the file
-		copyFromFileLineNumber(inputFile,f,1,nodeStart)
+		#Write new inp file, unpickling nodeList, elementListNormal and cohesive one at a time as they are written
+		writeOutputInp(outputInpFileName(), sections, iterPickledList(pklFileName['nodeList']), elementListNormalRows, iterBlockRows(unpklObj(pklFileName['cohesive']), cohesiveElementWidth), cohesiveNumbers)
 
-		# Unpickle nodeList and write to file
-		nodeList = unpklObj(pklFileName['nodeList'])
-		f.writelines(nodeStartInp+"\n")
-		for k in nodeList:
-			f.writelines(','.join(str(v) for v in k)+"\n")
+		time2= time.strftime("%d-%H-%M-%S", time.gmtime())
+		print(time2)
+		print("##############################")
+		savingTime("Step10",time1,time2)
 
-		# Clear out nodeList
-		nodeList = []
+		delFile(pklFileName['cohesive'])
 
-		# Unpickle elementListNormal and write to file
-		elementListNormal = unpklObj(pklFileName['elementListNormal'])
-		f.writelines(elementNormalStartInp+"\n")
-		for s in elementListNormal:
-			f.writelines(','.join(str(h) for h in s)+"\n")
-		
-		# Clear out elementListNormal
-		elementListNormal = []
+	# Remove pickled objects from disk
+	delFile(pklFileName['elementList'])
+	if 'elementListNormal' not in model:
+		delFile(pklFileName['elementListNormal'])
+	if 'nodeList' not in model or not streamOutput:
+		delFile(pklFileName['nodeList'])
+	delFile(pklFileName['elementNumbers'])
+	delFile(pklFileName['cohesiveFaces'])
+	delFile(pklFileName['topology'])
 
-		# Copy everything after the element list up to the end of the damage regiion section
-		copyFromFileLineNumber(inputFile,f,elementNormalEnd,elementDamageEnd)
+	return cohesiveNumbers[1] - cohesiveNumbers[0] + 1
 
-		# Unpickle cohesive amd write to file
-		cohesive = unpklObj(pklFileName['cohesive'])
-		f.writelines(cohesiveTitle)
-		for r in cohesive:
-			f.writelines(','.join(str(h) for h in r)+"\n")
-		
-		# Clear out cohesive
-		cohesive = []
+def parseCommandLine():
+	"""Overrides the settings at the top of this file with the options given on the command line.
 
-		# Unpickle elementNumberCohesive and write to file
-		elementNumberCohesive = unpklObj(pklFileName['elementNumberCohesive'])
-		f.writelines(elementSetCohesive)
-		f.writelines("%s,%s, \n"% (str (elementNumberCohesive[0]), str(elementNumberCohesive[-1])))
-		f.writelines(sectionCohesive)
+	Returns:
+		args (obj): Parsed command line options.
 
-		# Clear out elementNumberCohesive
-		elementNumberCohesive = []
+	"""
+	global engine
+	global maxMemory
+	global spatialOrdering
+	global subdomainCount
+	global topologyIndexFile
+	global streamOutput
+	global backgroundIO
+	global compression
+	global includeStore
+	global validateOutput
+	global coincidentNodeTolerance
+	global damageRegions
+	global centroidGridFile
+	global damageVariants
+	global memoryPlanning
+	global memoryLimit
+	global dryRun
+	global variantProcesses
+	global serviceAddress
+	global diagnosticLevel
+	global diagnosticStages
+	global diagnosticFormat
+	global progressInterval
+	global backend
+	global stepBackends
+	global distributedAddress
+	global distributedLocalWorkers
+	global distributedRemoteWorkers
+	global distributedAuthKey
+
+	parser = argparse.ArgumentParser(description="Inserts cohesive elements into a defined damage zone in bone.")
+	parser.add_argument('--engine', choices=['pool', 'outofcore', 'domain'], help="engine used to insert the cohesive elements (default: %s)" % engine)
+	parser.add_argument('--max-memory', metavar='SIZE', help="memory budget such as 8G. Selects the out-of-core engine unless --engine is given")
+	parser.add_argument('--reorder', choices=['morton', 'hilbert'], help="process the damage elements along a space-filling curve through their centroids")
+	parser.add_argument('--compress', choices=sorted(compressionSuffixes), help="compress the output inp file")
+	parser.add_argument('--include-store', metavar='DIR', help="split the output inp file into *INCLUDE blocks, linking the unchanged ones from the store in DIR")
+	parser.add_argument('--validate', action='store_true', help="check the output inp file once it is written and exit with status 1 if it has defects")
+	parser.add_argument('--merge-tolerance', metavar='TOL', type=float, help="merge the distinct nodes of the damage elements closer than TOL before finding the cohesive faces")
+	parser.add_argument('--damage-box', metavar='X0,Y0,Z0,X1,Y1,Z1', action='append', default=[], help="select the damage elements with a centroid in the box between two corners. Can be repeated")
+	parser.add_argument('--damage-sphere', metavar='X,Y,Z,R', action='append', default=[], help="select the damage elements with a centroid in the sphere. Can be repeated")
+	parser.add_argument('--damage-cylinder', metavar='X0,Y0,Z0,X1,Y1,Z1,R', action='append', default=[], help="select the damage elements with a centroid in the cylinder around the axis between two points. Can be repeated")
+	parser.add_argument('--damage-voxels', metavar='FILE', action='append', default=[], help="select the damage elements with a centroid in the voxels of a mask file. Can be repeated")
+	parser.add_argument('--variants', metavar='ELSET,...', help="run steps 4 to 10 once for each of these element sets used as damage zone, parsing the model once")
+	parser.add_argument('--variant-processes', type=int, help="number of variants run at once (default: as many as fit in memory)")
+	parser.add_argument('--serve', metavar='ADDRESS', help="parse the model once and answer insertion requests on HOST:PORT or a Unix socket path")
+	parser.add_argument('--request', metavar='ADDRESS', help="send an insertion request to the service at ADDRESS, with the damage zone from --elset or the damage region options")
+	parser.add_argument('--elset', metavar='NAME', help="element set used as damage zone by --request")
+	parser.add_argument('--fetch', metavar='FILE', help="write the output inp file of --request to FILE")
+	parser.add_argument('--stop-service', action='store_true', help="stop the service at the --request address")
+	parser.add_argument('--diagnostics', type=int, choices=[0, 1, 2], help="write the face pairs, renumbered damage elements and cohesive elements (1) and every intermediate stage (2) to the report folder")
+	parser.add_argument('--dump', action='append', metavar='NAME', help="write the diagnostic dump or intermediate stage NAME whatever the diagnostics level, can be repeated")
+	parser.add_argument('--diagnostics-format', choices=sorted(diagnosticSuffixes), help="format of the diagnostic dumps")
+	parser.add_argument('--progress', metavar='SECONDS', type=float, help="seconds between the progress reports of the pools and the rewrites of the status file, 0 turns them off (default: %s)" % progressInterval)
+	parser.add_argument('--memory-limit', metavar='SIZE', help="memory the run can use such as 16G (default: available memory and cgroup limit)")
+	parser.add_argument('--no-memory-plan', action='store_true', help="run with the configured engine, processes and tasks whatever the memory available")
+	parser.add_argument('--dry-run', action='store_true', help="only scan the inp file and predict the time and peak memory of each step at several numbers of processes")
+	parser.add_argument('--no-background-io', action='store_true', help="read and write the inp files in the main thread only")
+	parser.add_argument('--no-stream', action='store_true', help="create all new nodes and cohesive elements before writing the output inp file")
+	parser.add_argument('--topology-index', metavar='FILE', help="save the topology index of the damage elements to FILE, or reuse it if FILE was saved for the same damage elements")
+	parser.add_argument('--region-index', metavar='FILE', help="save the grid of the element centroids selecting the damage regions to FILE, or reuse it if FILE was saved for the same inp file")
+	parser.add_argument('--subdomains', type=int, help="number of subdomains used by the domain engine (default: one per core)")
+	parser.add_argument('--backend', metavar='BACKEND', help="auto, serial, threads[:N], processes[:N] or distributed backend running the steps (default: %s)" % backend)
+	parser.add_argument('--step-backend', metavar='STEP=BACKEND', action='append', default=[], help="backend of a single step such as Step5and6=processes:8. Can be repeated")
+	parser.add_argument('--listen', metavar='HOST:PORT', help="address the coordinator of the distributed backend listens on")
+	parser.add_argument('--local-workers', type=int, help="number of workers the distributed backend starts on this computer (default: one per core)")
+	parser.add_argument('--remote-workers', type=int, help="number of workers started on other computers the distributed backend waits for")
+	parser.add_argument('--worker', metavar='HOST:PORT', help="run as a worker of the distributed backend connecting to the coordinator at HOST:PORT")
+	parser.add_argument('--key-file', metavar='FILE', help="file holding the key shared by the coordinator and the workers of the distributed backend")
+	# argparse reads a value starting with '-' as an option, so negative coordinates of the regions are joined to their option
+	argv = sys.argv[1:]
+	i = 0
+	while i < len(argv) - 1:
+		if argv[i] in ['--damage-box', '--damage-sphere', '--damage-cylinder']:
+			argv[i:i + 2] = [argv[i] + '=' + argv[i + 1]]
+		i += 1
+	args = parser.parse_args(argv)
+
+	if args.max_memory is not None:
+		maxMemory = args.max_memory
+		engine = 'outofcore'
+
+	if args.engine is not None:
+		engine = args.engine
+
+	if args.memory_limit is not None:
+		memoryLimit = args.memory_limit
+	if args.no_memory_plan:
+		memoryPlanning = False
+	if args.dry_run:
+		dryRun = True
+
+	if args.reorder is not None:
+		spatialOrdering = args.reorder
+
+	if args.subdomains is not None:
+		subdomainCount = args.subdomains
+
+	if args.compress is not None:
+		compression = args.compress
+
+	if args.include_store is not None:
+		includeStore = args.include_store
+
+	if args.merge_tolerance is not None:
+		coincidentNodeTolerance = args.merge_tolerance
+
+	if args.variants is not None:
+		damageVariants = [v.strip() for v in args.variants.split(',') if v.strip()]
+
+	if args.variant_processes is not None:
+		variantProcesses = args.variant_processes
+
+	if args.serve is not None:
+		serviceAddress = args.serve
+
+	for address in [args.serve, args.request]:
+		if address is not None:
+			try:
+				serviceListenerAddress(address)
+			except ValueError as e:
+				parser.error(str(e))
+
+	if args.diagnostics is not None:
+		diagnosticLevel = args.diagnostics
+	if args.dump:
+		diagnosticStages = diagnosticStages + args.dump
+	if args.diagnostics_format is not None:
+		diagnosticFormat = args.diagnostics_format
+
+	if args.progress is not None:
+		progressInterval = args.progress if args.progress > 0 else None
+
+	for kind in ['box', 'sphere', 'cylinder', 'voxels']:
+		for value in getattr(args, 'damage_' + kind):
+			try:
+				damageRegions.append(parseDamageRegion(kind, value))
+			except (ValueError, IOError) as e:
+				parser.error(str(e))
+
+	if includeStore is not None and compression is not None:
+		parser.error("the output inp file cannot be compressed when it is split, as Abaqus reads included files uncompressed")
+
+	if 'zstd' in [compression, fileCompression(inputFile)]:
+		try:
+			requireZstandard()
+		except ImportError as e:
+			parser.error(str(e))
+
+	if coincidentNodeTolerance is not None and not coincidentNodeTolerance > 0:
+		parser.error("the merge tolerance must be greater than 0, not %s" % coincidentNodeTolerance)
+
+	for [name, size] in [['memory budget', maxMemory], ['memory limit', memoryLimit]]:
+		if size is not None:
+			try:
+				if not parseMemorySize(size) > 0:
+					raise ValueError
+			except (ValueError, OverflowError):
+				parser.error("the %s must be a size greater than 0 such as 8G or 512M, not %s" % (name, size))
+
+	if coincidentNodeTolerance is not None and engine == 'outofcore':
+		parser.error("coincident nodes are only merged by the pool and domain engines")
+
+	if damageRegions and engine == 'outofcore':
+		parser.error("damage regions are only selected by the pool and domain engines")
 
-		# Copy the rest of the file
-		copyFromFileLineNumber(inputFile,f,elementDamageEnd,endOfFileLineNumber(inputFile)+1)
-			
-	time2= time.strftime("%d-%H-%M-%S", time.gmtime())
-	print time2
-	print "##############################"
-	savingTime("Step10",time1,time2)
+	if args.validate:
+		validateOutput = True
 
-	# Remove pickled objects from disk
-	delFile(pklFileName['elementList'])
-	delFile(pklFileName['elementListNormal'])
-	delFile(pklFileName['nodeList'])
-	delFile(pklFileName['elementNumbers'])
-	delFile(pklFileName['cohesiveFaces'])
-	delFile(pklFileName['elementNumberCohesive'])
-	delFile(pklFileName['cohesive'])
+	if args.no_background_io:
+		backgroundIO = False
+
+	if args.no_stream:
+		streamOutput = False
+
+	if args.topology_index is not None:
+		topologyIndexFile = args.topology_index
+
+	if args.region_index is not None:
+		centroidGridFile = args.region_index
+
+	if args.backend is not None:
+		parseBackend(args.backend)
+		backend = args.backend
+
+	for stepBackend in args.step_backend:
+		[step, name] = stepBackend.split('=', 1)
+		parseBackend(name)
+		stepBackends[step] = name
+
+	if args.listen is not None:
+		[host, port] = args.listen.rsplit(':', 1)
+		distributedAddress = (host, int(port))
+
+	if args.local_workers is not None:
+		distributedLocalWorkers = args.local_workers
+
+	if args.remote_workers is not None:
+		distributedRemoteWorkers = args.remote_workers
+
+	if args.key_file is not None:
+		with open(args.key_file) as fp:
+			distributedAuthKey = fp.read().strip()
+		if not distributedAuthKey:
+			parser.error("the key file %s is empty" % args.key_file)
+
+	if distributedAuthKey is None and (not isLoopbackHost(distributedAddress[0]) or distributedRemoteWorkers > 0):
+		parser.error("the distributed backend needs a key shared with its remote workers, given with --key-file")
+
+	if args.worker is not None and distributedAuthKey is None and distributedKeyVariable not in os.environ:
+		parser.error("workers started on other computers need the key of the coordinator, given with --key-file")
+
+	if damageVariants and engine == 'outofcore':
+		parser.error("variants are only run by the pool and domain engines")
+
+	if damageVariants and damageRegions:
+		parser.error("the damage zone of variants comes from their element sets and cannot be given as regions")
+
+	if serviceAddress is not None and (engine == 'outofcore' or damageVariants):
+		parser.error("the service only runs the pool and domain engines, one damage zone per request")
+
+	if damageVariants and 'distributed' in [parseBackend(name)[0] for name in [backend] + list(stepBackends.values())]:
+		parser.error("variants run in forked processes, which cannot share the workers of the distributed backend")
+
+	return args
 
 if __name__ == '__main__':
 
 	# Start of program when calling from command line.
-	generateCohesiveElements()
+	args = parseCommandLine()
+
+	# Processes of the pools are forked wherever possible so that they share the data of this process, see processPool
+	if hasattr(mp, 'set_start_method') and 'fork' in mp.get_all_start_methods():
+		mp.set_start_method('fork')
+
+	if args.worker is not None:
+		runWorker(args.worker)
+	elif args.request is not None:
+		if args.stop_service:
+			request = {'stop': True}
+		elif args.elset is not None:
+			request = {'elset': args.elset, 'name': args.elset}
+		else:
+			request = {'regions': damageRegions}
+		request['validate'] = validateOutput
+		request['inp'] = args.fetch is not None
+		sys.exit(requestService(args.request, request, args.fetch))
+	else:
+		try:
+			generateCohesiveElements()
+		finally:
+			stopWorkers()